@@ -486,9 +486,10 @@ def __init__(self, node1, node2, **kwargs):
 class RemoteGRELink( RemoteLink ):
     "Remote link using GRE tunnels"
 
-    GRE_KEY = 0
+    greKeys = set()  # tunnel keys in use (released on stop())
 
     def __init__(self, node1, node2, **kwargs):
+        self.greKey = None
         RemoteLink.__init__( self, node1, node2, **kwargs )
 
     def stop( self ):
@@ -499,6 +500,8 @@ def stop( self ):
         else:
             Link.stop( self )
         self.tunnel = None
+        RemoteGRELink.greKeys.discard( self.greKey )
+        self.greKey = None
 
     def makeIntfPair( self, intfname1, intfname2, addr1=None, addr2=None,
                       node1=None, node2=None, deleteIntfs=True   ):
@@ -544,13 +547,18 @@ def makeTunnel(self, node1, node2, intfname1, intfname2,
                ' == ' + node2.server + ':' + intfname2 )
         tun1 = 'local ' + IP1 + ' remote ' + IP2
         tun2 = 'local ' + IP2 + ' remote ' + IP1
-        self.__class__.GRE_KEY += 1
+        # Use the lowest free key, so long-running processes don't
+        # run out of keys
+        self.greKey = 1
+        while self.greKey in RemoteGRELink.greKeys:
+            self.greKey += 1
+        RemoteGRELink.greKeys.add( self.greKey )
         for (node, intfname, addr, tun) in [(node1, intfname1, addr1, tun1),
                                             (node2, intfname2, addr2, tun2)]:
             node.rcmd('ip link delete ' + intfname)
             result = node.rcmd('ip link add name ' + intfname + ' type gretap '
                                + tun + ' ttl 64 key '
-                               + str( self.__class__.GRE_KEY) )
+                               + str( self.greKey ) )
             if result:
                 raise Exception('error creating gretap on %s: %s'
                                 % (node, result))
@@ -20,10 +20,10 @@
 
 from mininet.net import Mininet
 from mininet.cli import CLI
-from mininet.log import lg, info
+from mininet.log import lg, info, warn
 from mininet.node import Node
 from mininet.topolib import TreeTopo
-from mininet.util import waitListening
+from mininet.util import waitReady
 
 
 def TreeNet( depth=1, fanout=2, **kwargs ):
@@ -62,8 +62,10 @@ def sshd( network, cmd='/usr/sbin/sshd', opts='-D',
     for host in network.hosts:
         host.cmd( cmd + ' ' + opts + '&' )
     info( "*** Waiting for ssh daemons to start\n" )
-    for server in network.hosts:
-        waitListening( server=server, port=22, timeout=5 )
+    notReady = waitReady( [ ( None, host, 22 ) for host in network.hosts ],
+                          timeout=5 )
+    for _client, host, _port in notReady:
+        warn( '*** sshd on', host, 'is not listening\n' )
 
     info( "\n*** Hosts are running sshd at the following addresses:\n" )
     for host in network.hosts:
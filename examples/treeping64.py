@@ -14,8 +14,9 @@ def __init__( self, *args, **kwargs ):
         super( HostV4, self ).__init__( *args, **kwargs )
         cfgs = [ 'all.disable_ipv6=1', 'default.disable_ipv6=1',
                  'default.autoconf=0', 'lo.autoconf=0' ]
-        for cfg in cfgs:
-            self.cmd( 'sysctl -w net.ipv6.conf.' + cfg )
+        with self.batch():
+            for cfg in cfgs:
+                self.cmd( 'sysctl -w net.ipv6.conf.' + cfg )
 
 
 def treePing64():
@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+
+"""
+agent.py: framed command execution agent for Mininet nodes
+
+Normally, a Mininet node is an interactive bash shell running on a
+pty; command completion is detected by scanning the output for a
+prompt sentinel, and stdout, stderr and exit status are lost in a
+single merged byte stream.
+
+As an alternative, a node may run this agent (launched via mnexec in
+the node's namespaces) which drives a persistent, non-interactive bash
+over pipes and speaks a simple length-prefixed binary protocol on its
+stdin/stdout:
+
+  frame := type (1 byte) | request id (4 bytes) | length (4 bytes) | data
+
+Requests (node -> agent):
+
+  CMD: run data as a bash command line
+  INPUT: write data to the standard input shared by commands
+  SIGNAL: send signal int( data ) to the running command(s)
+
+Replies (agent -> node):
+
+  READY: agent and shell are running; data is the agent's pid
+  STDOUT, STDERR: output from request id (0 for unsolicited output)
+  EXIT: request id has completed; data is "exitcode lastpid"
+
+Commands are evaluated by a single shell, one after the other, so
+shell state (cwd, variables, jobs) is preserved just as it is for
+Node.cmd(). Several CMD requests may be sent without waiting for the
+previous ones to complete (pipelining); replies are returned in
+request order. The agent hands the shell one command at a time, so
+that output is always attributed to the right request.
+
+Neither side may block writing while the other is writing to it: the
+agent queues commands and input for the shell, writing them as the
+shell reads them, and the client (AgentClient.exchange()) reads
+replies while it sends requests.
+
+This file is run directly by the agent process, so it must not
+import anything from the mininet package.
+"""
+
+import fcntl
+import os
+import signal
+import struct
+import sys
+
+from collections import deque
+from errno import EAGAIN, EINTR
+from select import poll, POLLIN, POLLOUT, POLLHUP, POLLERR
+from subprocess import Popen, PIPE
+
+# Frame types
+CMD, INPUT, SIGNAL = 1, 2, 3
+READY, STDOUT, STDERR, EXIT = 16, 17, 18, 19
+
+HEADER = struct.Struct( '!BII' )
+
+# Maximum amount of output to read at once
+READMAX = 65536
+
+# Shell file descriptors for exit status and command input
+def packFrame( kind, reqid, data=b'' ):
+    "Return a frame as bytes"
+    return HEADER.pack( kind, reqid, len( data ) ) + data
+
+
+def unpackFrames( buf ):
+    """Parse complete frames from the front of buf
+       buf: bytearray, from which parsed frames are removed
+       returns: list of ( type, id, data )"""
+    frames, pos, size = [], 0, len( buf )
+    while size - pos >= HEADER.size:
+        kind, reqid, length = HEADER.unpack_from( buf, pos )
+        end = pos + HEADER.size + length
+        if end > size:
+            break
+        frames.append( ( kind, reqid, bytes( buf[ pos + HEADER.size:end ] ) ) )
+        pos = end
+    del buf[ :pos ]
+    return frames
+
+
+def quoteCmd( cmd ):
+    "Quote cmd (bytes) as a single-quoted shell word"
+    return b"'" + cmd.replace( b"'", b"'\\''" ) + b"'"
+
+
+def shellLine( cmd, statusfd ):
+    """Return shell input line which evaluates cmd and then reports
+       its exit status and the last background pid on statusfd"""
+    return ( b'eval ' + quoteCmd( cmd ) + b' %d>&- ; ' % statusfd +
+             b'printf \'%%d %%d\\n\' "$?" "${!:-0}" >&%d\n' % statusfd )
+
+
+def setNonBlocking( fd ):
+    "Set O_NONBLOCK on fd"
+    flags = fcntl.fcntl( fd, fcntl.F_GETFL )
+    fcntl.fcntl( fd, fcntl.F_SETFL, flags | os.O_NONBLOCK )
+
+
+class Agent( object ):
+    "Agent process: runs a shell and relays framed requests and replies"
+
+    def __init__( self, name='mininet', infd=0, outfd=1 ):
+        """name: name for shell process (e.g. mininet:h1)
+           infd: file descriptor for requests
+           outfd: file descriptor for replies"""
+        self.name = name
+        self.infd, self.outfd = infd, outfd
+        self.inbuf = bytearray()
+        self.pending = []  # request ids in order of execution
+        self.waiting = deque()  # shell lines for pending[ 1: ]
+        self.statusbuf = b''
+        self.shell = None
+        self.statusR = self.scriptW = self.inputW = None
+        self.statusfd = None  # shell's fd for exit status reports
+        self.queues = {}  # fd -> bytearray of data to write to shell
+        self.poller = None
+
+    def startShell( self ):
+        "Start bash with its script and status pipes"
+        statusR, statusW = os.pipe()
+        scriptR, scriptW = os.pipe()
+        inputR, inputW = os.pipe()
+        # The shell keeps our fd numbers for its status and script
+        # pipes; its own session makes it easy to signal the shell
+        # and all of its children
+        self.shell = Popen( [ 'bash', '--norc', '--noprofile',
+                              '/dev/fd/%d' % scriptR, self.name ],
+                            stdin=inputR, stdout=PIPE, stderr=PIPE,
+                            pass_fds=( statusW, scriptR ),
+                            start_new_session=True )
+        for fd in statusW, scriptR, inputR:
+            os.close( fd )
+        self.statusfd = statusW
+        self.statusR, self.scriptW, self.inputW = statusR, scriptW, inputW
+        for fd in ( self.shell.stdout.fileno(), self.shell.stderr.fileno(),
+                    self.statusR, self.scriptW, self.inputW ):
+            setNonBlocking( fd )
+        self.queues = { self.scriptW: bytearray(), self.inputW: bytearray() }
+        self.send( READY, 0, b'%d' % os.getpid() )
+
+    def send( self, kind, reqid, data=b'' ):
+        "Send a reply frame"
+        frame = packFrame( kind, reqid, data )
+        while frame:
+            try:
+                frame = frame[ os.write( self.outfd, frame ): ]
+            except OSError as e:
+                if e.errno != EINTR:
+                    raise
+
+    def current( self ):
+        "Return id of currently running request, or 0"
+        return self.pending[ 0 ] if self.pending else 0
+
+    def relay( self, fd, kind ):
+        """Relay available output on fd
+           returns: False on EOF"""
+        while True:
+            try:
+                data = os.read( fd, READMAX )
+            except OSError as e:
+                if e.errno == EAGAIN:
+                    return True
+                if e.errno == EINTR:
+                    continue
+                raise
+            if not data:
+                return False
+            self.send( kind, self.current(), data )
+
+    def drain( self ):
+        "Relay any output that is already available"
+        self.relay( self.shell.stdout.fileno(), STDOUT )
+        self.relay( self.shell.stderr.fileno(), STDERR )
+
+    def handleStatus( self ):
+        """Process exit status lines from the shell
+           returns: False on EOF"""
+        try:
+            data = os.read( self.statusR, READMAX )
+        except OSError as e:
+            return e.errno in ( EAGAIN, EINTR )
+        if not data:
+            return False
+        self.statusbuf += data
+        while b'\n' in self.statusbuf:
+            line, self.statusbuf = self.statusbuf.split( b'\n', 1 )
+            # Everything the command wrote is already in our pipes
+            self.drain()
+            if self.pending:
+                self.send( EXIT, self.pending.pop( 0 ), line )
+            if self.waiting:
+                # Only now may the next command start writing output
+                self.queue( self.scriptW, self.waiting.popleft() )
+        return True
+
+    def handleRequests( self ):
+        """Process requests from the node
+           returns: False on EOF"""
+        data = os.read( self.infd, READMAX )
+        if not data:
+            return False
+        self.inbuf += data
+        for kind, reqid, payload in unpackFrames( self.inbuf ):
+            if kind == CMD:
+                self.pending.append( reqid )
+                if len( self.pending ) > 1:
+                    self.waiting.append( shellLine( payload,
+                                                    self.statusfd ) )
+                else:
+                    self.queue( self.scriptW,
+                                shellLine( payload, self.statusfd ) )
+            elif kind == INPUT:
+                self.queue( self.inputW, payload )
+            elif kind == SIGNAL:
+                self.signal( int( payload ) )
+        return True
+
+    def queue( self, fd, data ):
+        "Queue data to write to one of the shell's pipes"
+        self.queues[ fd ] += data
+        self.flush( fd )
+
+    def flush( self, fd ):
+        """Write as much queued data to fd as the shell will take,
+           and poll fd for writing only while data remains"""
+        queue = self.queues[ fd ]
+        while queue:
+            try:
+                del queue[ :os.write( fd, queue ) ]
+            except OSError as e:
+                if e.errno == EAGAIN:
+                    break
+                if e.errno == EINTR:
+                    continue
+                # The shell has gone; so has anything it would read
+                del queue[ : ]
+        if self.poller:
+            if queue:
+                self.poller.register( fd, POLLOUT )
+            else:
+                try:
+                    self.poller.unregister( fd )
+                except KeyError:
+                    pass
+
+    def signal( self, sig ):
+        "Send signal to the shell's process group"
+        try:
+            os.killpg( self.shell.pid, sig )
+        except OSError:
+            pass
+
+    def run( self ):
+        "Main loop: relay requests and replies until shell or node exits"
+        self.startShell()
+        poller = self.poller = poll()
+        # The shell must survive interrupts aimed at its commands
+        self.queue( self.scriptW, b'trap : INT\n' )
+        out, err = self.shell.stdout.fileno(), self.shell.stderr.fileno()
+        for fd in self.infd, out, err, self.statusR:
+            poller.register( fd, POLLIN )
+        running = True
+        while running:
+            try:
+                events = poller.poll()
+            except ( OSError, IOError ) as e:
+                if e.args[ 0 ] == EINTR:
+                    continue
+                raise
+            for fd, event in events:
+                if fd in self.queues:
+                    # Ready for writing (or, on error, never again)
+                    self.flush( fd )
+                    continue
+                if not event & ( POLLIN | POLLHUP | POLLERR ):
+                    continue
+                if fd == self.infd:
+                    running = self.handleRequests()
+                elif fd == self.statusR:
+                    running = self.handleStatus()
+                elif not self.relay( fd, STDOUT if fd == out else STDERR ):
+                    poller.unregister( fd )
+                if not running:
+                    break
+        self.shutdown()
+
+    def shutdown( self ):
+        "Hang up on the shell and its children, and reap it"
+        try:
+            self.drain()
+            for reqid in self.pending:
+                self.send( EXIT, reqid, b'-1 0' )
+        except OSError:
+            # Our node has already hung up on us
+            pass
+        self.signal( signal.SIGHUP )
+        self.shell.wait()
+
+
+class AgentClient( object ):
+    "Node side of the agent protocol"
+
+    def __init__( self, popen ):
+        "popen: Popen object for agent, with stdin and stdout pipes"
+        self.popen = popen
+        self.infd = popen.stdout.fileno()
+        self.outfd = popen.stdin.fileno()
+        setNonBlocking( self.outfd )
+        self.buf = bytearray()
+        self.outbuf = bytearray()  # queued requests
+        self.nextId = 1
+
+    def queue( self, kind, data=b'' ):
+        """Queue a request, to be sent by send() or exchange()
+           kind: CMD, INPUT or SIGNAL
+           data: request data (bytes)
+           returns: request id"""
+        reqid = self.nextId
+        self.nextId = self.nextId % 0xffffffff + 1
+        self.outbuf += packFrame( kind, reqid, data )
+        return reqid
+
+    def flush( self ):
+        "Write as many queued requests as the agent will take"
+        while self.outbuf:
+            try:
+                del self.outbuf[ :os.write( self.outfd, self.outbuf ) ]
+            except OSError as e:
+                if e.errno == EAGAIN:
+                    return
+                if e.errno != EINTR:
+                    raise
+
+    def send( self, kind, data=b'' ):
+        """Send a request to the agent (and any queued requests)
+           kind: CMD, INPUT or SIGNAL
+           data: request data (bytes)
+           returns: request id"""
+        reqid = self.queue( kind, data )
+        poller = poll()
+        poller.register( self.outfd, POLLOUT )
+        self.flush()
+        while self.outbuf:
+            poller.poll()
+            self.flush()
+        return reqid
+
+    def exchange( self ):
+        """Send queued requests while reading replies, so that
+           neither we nor the agent block writing to the other
+           returns: list of complete frames ( type, id, data ) or
+                    None on EOF"""
+        poller = poll()
+        poller.register( self.infd, POLLIN )
+        while True:
+            self.flush()
+            if self.outbuf:
+                poller.register( self.outfd, POLLOUT )
+            else:
+                try:
+                    poller.unregister( self.outfd )
+                except KeyError:
+                    pass
+            for fd, _event in poller.poll():
+                if fd == self.infd:
+                    return self.receive()
+
+    def receive( self, size=READMAX ):
+        """Read from agent, potentially blocking
+           size: maximum number of bytes to read
+           returns: list of complete frames ( type, id, data ) or
+                    None on EOF"""
+        data = os.read( self.infd, size )
+        if not data:
+            return None
+        self.buf += data
+        return unpackFrames( self.buf )
+
+    def waitReady( self ):
+        "Wait for agent to start and return its pid"
+        while True:
+            frames = self.receive()
+            if frames is None:
+                raise Exception( 'agent exited during startup' )
+            for kind, _reqid, data in frames:
+                if kind == READY:
+                    return int( data )
+
+    @staticmethod
+    def parseExit( data ):
+        "Return exitcode, lastpid from EXIT frame data"
+        code, pid = data.split()
+        return int( code ), int( pid )
+
+
+def main():
+    "Run agent for node named in argv"
+    name = sys.argv[ 1 ] if len( sys.argv ) > 1 else 'mininet'
+    agent = Agent( name )
+
+    def hangup( *_args ):
+        "Shut down cleanly when our node hangs up on us"
+        agent.shutdown()
+        os._exit( 0 )  # pylint: disable=protected-access
+
+    signal.signal( signal.SIGHUP, hangup )
+    agent.run()
+
+
+if __name__ == '__main__':
+    main()
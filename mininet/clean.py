@@ -39,15 +39,29 @@ def killprocs( pattern ):
         else:
             break
 
+def deleteLinks( links ):
+    "Delete links (interfaces), in blocks"
+    n = 1000  # chunk size
+    for i in range( 0, len( links ), n ):
+        cmd = ';'.join( 'ip link del %s' % link
+                         for link in links[ i : i + n ] )
+        sh( '( %s ) 2> /dev/null' % cmd )
+
 class Cleanup( object ):
     "Wrapper for cleanup()"
 
     callbacks = []
 
     @classmethod
-    def cleanup( cls):
+    def cleanup( cls, prefix=None ):
         """Clean up junk which might be left over from old runs;
-           do fast stuff before slow dp and link removal!"""
+           do fast stuff before slow dp and link removal!
+           prefix: only clean up the Mininet instance with this
+               node name prefix (see Mininet( prefix=... ))"""
+
+        if prefix:
+            cls.cleanupPrefix( prefix )
+            return
 
         info( "*** Removing excess controllers/ofprotocols/ofdatapaths/"
               "pings/noxes\n" )
@@ -91,12 +105,7 @@ def cleanup( cls):
         links = sh( "ip link show | "
                     "egrep -o '([-_.[:alnum:]]+-eth[[:digit:]]+)'"
                     ).splitlines()
-        # Delete blocks of links
-        n = 1000  # chunk size
-        for i in range( 0, len( links ), n ):
-            cmd = ';'.join( 'ip link del %s' % link
-                             for link in links[ i : i + n ] )
-            sh( '( %s ) 2> /dev/null' % cmd )
+        deleteLinks( links )
 
         if 'tap9' in sh( 'ip link show' ):
             info( "*** Removing tap9 - assuming it's from cluster edition\n" )
@@ -105,6 +114,14 @@ def cleanup( cls):
         info( "*** Killing stale mininet node processes\n" )
         killprocs( 'mininet:' )
 
+        info( "*** Removing stale mininet network namespaces\n" )
+        for ns in sh( "ip netns list | egrep -o '^mininet-[^ ]+'"
+                      ).splitlines():
+            pids = sh( 'ip netns pids ' + ns ).split()
+            if pids:
+                sh( 'kill -9 ' + ' '.join( pids ) )
+            sh( 'ip netns del ' + ns )
+
         info( "*** Shutting down stale tunnels\n" )
         killprocs( 'Tunnel=Ethernet' )
         killprocs( '.ssh/mn')
@@ -116,6 +133,44 @@ def cleanup( cls):
 
         info( "*** Cleanup complete.\n" )
 
+    @classmethod
+    def cleanupPrefix( cls, prefix ):
+        """Clean up a single Mininet instance, leaving any others
+           (and any controllers which aren't Mininet nodes) running
+           prefix: node name prefix of instance to clean up"""
+
+        info( "*** Killing stale %s* node processes\n" % prefix )
+        killprocs( 'mininet:' + prefix )
+
+        info( "*** Removing %s* junk from /tmp\n" % prefix )
+        sh( 'rm -f /tmp/%s*.log /tmp/%s*.listen /tmp/%s*.stats' %
+            ( prefix, prefix, prefix ) )
+
+        info( "*** Removing %s* OVS datapaths\n" % prefix )
+        dps = [ dp for dp in sh( "ovs-vsctl --timeout=1 list-br"
+                                 ).strip().splitlines()
+                if dp.startswith( prefix ) ]
+        if dps:
+            sh( "ovs-vsctl " + " -- ".join( "--if-exists del-br " + dp
+                                            for dp in dps ) )
+
+        info( "*** Removing all links (and bridges) named %s*\n" % prefix )
+        # ip -o link show: 3: s1-eth1@if2: <...> ...
+        links = [ line.split()[ 1 ].split( '@' )[ 0 ].rstrip( ':' )
+                  for line in sh( 'ip -o link show' ).splitlines()
+                  if len( line.split() ) > 1 ]
+        deleteLinks( [ link for link in links if link.startswith( prefix ) ] )
+
+        info( "*** Removing stale %s* network namespaces\n" % prefix )
+        for ns in sh( "ip netns list | egrep -o '^mininet-%s[^ ]*'" % prefix
+                      ).splitlines():
+            pids = sh( 'ip netns pids ' + ns ).split()
+            if pids:
+                sh( 'kill -9 ' + ' '.join( pids ) )
+            sh( 'ip netns del ' + ns )
+
+        info( "*** Cleanup of %s* complete.\n" % prefix )
+
     @classmethod
     def addCleanupCallback( cls, callback ):
         "Add cleanup callback"
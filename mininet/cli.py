@@ -379,6 +379,12 @@ def do_links( self, _line ):
         for link in self.mn.links:
             output( link, link.status(), '\n' )
 
+    def do_shards( self, _line ):
+        "Report switch assignment, connections and load per controller"
+        for controller, stats in self.mn.shardStats().items():
+            output( '%s: %s\n' % ( controller.name, ' '.join(
+                '%s=%s' % item for item in sorted( stats.items() ) ) ) )
+
     def do_switch( self, line ):
         "Starts or stops a switch"
         args = line.split()
@@ -0,0 +1,380 @@
+"""
+daemon.py: keep a Mininet network running and control it over a
+local unix socket
+
+mn --daemon (or MininetDaemon( net ).serve()) keeps a started
+network up and serves JSON-RPC 2.0 requests, one JSON object per
+line, on a unix socket (by default /tmp/<prefix>mininet.sock.)
+Many short-lived test processes can then share one warm network
+rather than each paying for build(), start() and stop(), and
+several clients may be connected at once.
+
+Methods (params are passed by name):
+
+nodes(): names of hosts, switches and controllers
+
+cmd( nodes, command ): run command on a node, a list of nodes, or
+    'hosts' or 'switches', concurrently; returns node -> output
+
+popen( node, args ): run args (list or string) in node's namespace,
+    streaming its output as 'output' notifications with params
+    { id, data }; returns { returncode }
+
+configLink( node1, node2, params ): reconfigure (e.g. TC) both
+    ends of the links between node1 and node2
+
+addHost/addSwitch( name, params ), addLink( node1, node2, params ),
+delNode( name ): change the running network
+
+stats( kind, nodes ): 'intfs' (interface counters), 'flows' or
+    'ports' (OpenFlow statistics from OVS switches)
+
+stop(): stop serving; mn then stops the network
+
+MininetClient is a simple client:
+
+    client = MininetClient()
+    print( client.cmd( nodes=[ 'h1', 'h2' ], command='hostname' ) )
+    for line in client.popen( node='h1', args='ping -c3 h2' ): ...
+"""
+
+import json
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from subprocess import PIPE, STDOUT
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver  # pylint: disable=import-error
+
+from mininet.log import info, debug, error
+from mininet.stats import LinkMonitor
+from mininet.util import decode
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR, INVALID_REQUEST, METHOD_NOT_FOUND = -32700, -32600, -32601
+INVALID_PARAMS, SERVER_ERROR = -32602, -32000
+
+
+def socketPath( prefix='' ):
+    "Default control socket path for a Mininet instance"
+    return '/tmp/%smininet.sock' % prefix
+
+
+class RPCError( Exception ):
+    "Error to be returned to an RPC client"
+
+    def __init__( self, code, message ):
+        Exception.__init__( self, message )
+        self.code = code
+
+
+class MininetDaemon( object ):
+    """Serve a running Mininet network over a unix socket;
+       RPC methods are named do_<method>, as in the CLI"""
+
+    def __init__( self, mininet, path=None ):
+        """mininet: started Mininet network
+           path: control socket path (default: socketPath())"""
+        self.mn = mininet
+        self.path = path or socketPath( getattr( mininet, 'prefix', '' ) )
+        self.lock = threading.RLock()  # for topology changes
+        self.nodeLocks = {}  # node -> Lock for its shell
+        self.server = None
+
+    def serve( self ):
+        "Serve requests until a client calls stop()"
+        if os.path.exists( self.path ):
+            os.unlink( self.path )
+        daemon = self
+
+        class Handler( socketserver.StreamRequestHandler ):
+            "Handle one client connection"
+            def handle( self ):
+                daemon.handle( self.rfile, self.wfile )
+
+        self.server = socketserver.ThreadingUnixStreamServer( self.path,
+                                                              Handler )
+        self.server.daemon_threads = True
+        os.chmod( self.path, 0o600 )
+        info( '*** Serving JSON-RPC requests on %s\n' % self.path )
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if os.path.exists( self.path ):
+                os.unlink( self.path )
+        info( '*** Daemon stopped\n' )
+
+    def handle( self, rfile, wfile ):
+        "Read requests from a client and write responses"
+        wlock = threading.Lock()
+
+        def send( message ):
+            "Write a message, atomically"
+            message[ 'jsonrpc' ] = '2.0'
+            data = ( json.dumps( message ) + '\n' ).encode()
+            with wlock:
+                wfile.write( data )
+                wfile.flush()
+
+        for line in iter( rfile.readline, b'' ):
+            if not line.strip():
+                continue
+            rid = None
+            try:
+                try:
+                    request = json.loads( decode( line ) )
+                except ValueError:
+                    raise RPCError( PARSE_ERROR, 'parse error' )
+                if not isinstance( request, dict ):
+                    raise RPCError( INVALID_REQUEST, 'invalid request' )
+                rid = request.get( 'id' )
+                result = self.dispatch( request, send )
+                response = { 'id': rid, 'result': result }
+            except RPCError as e:
+                response = { 'id': rid, 'error': {
+                    'code': e.code, 'message': str( e ) } }
+            except Exception as e:  # pylint: disable=broad-except
+                debug( 'RPC error: %r\n' % e )
+                response = { 'id': rid, 'error': {
+                    'code': SERVER_ERROR, 'message': '%s: %s' % (
+                        type( e ).__name__, e ) } }
+            try:
+                send( response )
+            except socket.error:
+                break
+
+    def dispatch( self, request, send ):
+        "Call do_<method>( **params ) for request"
+        method = request.get( 'method' )
+        params = request.get( 'params', {} )
+        func = getattr( self, 'do_%s' % method, None )
+        if not func:
+            raise RPCError( METHOD_NOT_FOUND, 'unknown method %s' % method )
+        if not isinstance( params, dict ):
+            raise RPCError( INVALID_PARAMS, 'params must be an object' )
+        if method == 'popen':
+            params[ 'output' ] = lambda data: send( {
+                'method': 'output',
+                'params': { 'id': request.get( 'id' ), 'data': data } } )
+        try:
+            return func( **params )
+        except TypeError as e:
+            raise RPCError( INVALID_PARAMS, str( e ) )
+
+    # Helpers
+
+    def node( self, name ):
+        "Return node with name"
+        if name not in self.mn:
+            raise RPCError( INVALID_PARAMS, 'unknown node %s' % name )
+        return self.mn[ name ]
+
+    def nodes( self, names ):
+        """Return ( name, node ) pairs for names: a node name, a list
+           of names, or 'hosts' or 'switches'"""
+        if names in ( 'hosts', 'switches' ) and names not in self.mn:
+            return [ ( node.name, node )
+                     for node in getattr( self.mn, names ) ]
+        if not isinstance( names, list ):
+            names = [ names ]
+        return [ ( name, self.node( name ) ) for name in names ]
+
+    @contextmanager
+    def locked( self, nodes ):
+        "Hold the shell locks for nodes (in a consistent order)"
+        with self.lock:
+            locks = [ self.nodeLocks.setdefault( node, threading.Lock() )
+                      for node in sorted( set( nodes ),
+                                          key=lambda n: n.name ) ]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed( locks ):
+                lock.release()
+
+    def changed( self ):
+        "Update the network's state file, if any, after a change"
+        if getattr( self.mn, 'stateFile', None ):
+            self.mn.saveState()
+
+    # RPC methods
+
+    def do_nodes( self ):
+        "Return names of hosts, switches and controllers"
+        return dict( ( kind, [ node.name for node in
+                               getattr( self.mn, kind ) ] )
+                     for kind in ( 'hosts', 'switches', 'controllers' ) )
+
+    def do_cmd( self, nodes, command ):
+        "Run command on nodes concurrently; return name -> output"
+        pairs = self.nodes( nodes )
+        with self.locked( [ node for _name, node in pairs ] ):
+            for _name, node in pairs:
+                node.sendCmd( command )
+            return dict( ( name, node.waitOutput() )
+                         for name, node in pairs )
+
+    def do_popen( self, node, args, output ):
+        """Run args in node's namespace, calling output() with each
+           line of its output; return its exit status"""
+        proc = self.node( node ).popen( args, stdout=PIPE, stderr=STDOUT )
+        try:
+            for line in iter( proc.stdout.readline, b'' ):
+                output( decode( line ) )
+        except socket.error:
+            # Client went away
+            proc.kill()
+        finally:
+            proc.stdout.close()
+        return { 'returncode': proc.wait() }
+
+    def do_configLink( self, node1, node2, params ):
+        "Reconfigure both ends of the links between node1 and node2"
+        links = self.mn.linksBetween( self.node( node1 ),
+                                      self.node( node2 ) )
+        if not links:
+            raise RPCError( INVALID_PARAMS, 'no link between %s and %s' %
+                            ( node1, node2 ) )
+        with self.locked( [ self.node( node1 ), self.node( node2 ) ] ):
+            for link in links:
+                link.intf1.config( **params )
+                link.intf2.config( **params )
+        return len( links )
+
+    def do_addHost( self, name, params=None ):
+        "Add and configure a host"
+        with self.lock:
+            host = self.mn.addHost( name, **( params or {} ) )
+            host.configDefault()
+            self.changed()
+        return host.name
+
+    def do_addSwitch( self, name, params=None ):
+        "Add and start a switch"
+        with self.lock:
+            switch = self.mn.addSwitch( name, **( params or {} ) )
+            self.mn.startSwitch( switch )
+            self.changed()
+        return switch.name
+
+    def do_addLink( self, node1, node2, params=None ):
+        "Add a link, attaching it to any running switches"
+        with self.lock:
+            link = self.mn.addLink( self.node( node1 ), self.node( node2 ),
+                                    **( params or {} ) )
+            for intf in link.intf1, link.intf2:
+                if hasattr( intf.node, 'attach' ):
+                    intf.node.attach( intf )
+            self.changed()
+        return [ link.intf1.name, link.intf2.name ]
+
+    def do_delNode( self, name ):
+        "Delete a node and its links"
+        node = self.node( name )
+        with self.lock, self.locked( [ node ] ):
+            for link in [ link for link in self.mn.links
+                          if node in ( link.intf1.node, link.intf2.node ) ]:
+                for intf in link.intf1, link.intf2:
+                    if intf.node is not node and hasattr( intf.node,
+                                                          'detach' ):
+                        intf.node.detach( intf )
+                self.mn.delLink( link )
+            self.mn.delNode( node )
+            self.nodeLocks.pop( node, None )
+            self.changed()
+        return True
+
+    def do_stats( self, kind='intfs', nodes=None ):
+        """Return statistics: 'intfs' (node -> intf -> counters),
+           or 'flows' or 'ports' (switch -> OpenFlow statistics)"""
+        if kind == 'intfs':
+            targets = ( [ node for _name, node in self.nodes( nodes ) ]
+                        if nodes else self.mn.hosts + self.mn.switches )
+            monitor = LinkMonitor( targets, capacity=1 )
+            try:
+                monitor.sample()
+            finally:
+                monitor.stop()
+            width, stats = len( monitor.fields ), {}
+            for i, intf in enumerate( monitor.intfs ):
+                values = monitor.row[ i * width: ( i + 1 ) * width ]
+                stats.setdefault( intf.node.name, {} )[ intf.name ] = dict(
+                    zip( monitor.fields, [ int( v ) for v in values ] ) )
+            return stats
+        if kind in ( 'flows', 'ports' ):
+            switches = ( [ node for _name, node in self.nodes( nodes ) ]
+                         if nodes else None )
+            method = getattr( self.mn, kind[ :-1 ] + 'Stats' )
+            return dict( ( switch.name, result ) for switch, result in
+                         method( switches ).items() )
+        raise RPCError( INVALID_PARAMS, 'unknown stats kind %s' % kind )
+
+    def do_stop( self ):
+        "Stop serving (from another thread, since we are serving)"
+        threading.Thread( target=self.server.shutdown ).start()
+        return True
+
+
+class MininetClient( object ):
+    "Simple blocking client for MininetDaemon"
+
+    def __init__( self, path=None ):
+        "path: control socket path (default: socketPath())"
+        self.sock = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        self.sock.connect( path or socketPath() )
+        self.rfile = self.sock.makefile( 'rb' )
+        self.lastId = 0
+        self.result = None  # result of last request
+        self.returncode = None  # exit status of last popen()
+
+    def request( self, method, params ):
+        "Send a request and return its id"
+        self.lastId += 1
+        self.sock.sendall( ( json.dumps( {
+            'jsonrpc': '2.0', 'id': self.lastId, 'method': method,
+            'params': params } ) + '\n' ).encode() )
+        return self.lastId
+
+    def responses( self, rid ):
+        """Yield output notifications for request rid, then its
+           result, raising an Exception if it failed"""
+        for line in iter( self.rfile.readline, b'' ):
+            message = json.loads( decode( line ) )
+            if message.get( 'method' ) == 'output':
+                yield message[ 'params' ][ 'data' ]
+            elif message.get( 'id' ) == rid:
+                if 'error' in message:
+                    raise Exception( message[ 'error' ][ 'message' ] )
+                self.result = message[ 'result' ]
+                return
+        raise Exception( 'connection closed' )
+
+    def call( self, method, **params ):
+        "Call method( **params ) and return its result"
+        for data in self.responses( self.request( method, params ) ):
+            error( 'unexpected output: %s' % data )
+        return self.result
+
+    def popen( self, **params ):
+        "Run a command (see do_popen), yielding its output lines"
+        for data in self.responses( self.request( 'popen', params ) ):
+            yield data
+        self.returncode = self.result[ 'returncode' ]
+
+    def close( self ):
+        "Close our connection"
+        self.rfile.close()
+        self.sock.close()
+
+    def __getattr__( self, method ):
+        "client.cmd( ... ) etc. call the corresponding RPC method"
+        if method.startswith( '_' ):
+            raise AttributeError( method )
+        return lambda **params: self.call( method, **params )
@@ -0,0 +1,225 @@
+"""
+diff.py: apply a new topology to a running network
+
+Mininet builds a network from a Topo once. To change a running
+network into one built from another Topo, net.apply( topo ) uses
+TopoDiff, which compares the two and changes only what differs:
+
+- links whose only differences are TC options (bw, delay, loss...)
+  are reconfigured in place
+
+- links which are gone, or whose other options changed, are removed,
+  and their switch ports detached
+
+- nodes which are gone, or whose options changed, are removed
+
+- new nodes and links are added, and new switch ports attached
+
+Links are matched by their (short) node names, and by order where
+there are several links between the same two nodes; existing links
+keep their port numbers.
+
+Switch port changes are batched per switch class, using the class's
+batchAttach()/batchDetach() methods if it has them (e.g. a single
+ovs-vsctl for all OVSSwitches), and veth pairs in the root namespace
+are deleted with a single ip -batch.
+"""
+
+from mininet.log import info
+from mininet.link import TCIntf
+from mininet.nodelib import ipBatch
+
+# TC options which may be changed without recreating a link
+TCPARAMS = ( 'bw', 'delay', 'jitter', 'loss', 'max_queue_size', 'speedup',
+             'use_hfsc', 'use_tbf', 'latency_ms', 'enable_ecn',
+             'enable_red', 'gro', 'txo', 'rxo' )
+
+
+def linkOpts( params, reverse=False ):
+    """Return link options which matter for comparison (without
+       nodes and ports), swapping per-end options if reverse"""
+    opts = dict( ( k, v ) for k, v in params.items()
+                 if k not in ( 'node1', 'node2', 'port1', 'port2' ) )
+    if reverse:
+        opts = dict( ( k[ :-1 ] + { '1': '2', '2': '1' }[ k[ -1 ] ]
+                       if k[ -1: ] in ( '1', '2' ) else k, v )
+                     for k, v in opts.items() )
+    return opts
+
+
+class TopoDiff( object ):
+    "Differences between a running Mininet and a target Topo"
+
+    def __init__( self, net, topo ):
+        """net: running Mininet
+           topo: target Topo"""
+        self.net, self.topo = net, topo
+        nodes = dict( ( net.shortName( node ), node )
+                      for node in net.hosts + net.switches )
+        # Nodes which are gone or changed
+        self.delNodes = [ node for name, node in nodes.items()
+                          if name not in topo.g.node or
+                          net.nodeOpts.get( name, topo.nodeInfo( name ) )
+                          != topo.nodeInfo( name ) ]
+        gone = set( net.shortName( node ) for node in self.delNodes )
+        self.addNodes = [ name for name in topo.nodes()
+                          if name not in nodes or name in gone ]
+        # Match links by node pair, in order
+        old, new = {}, {}
+        for link in net.links:
+            names = ( net.shortName( link.intf1.node ),
+                      net.shortName( link.intf2.node ) )
+            old.setdefault( tuple( sorted( names ) ), [] ).append( link )
+        for src, dst, params in topo.links( sort=True, withInfo=True ):
+            new.setdefault( tuple( sorted( ( src, dst ) ) ), [] ).append(
+                params )
+        self.delLinks, self.addLinks, self.tcLinks = [], [], []
+        for pair in set( old ) | set( new ):
+            links, targets = old.get( pair, [] ), new.get( pair, [] )
+            for i in range( max( len( links ), len( targets ) ) ):
+                link = links[ i ] if i < len( links ) else None
+                target = targets[ i ] if i < len( targets ) else None
+                self.compare( link, target, gone )
+
+    def compare( self, link, target, gone ):
+        "Decide what to do with a link and its target (if any)"
+        net = self.net
+        if link and target and not gone.intersection(
+                net.shortName( intf.node )
+                for intf in ( link.intf1, link.intf2 ) ):
+            current = net.linkOpts.get( link )
+            if current is None:
+                # Not from a topo: nothing to compare, so keep it
+                return
+            reverse = net.shortName( link.intf1.node ) != target[ 'node1' ]
+            current = linkOpts( current )
+            wanted = linkOpts( target, reverse )
+            if current == wanted:
+                return
+            changed = set( k for k in set( current ) | set( wanted )
+                           if current.get( k ) != wanted.get( k ) )
+            if ( changed.issubset( TCPARAMS ) and
+                 isinstance( link.intf1, TCIntf ) and
+                 isinstance( link.intf2, TCIntf ) ):
+                self.tcLinks.append( ( link, target ) )
+                return
+        if link:
+            self.delLinks.append( link )
+        if target:
+            self.addLinks.append( target )
+
+    def __len__( self ):
+        "Number of changes"
+        return ( len( self.delNodes ) + len( self.addNodes ) +
+                 len( self.delLinks ) + len( self.addLinks ) +
+                 len( self.tcLinks ) )
+
+    def __str__( self ):
+        return ( '-%d/+%d nodes, -%d/+%d links, %d TC changes' % (
+            len( self.delNodes ), len( self.addNodes ),
+            len( self.delLinks ), len( self.addLinks ),
+            len( self.tcLinks ) ) )
+
+    def apply( self ):
+        "Change the network to match our topo"
+        net = self.net
+        info( '*** Applying changes: %s\n' % self )
+        for link, target in self.tcLinks:
+            params = dict( ( k, v ) for k, v in target.items()
+                           if k in TCPARAMS )
+            for intf in link.intf1, link.intf2:
+                if not params:
+                    # config() leaves existing shaping alone
+                    intf.tc( '%s qdisc del dev %s root' )
+                intf.config( **params )
+            net.linkOpts[ link ] = dict( target )
+        self.removeLinks( self.delLinks )
+        for node in self.delNodes:
+            net.delNode( node )
+        touched = set()
+        for name in self.addNodes:
+            params = dict( self.topo.nodeInfo( name ) )
+            if self.topo.isSwitch( name ):
+                touched.add( net.addSwitch( name, **params ) )
+            else:
+                touched.add( net.addHost( name, **params ) )
+            net.nodeOpts[ name ] = dict( self.topo.nodeInfo( name ) )
+        new = set( touched )
+        intfs = []
+        for target in self.addLinks:
+            params = dict( target )
+            for end in '1', '2':
+                # Keep topo port numbers unless they're taken
+                node = net[ params[ 'node' + end ] ]
+                if params.get( 'port' + end ) in node.intfs:
+                    params.pop( 'port' + end )
+            link = net.addLink( **params )
+            net.linkOpts[ link ] = dict( target )
+            for intf in link.intf1, link.intf2:
+                touched.add( intf.node )
+                if intf.node not in new:
+                    intfs.append( intf )
+        self.attachIntfs( [ intf for intf in intfs
+                            if intf.node in net.switches ] )
+        for switch in net.switches:
+            if switch in new:
+                net.startSwitch( switch )
+        for host in net.hosts:
+            if host in touched:
+                host.configDefault()
+        net.topo = self.topo
+        return self
+
+    def removeLinks( self, links ):
+        """Remove links, detaching their switch ports first, and
+           deleting veths in the root namespace with one ip -batch"""
+        net = self.net
+        self.batchPorts( [ intf for link in links
+                           for intf in ( link.intf1, link.intf2 )
+                           if intf.node in net.switches ],
+                         'batchDetach', 'detach' )
+        cmds = []
+        for link in links:
+            intf1, intf2 = link.intf1, link.intf2
+            local = [ intf for intf in ( intf1, intf2 )
+                      if not intf.node.inNamespace ]
+            if local:
+                # Deleting either end of a veth pair deletes both
+                cmds.append( 'link del %s' % local[ 0 ] )
+                intf1.node.delIntf( intf1 )
+                intf2.node.delIntf( intf2 )
+                net.links.remove( link )
+                net.linkOpts.pop( link, None )
+            else:
+                net.delLink( link )
+        ipBatch( cmds )
+
+    def attachIntfs( self, intfs ):
+        "Attach new ports to running switches"
+        self.batchPorts( intfs, 'batchAttach', 'attach' )
+
+    def batchPorts( self, intfs, batchMethod, method ):
+        """Attach or detach switch ports, in batches per switch class
+           where possible, or else one at a time; switches which
+           can't attach ports are restarted (and deleting a port's
+           veth detaches it from switches which can't detach it)
+           intfs: switch interfaces
+           batchMethod: batch class method name
+           method: instance method name"""
+        pairs = {}
+        for intf in intfs:
+            pairs.setdefault( type( intf.node ), [] ).append(
+                ( intf.node, intf ) )
+        for cls, clsPairs in pairs.items():
+            if hasattr( cls, batchMethod ):
+                getattr( cls, batchMethod )( clsPairs )
+                continue
+            restart = set()
+            for switch, intf in clsPairs:
+                if hasattr( switch, method ):
+                    getattr( switch, method )( intf )
+                elif method == 'attach':
+                    restart.add( switch )
+            for switch in restart:
+                switch.stop( deleteIntfs=False )
+                self.net.startSwitch( switch )
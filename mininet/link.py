@@ -42,6 +42,8 @@ def __init__( self, name, node=None, port=None, link=None,
         """name: interface name (e.g. h1-eth0)
            node: owning node (where this intf most likely lives)
            link: parent link if we're part of a link
+           attached: interface exists and is configured already
+               (see Mininet.attach()), so don't move or configure it
            other arguments are passed to config()"""
         self.node = node
         self.name = name
@@ -54,16 +56,20 @@ def __init__( self, name, node=None, port=None, link=None,
         if self.name == 'lo':
             self.ip = '127.0.0.1'
             self.prefixLen = 8
+        attached = params.pop( 'attached', False )
         # Add to node (and move ourselves if necessary )
         if node:
             moveIntfFn = params.pop( 'moveIntfFn', None )
-            if moveIntfFn:
+            if attached:
+                node.addIntf( self, port=port, moveIntfFn=Link._ignore )
+            elif moveIntfFn:
                 node.addIntf( self, port=port, moveIntfFn=moveIntfFn )
             else:
                 node.addIntf( self, port=port )
         # Save params for future reference
         self.params = params
-        self.config( **params )
+        if not attached:
+            self.config( **params )
 
     def cmd( self, *args, **kwargs ):
         "Run a command in our owning node"
@@ -98,8 +104,18 @@ def setMAC( self, macstr ):
     _ipMatchRegex = re.compile( r'\d+\.\d+\.\d+\.\d+' )
     _macMatchRegex = re.compile( r'..:..:..:..:..:..' )
 
+    def linkState( self ):
+        """Return our current LinkState, if our node is watched by a
+           LinkStateMonitor (see mininet.linkstate), or None"""
+        monitor = getattr( self.node, 'linkMonitor', None )
+        return monitor.lookup( self ) if monitor else None
+
     def updateIP( self ):
         "Return updated IP address based on ifconfig"
+        state = self.linkState()
+        if state:
+            self.ip = state.ip
+            return self.ip
         # use pexec instead of node.cmd so that we dont read
         # backgrounded output from the cli.
         ifconfig, _err, _exitCode = self.node.pexec(
@@ -110,6 +126,10 @@ def updateIP( self ):
 
     def updateMAC( self ):
         "Return updated MAC address based on ifconfig"
+        state = self.linkState()
+        if state:
+            self.mac = state.mac
+            return self.mac
         ifconfig = self.ifconfig()
         macs = self._macMatchRegex.findall( ifconfig )
         self.mac = macs[ 0 ] if macs else None
@@ -121,6 +141,10 @@ def updateMAC( self ):
 
     def updateAddr( self ):
         "Return IP address and MAC address based on ifconfig."
+        state = self.linkState()
+        if state:
+            self.ip, self.mac = state.ip, state.mac
+            return self.ip, self.mac
         ifconfig = self.ifconfig()
         ips = self._ipMatchRegex.findall( ifconfig )
         macs = self._macMatchRegex.findall( ifconfig )
@@ -130,11 +154,13 @@ def updateAddr( self ):
 
     def IP( self ):
         "Return IP address"
-        return self.ip
+        state = self.linkState()
+        return state.ip if state else self.ip
 
     def MAC( self ):
         "Return MAC address"
-        return self.mac
+        state = self.linkState()
+        return state.mac if state else self.mac
 
     def isUp( self, setUp=False ):
         "Return whether interface is up"
@@ -147,6 +173,9 @@ def isUp( self, setUp=False ):
             else:
                 return True
         else:
+            state = self.linkState()
+            if state:
+                return state.up
             return "UP" in self.ifconfig()
 
     def rename( self, newname ):
@@ -215,6 +244,8 @@ def delete( self ):
 
     def status( self ):
         "Return intf status as a string"
+        if getattr( self.node, 'linkMonitor', None ):
+            return "OK" if self.linkState() else "MISSING"
         links, _err, _result = self.node.pexec( 'ip link show' )
         if self.name in links:
             return "OK"
@@ -237,6 +268,10 @@ class TCIntf( Intf ):
     # For higher data rates, we will probably need to change them.
     bwParamMax = 1000
 
+    # Deferred tc commands (without 'tc') and expected root qdisc
+    # kind, if our node defers shaping (see batchShape())
+    pendingTC, rootQdisc = None, None
+
     def bwCmds( self, bw=None, speedup=0, use_hfsc=False, use_tbf=False,
                 latency_ms=None, enable_ecn=False, enable_red=False ):
         "Return tc commands to set bandwidth"
@@ -355,31 +390,23 @@ def on( isOn ):
 
         # Optimization: return if nothing else to configure
         # Question: what happens if we want to reset things?
+        self.pendingTC = None
         if ( bw is None and not delay and not loss
              and max_queue_size is None ):
             return None
 
-        # Clear existing configuration
-        tcoutput = self.tc( '%s qdisc show dev %s' )
-        if "priomap" not in tcoutput and "noqueue" not in tcoutput:
-            cmds = [ '%s qdisc del dev %s root' ]
-        else:
-            cmds = []
-
         # Bandwidth limits via various methods
         bwcmds, parent = self.bwCmds( bw=bw, speedup=speedup,
                                       use_hfsc=use_hfsc, use_tbf=use_tbf,
                                       latency_ms=latency_ms,
                                       enable_ecn=enable_ecn,
                                       enable_red=enable_red )
-        cmds += bwcmds
 
         # Delay/jitter/loss/max_queue_size using netem
         delaycmds, parent = self.delayCmds( delay=delay, jitter=jitter,
                                             loss=loss,
                                             max_queue_size=max_queue_size,
                                             parent=parent )
-        cmds += delaycmds
 
         # Ugly but functional: display configuration info
         stuff = ( ( [ '%.2fMbit' % bw ] if bw is not None else [] ) +
@@ -390,6 +417,25 @@ def on( isOn ):
                     if enable_red else [] ) )
         info( '(' + ' '.join( stuff ) + ') ' )
 
+        if self.deferred():
+            # Save our commands for batchShape(); they replace rather
+            # than add, so that they work whatever qdiscs we have then
+            self.pendingTC = [ ( cmd % ( '', self ) ).strip().replace(
+                ' add ', ' replace ', 1 ) for cmd in bwcmds + delaycmds ]
+            kinds = re.findall( r'root\s+handle \S+ (\w+)',
+                                ' '.join( self.pendingTC ) )
+            self.rootQdisc = kinds[ 0 ] if kinds else None
+            result.update( tcoutputs=[], parent=parent )
+            return result
+
+        # Clear existing configuration
+        tcoutput = self.tc( '%s qdisc show dev %s' )
+        if "priomap" not in tcoutput and "noqueue" not in tcoutput:
+            cmds = [ '%s qdisc del dev %s root' ]
+        else:
+            cmds = []
+        cmds += bwcmds + delaycmds
+
         # Execute all the commands in our node
         debug("at map stage w/cmds: %s\n" % cmds)
         tcoutputs = [ self.tc(cmd) for cmd in cmds ]
@@ -403,6 +449,46 @@ def on( isOn ):
 
         return result
 
+    def deferred( self ):
+        """Does our node defer shaping until its network has started
+           its switches (see Mininet.shapeLinks())?"""
+        return getattr( self.node, 'deferTC', False )
+
+    @staticmethod
+    def batchShape( intfs ):
+        """Apply deferred shaping (see config()) for intfs, with one
+           tc -batch per node, and check that each intf's root qdisc
+           is what we asked for
+           intfs: TCIntfs with pendingTC commands
+           returns: list of intfs whose shaping failed"""
+        # Deferred import (nodelib imports node, which imports us)
+        from mininet.nodelib import tcBatch  # pylint: disable=cyclic-import
+        nodes = {}
+        for intf in intfs:
+            nodes.setdefault( intf.node, [] ).append( intf )
+        failed = []
+        for node, nodeIntfs in nodes.items():
+            cmds = sum( ( intf.pendingTC for intf in nodeIntfs ), [] )
+            debug( '*** %s: tc batch %s\n' % ( node, cmds ) )
+            output = tcBatch( cmds + [ 'qdisc show' ], node=node )
+            lines = output.splitlines()
+            errors = [ line for line in lines
+                       if not line.startswith( 'qdisc ' ) ]
+            if errors:
+                error( '*** Error shaping %s: %s\n' %
+                       ( node, '\n'.join( errors ) ) )
+            for intf in nodeIntfs:
+                kinds = [ line.split()[ 1 ] for line in lines
+                          if re.match( r'qdisc \S+ \S+ dev %s root' %
+                                       re.escape( intf.name ), line ) ]
+                if intf.rootQdisc and kinds != [ intf.rootQdisc ]:
+                    error( '*** Error: %s has root qdisc %s, not %s\n' %
+                           ( intf, ','.join( kinds ) or 'none',
+                             intf.rootQdisc ) )
+                    failed.append( intf )
+                intf.pendingTC = None
+        return failed
+
 
 class Link( object ):
 
@@ -473,6 +559,18 @@ def __init__( self, node1, node2, port1=None, port2=None,
 
     # pylint: enable=too-many-branches
 
+    @classmethod
+    def attach( cls, intf1, intf2 ):
+        """Return a link made of two existing (attached) interfaces,
+           without creating or configuring anything
+           intf1: first interface
+           intf2: second interface"""
+        link = cls.__new__( cls )
+        link.fast = True
+        link.intf1, link.intf2 = intf1, intf2
+        intf1.link = intf2.link = link
+        return link
+
     @staticmethod
     def _ignore( *args, **kwargs ):
         "Ignore any arguments"
@@ -551,6 +649,13 @@ def __init__( self, node1, node2, **kwargs ):
             kwargs.update( cls1=OVSIntf, cls2=OVSIntf )
         Link.__init__( self, node1, node2, **kwargs )
 
+    @classmethod
+    def attach( cls, intf1, intf2 ):
+        "See Link.attach()"
+        link = super( OVSLink, cls ).attach( intf1, intf2 )
+        link.isPatchLink = isinstance( intf1, OVSIntf )
+        return link
+
     # pylint: disable=arguments-differ, signature-differs
     def makeIntfPair( self, *args, **kwargs ):
         "Usually delegated to OVSSwitch"
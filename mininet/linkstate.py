@@ -0,0 +1,341 @@
+"""
+linkstate.py: event-driven interface state from rtnetlink
+
+Intf.IP() and MAC() normally return the values which were set when
+the interface was configured, and go stale if anything else changes
+the interface; finding out the real state (updateIP(), updateAddr(),
+isUp(), status()) costs a command or a fork per lookup.
+
+A LinkStateMonitor instead subscribes to rtnetlink link and IPv4
+address events in each node's network namespace (one socket per
+namespace, created by the Mininet process itself), and keeps a
+LinkState for every interface:
+
+- name, index, mac
+- up (IFF_UP), operstate ('up', 'down', 'lowerlayerdown'...) and
+  carrier
+- addrs: list of ( ip, prefixLen ), and ip/prefixLen for the first
+
+While a node is watched, its Intfs' IP(), MAC(), updateIP(),
+updateMAC(), updateAddr(), isUp() and status() use this state rather
+than their configured values or commands. Lookups first apply any
+events which are already queued on the namespace's socket (a single
+non-blocking recv), so they reflect every change which completed
+before the lookup.
+
+Callbacks ( fn( intf, field, old, new ) ) are called for each change,
+from the monitor's thread or from a lookup; intf is the Intf, or the
+interface name if it has no Intf. field is 'present' when an
+interface appears or disappears.
+
+Mininet( linkState=True ) watches all hosts and switches when it
+starts; net.watchLinks() starts a monitor explicitly.
+"""
+
+import errno
+import os
+import select
+import socket
+import struct
+from threading import RLock
+
+from mininet.log import debug, error
+from mininet.stats import ( Monitor, NLMSG, NLMSG_ERROR, NLMSG_DONE,
+                            NLM_F_REQUEST, NLM_F_DUMP, parseAttrs, align4 )
+
+# rtnetlink link and address messages (see rtnetlink(7))
+RTM_NEWLINK, RTM_DELLINK, RTM_GETLINK = 16, 17, 18
+RTM_NEWADDR, RTM_DELADDR, RTM_GETADDR = 20, 21, 22
+RTMGRP_LINK, RTMGRP_IPV4_IFADDR = 0x1, 0x10
+IFINFOMSG = struct.Struct( '=BxHiII' )  # family, type, index, flags, change
+IFADDRMSG = struct.Struct( '=BBBBI' )  # family, prefixlen, flags, scope, index
+IFLA_ADDRESS, IFLA_IFNAME, IFLA_OPERSTATE, IFLA_CARRIER = 1, 3, 16, 33
+IFA_ADDRESS, IFA_LOCAL = 1, 2
+IFF_UP = 0x1
+AF_BRIDGE = 7  # bridge port messages, which we ignore
+OPERSTATES = ( 'unknown', 'notpresent', 'down', 'lowerlayerdown',
+               'testing', 'dormant', 'up' )
+
+
+class LinkState( object ):
+    "Current state of an interface, as reported by rtnetlink"
+
+    __slots__ = ( 'name', 'index', 'mac', 'up', 'operstate', 'carrier',
+                  'addrs' )
+
+    def __init__( self, name, index ):
+        self.name, self.index = name, index
+        self.mac, self.up, self.operstate, self.carrier = (
+            None, False, 'unknown', False )
+        self.addrs = []  # [ ( ip, prefixLen ) ]
+
+    @property
+    def ip( self ):
+        "Our first IPv4 address, or None"
+        return self.addrs[ 0 ][ 0 ] if self.addrs else None
+
+    @property
+    def prefixLen( self ):
+        "Prefix length of our first IPv4 address, or None"
+        return self.addrs[ 0 ][ 1 ] if self.addrs else None
+
+    def __repr__( self ):
+        return '<LinkState %s %s %s %s>' % (
+            self.name, self.mac, self.operstate,
+            ','.join( '%s/%d' % addr for addr in self.addrs ) or '-' )
+
+
+class NetnsLinks( object ):
+    "rtnetlink subscription and LinkStates for one network namespace"
+
+    def __init__( self, node ):
+        "node: a node in the namespace we watch"
+        self.nodes = []
+        self.links = {}  # name -> LinkState
+        self.names = {}  # ifindex -> name
+        self.sock = node.socket( socket.AF_NETLINK, socket.SOCK_RAW,
+                                 socket.NETLINK_ROUTE )
+        self.sock.setsockopt( socket.SOL_SOCKET, socket.SO_RCVBUF,
+                              1 << 20 )
+        self.sock.bind( ( 0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR ) )
+        self.seq = 0
+
+    def request( self, kind, body ):
+        "Send a dump request"
+        self.seq += 1
+        self.sock.send( NLMSG.pack( NLMSG.size + len( body ), kind,
+                                    NLM_F_REQUEST | NLM_F_DUMP,
+                                    self.seq, 0 ) + body )
+
+    def intf( self, name ):
+        "Return the Intf called name in our namespace, or name"
+        for node in self.nodes:
+            intf = node.nameToIntf.get( name )
+            if intf:
+                return intf
+        return name
+
+    def close( self ):
+        "Close our socket"
+        self.sock.close()
+
+
+class LinkStateMonitor( Monitor ):
+    """Keep LinkStates for the interfaces of a set of nodes, using one
+       rtnetlink subscription per network namespace"""
+
+    def __init__( self, nodes=(), interval=.5 ):
+        """nodes: nodes to watch
+           interval: how often our thread checks for new namespaces"""
+        Monitor.__init__( self, interval )
+        self.lock = RLock()
+        self.watches = {}  # namespace inode -> NetnsLinks
+        self.byNode = {}  # node -> NetnsLinks
+        self.callbacks = []
+        self.add( nodes )
+
+    def add( self, nodes ):
+        "Start watching nodes (and their namespaces)"
+        with self.lock:
+            for node in nodes:
+                if node in self.byNode:
+                    continue
+                try:
+                    key = os.stat( node.netnsPath() ).st_ino
+                except ( OSError, TypeError ):
+                    debug( 'not watching', node, '(no namespace)\n' )
+                    continue
+                watch = self.watches.get( key )
+                if watch is None:
+                    watch = self.watches[ key ] = NetnsLinks( node )
+                    self.dump( watch )
+                watch.nodes.append( node )
+                self.byNode[ node ] = watch
+                node.linkMonitor = self
+
+    def remove( self, node ):
+        "Stop watching node"
+        with self.lock:
+            watch = self.byNode.pop( node, None )
+            node.linkMonitor = None
+            if watch is None:
+                return
+            watch.nodes.remove( node )
+            if not watch.nodes:
+                watch.close()
+                self.watches = dict( ( key, w ) for key, w
+                                     in self.watches.items()
+                                     if w is not watch )
+
+    def addCallback( self, fn ):
+        """Call fn( intf, field, old, new ) for each change to an
+           interface's state"""
+        self.callbacks.append( fn )
+
+    def lookup( self, intf ):
+        """Return the current LinkState for intf, or None if it isn't
+           in a watched namespace"""
+        watch = self.byNode.get( intf.node )
+        if watch is None:
+            return None
+        with self.lock:
+            self.receive( watch )
+            return watch.links.get( intf.name )
+
+    def dump( self, watch ):
+        "Fetch all links and IPv4 addresses in watch's namespace"
+        for kind, body in ( ( RTM_GETLINK,
+                              IFINFOMSG.pack( 0, 0, 0, 0, 0 ) ),
+                            ( RTM_GETADDR,
+                              IFADDRMSG.pack( socket.AF_INET, 0, 0, 0,
+                                              0 ) ) ):
+            watch.request( kind, body )
+            while not self.parse( watch, watch.sock.recv( 1 << 16 ) ):
+                pass
+
+    def receive( self, watch ):
+        "Apply any events which are queued on watch's socket"
+        while True:
+            try:
+                data = watch.sock.recv( 1 << 16, socket.MSG_DONTWAIT )
+            except ( BlockingIOError, InterruptedError ):
+                return
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # We missed events, so start over
+                debug( '*** LinkStateMonitor: resyncing after overrun\n' )
+                for name in list( watch.links ):
+                    self.notify( watch, name, 'present', True, False )
+                watch.links, watch.names = {}, {}
+                self.dump( watch )
+                continue
+            self.parse( watch, data )
+
+    def parse( self, watch, data ):
+        """Apply a buffer of rtnetlink messages to watch
+           returns: True if it ended a dump"""
+        pos, done = 0, False
+        while pos + NLMSG.size <= len( data ):
+            length, kind, _flags, _seq, _pid = NLMSG.unpack_from( data, pos )
+            if length < NLMSG.size:
+                break
+            body, end = pos + NLMSG.size, pos + length
+            if kind == NLMSG_DONE:
+                done = True
+            elif kind == NLMSG_ERROR:
+                err = struct.unpack_from( '=i', data, body )[ 0 ]
+                if err:
+                    raise OSError( -err, os.strerror( -err ) )
+            elif kind in ( RTM_NEWLINK, RTM_DELLINK ):
+                self.linkMsg( watch, data, body, end,
+                              deleted=kind == RTM_DELLINK )
+            elif kind in ( RTM_NEWADDR, RTM_DELADDR ):
+                self.addrMsg( watch, data, body, end,
+                              deleted=kind == RTM_DELADDR )
+            pos += align4( length )
+        return done
+
+    def linkMsg( self, watch, data, body, end, deleted ):
+        "Apply an RTM_NEWLINK or RTM_DELLINK message"
+        family, _type, index, flags, _change = IFINFOMSG.unpack_from(
+            data, body )
+        if family == AF_BRIDGE:
+            return
+        attrs = parseAttrs( data, body + IFINFOMSG.size, end )
+        name = attrs.get( IFLA_IFNAME, b'' ).rstrip( b'\0' ).decode()
+        oldName = watch.names.get( index )
+        name = name or oldName
+        if deleted:
+            watch.names.pop( index, None )
+            if watch.links.pop( oldName or name, None ):
+                self.notify( watch, name, 'present', True, False )
+            return
+        state = watch.links.pop( oldName, None ) if oldName else None
+        if state is None or state.index != index:
+            state = LinkState( name, index )
+            self.notify( watch, name, 'present', False, True )
+        elif oldName != name:
+            self.notify( watch, name, 'name', oldName, name )
+            state.name = name
+        watch.links[ name ], watch.names[ index ] = state, name
+        mac = attrs.get( IFLA_ADDRESS )
+        operstate = attrs.get( IFLA_OPERSTATE )
+        carrier = attrs.get( IFLA_CARRIER )
+        self.update( watch, state, 'up', bool( flags & IFF_UP ) )
+        if mac is not None:
+            self.update( watch, state, 'mac', ':'.join(
+                '%02x' % byte for byte in bytearray( mac ) ) )
+        if operstate:
+            code = bytearray( operstate )[ 0 ]
+            self.update( watch, state, 'operstate',
+                         OPERSTATES[ code ] if code < len( OPERSTATES )
+                         else str( code ) )
+        if carrier:
+            self.update( watch, state, 'carrier',
+                         bool( bytearray( carrier )[ 0 ] ) )
+
+    def addrMsg( self, watch, data, body, end, deleted ):
+        "Apply an RTM_NEWADDR or RTM_DELADDR message"
+        family, prefixLen, _flags, _scope, index = IFADDRMSG.unpack_from(
+            data, body )
+        state = watch.links.get( watch.names.get( index ) )
+        if family != socket.AF_INET or state is None:
+            return
+        attrs = parseAttrs( data, body + IFADDRMSG.size, end )
+        addr = attrs.get( IFA_LOCAL ) or attrs.get( IFA_ADDRESS )
+        if not addr:
+            return
+        entry, oldIP = ( socket.inet_ntoa( addr ), prefixLen ), state.ip
+        if deleted and entry in state.addrs:
+            state.addrs.remove( entry )
+        elif not deleted and entry not in state.addrs:
+            state.addrs.append( entry )
+        if state.ip != oldIP:
+            self.notify( watch, state.name, 'ip', oldIP, state.ip )
+
+    def update( self, watch, state, field, value ):
+        "Set state.field to value, and notify callbacks if it changed"
+        old = getattr( state, field )
+        if old != value:
+            setattr( state, field, value )
+            self.notify( watch, state.name, field, old, value )
+
+    def notify( self, watch, name, field, old, new ):
+        "Call our callbacks for a change"
+        if not self.callbacks:
+            return
+        intf = watch.intf( name )
+        for fn in self.callbacks:
+            try:
+                fn( intf, field, old, new )
+            except Exception as e:  # pylint: disable=broad-except
+                error( '*** LinkStateMonitor callback failed: %s\n' % e )
+
+    def run( self ):
+        "Apply events as they arrive until stopped"
+        poller, fds = None, None
+        while not self.stopped.is_set():
+            with self.lock:
+                watches = dict( ( watch.sock.fileno(), watch )
+                                for watch in self.watches.values() )
+            if set( watches ) != fds:
+                # Namespaces were added or removed
+                poller, fds = select.poll(), set( watches )
+                for fd in fds:
+                    poller.register( fd, select.POLLIN )
+            for fd, _event in poller.poll( self.interval * 1000 ):
+                watch = watches.get( fd )
+                with self.lock:
+                    if watch and watch.sock.fileno() == fd:
+                        self.receive( watch )
+
+    def stop( self ):
+        "Stop our thread, close our sockets and stop watching nodes"
+        Monitor.stop( self )
+        with self.lock:
+            for node in list( self.byNode ):
+                node.linkMonitor = None
+            for watch in self.watches.values():
+                watch.close()
+            self.watches, self.byNode = {}, {}
@@ -64,6 +64,13 @@
 Note also that 10.0.0.1 can often be written as 10.1 for short, e.g.
 "ping 10.1" is equivalent to "ping 10.0.0.1".
 
+Several networks may run at once on the same machine if each is
+given its own instance prefix, e.g. Mininet( prefix='ci3-' ): node
+names (and therefore interface names, OVS bridges, sockets, log
+files, cgroups and namespaces) become ci3-h1, ci3-s1-eth1 etc. Nodes
+may still be looked up by their short names (net[ 'h1' ]), and
+mn -c --prefix ci3- cleans up only that instance.
+
 Currently we wrap the entire network in a 'mininet' object, which
 constructs a simulated network based on a network topology created
 using a topology object (e.g. LinearTopo) from mininet.topo or
@@ -91,22 +98,34 @@
 import select
 import signal
 import random
+import socket
 
 from sys import exit  # pylint: disable=redefined-builtin
 from time import sleep
 from itertools import chain, groupby
 from math import ceil
+from zlib import crc32
 
 from mininet.cli import CLI
 from mininet.log import info, error, debug, output, warn
 from mininet.node import ( Node, Host, OVSKernelSwitch, DefaultController,
-                           Controller )
+                           Controller, OVSSwitch, RemoteController,
+                           CPULimitedHost )
 from mininet.nodelib import NAT
-from mininet.link import Link, Intf
+from mininet.link import Link, Intf, TCIntf
 from mininet.util import ( quietRun, fixLimits, numCores, ensureRoot,
                            macColonHex, ipStr, ipParse, netParse, ipAdd,
                            waitListening, BaseString )
 from mininet.term import cleanUpScreens, makeTerms
+from mininet.routing import installRoutes
+from mininet.diff import TopoDiff
+from mininet.plan import compilePlan, cachedPlan
+from mininet.state import ( netState, pinNamespaces, writeState, readState,
+                            attachNode, attachLink )
+from mininet.numa import CPUPlanner, pinPids, cpuListStr
+from mininet.linkstate import LinkStateMonitor
+from mininet.stats import ( LinkMonitor, QdiscMonitor, OFStatsMonitor,
+                            DatapathMonitor, dumpFlows, dumpPorts )
 
 # Mininet version: should be consistent with README and LICENSE
 VERSION = "2.3.0b1"
@@ -120,7 +139,9 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
                   build=True, xterms=False, cleanup=False, ipBase='10.0.0.0/8',
                   inNamespace=False,
                   autoSetMacs=False, autoStaticArp=False, autoPinCpus=False,
-                  listenPort=None, waitConnected=False ):
+                  listenPort=None, waitConnected=False, reserveCpus=0,
+                  routing=None, shards=1, shardBy='hash', prefix='',
+                  stateFile=None, pool=None, plan=None, linkState=False ):
         """Create Mininet object.
            topo: Topo (topology) object or None
            switch: default Switch class
@@ -136,8 +157,32 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
            autoSetMacs: set MAC addrs automatically like IP addresses?
            autoStaticArp: set all-pairs static MAC addrs?
            autoPinCpus: pin hosts to (real) cores (requires CPULimitedHost)?
+               (hosts from a topo are placed by mininet.numa.CPUPlanner)
            listenPort: base listening port to open; will be incremented for
-               each additional switch in the net if inNamespace=False"""
+               each additional switch in the net if inNamespace=False
+           reserveCpus: with autoPinCpus, number of CPUs to reserve
+               for switch and controller processes
+           routing: install forwarding in OVS switches proactively
+               instead of using a controller: 'shortest' (shortest
+               paths with ECMP) or 'tree' (spanning tree)
+           shards: number of default controllers to start (on ports
+               6653, 6654...); if > 1, each switch connects only to
+               its own controller (shard)
+           shardBy: assign switches to shards by 'hash' (of switch
+               name) or 'topo' (contiguous parts of the switch graph)
+           prefix: instance prefix for node names (e.g. 'ci3-'), so
+               that several networks can run on one machine; keep it
+               short, since interface names are limited to 15 chars
+           stateFile: if set, start() saves our state to this file
+               (and pins node namespaces) so that another process
+               can re-attach with Mininet.attach( stateFile )
+           pool: NodePool to take namespaced node shells from, and
+               return them to on stop (see mininet.pool)
+           plan: build topo from a compiled plan (see mininet.plan):
+               a BuildPlan, True to compile one, or a file name to
+               cache the compiled plan in
+           linkState: keep interface addresses and link state current
+               using rtnetlink events (see watchLinks())"""
         self.topo = topo
         self.switch = switch
         self.host = host
@@ -156,9 +201,31 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
         self.autoStaticArp = autoStaticArp
         self.autoPinCpus = autoPinCpus
         self.numCores = numCores()
-        self.nextCore = 0  # next core for pinning hosts to CPUs
+        self.reserveCpus = reserveCpus
+        self.cpuPlanner = None  # CPUPlanner, if we are pinning
+        self.cpuPlan = {}  # host name -> planned cores and mems
         self.listenPort = listenPort
         self.waitConn = waitConnected
+        self.routing = routing
+        self.routes = None  # mininet.routing.Routes, if routing
+        if shardBy not in ( 'hash', 'topo' ):
+            raise Exception( 'unknown shardBy %s' % shardBy )
+        self.shards = shards
+        self.shardBy = shardBy
+        self.shardMap = {}  # switch -> its controller, if sharded
+        if prefix and not re.match( r'^[a-zA-Z][-_a-zA-Z0-9]*$', prefix ):
+            raise Exception( 'bad instance prefix %s' % prefix )
+        self.prefix = prefix
+        # Move prefixed instances' ports out of each other's way
+        self.portOffset = ( 100 * ( crc32( prefix.encode() ) % 250 + 1 )
+                            if prefix else 0 )
+        if listenPort and prefix:
+            self.listenPort += self.portOffset
+        self.stateFile = stateFile
+        self.pool = pool
+        self.plan = plan
+        self.linkState = linkState
+        self.linkMonitor = None  # LinkStateMonitor (see watchLinks())
 
         self.hosts = []
         self.switches = []
@@ -166,12 +233,18 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
         self.links = []
 
         self.nameToNode = {}  # name to Node (Host/Switch) objects
+        self.nodeOpts = {}  # short name -> topo options, for apply()
+        self.linkOpts = {}  # Link -> topo options, for apply()
 
         self.terms = []  # list of spawned xterm processes
+        self.monitors = []  # running stats monitors (see mininet.stats)
 
         Mininet.init()  # Initialize Mininet if necessary
 
         self.built = False
+        # Defer link shaping until build() for hosts and start() for
+        # switches (see shapeLinks())
+        self.deferTC = True
         if topo and build:
             self.build()
 
@@ -181,6 +254,9 @@ def waitConnected( self, timeout=5, delay=.5 ):
            timeout: time to wait, or None to wait indefinitely
            delay: seconds to sleep per iteration
            returns: True if all switches are connected"""
+        if self.routes and not self.controllers:
+            # Forwarding was installed proactively: nothing to wait for
+            return True
         info( '*** Waiting for switches to connect\n' )
         time = 0
         remaining = list( self.switches )
@@ -219,17 +295,62 @@ def addHost( self, name, cls=None, **params ):
         if self.autoSetMacs:
             defaults[ 'mac' ] = macColonHex( self.nextIP )
         if self.autoPinCpus:
-            defaults[ 'cores' ] = self.nextCore
-            self.nextCore = ( self.nextCore + 1 ) % self.numCores
+            if name not in self.cpuPlan:
+                # Hosts added outside a topo avoid reserved CPUs too
+                self.cpuPlan[ name ] = self.planner().place()
+            defaults.update( self.cpuPlan[ name ] )
+        if self.pool:
+            defaults[ 'pool' ] = self.pool
+        if self.deferTC and not self.built:
+            defaults[ 'deferTC' ] = True
         self.nextIP += 1
         defaults.update( params )
         if not cls:
             cls = self.host
-        h = cls( name, **defaults )
+        h = cls( self.prefix + name, **defaults )
         self.hosts.append( h )
-        self.nameToNode[ name ] = h
+        if self.linkMonitor:
+            self.linkMonitor.add( [ h ] )
+        self.addName( name, h )
         return h
 
+    def shortName( self, node ):
+        "Return node's name without our instance prefix"
+        if self.prefix and node.name.startswith( self.prefix ):
+            return node.name[ len( self.prefix ): ]
+        return node.name
+
+    def addName( self, name, node ):
+        """Register node under its name and its short (unprefixed) name
+           name: short name
+           node: node to register"""
+        self.nameToNode[ node.name ] = node
+        self.nameToNode[ name ] = node
+
+    @staticmethod
+    def portFree( port ):
+        "Is nobody listening on (or bound to) TCP port?"
+        sock = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+        try:
+            sock.bind( ( '', port ) )
+            return True
+        except socket.error:
+            return False
+        finally:
+            sock.close()
+
+    def freePort( self, port, used=() ):
+        """Return port, or, for a prefixed instance, the first free
+           port at or above port + portOffset
+           port: base port
+           used: ports which we have assigned but may not be bound yet"""
+        if not self.prefix:
+            return port
+        port += self.portOffset
+        while port in used or not self.portFree( port ):
+            port += 1
+        return port
+
     def delNode( self, node, nodes=None):
         """Delete node
            node: node to delete
@@ -239,10 +360,15 @@ def delNode( self, node, nodes=None):
                       ( self.switches if node in self.switches else
                         ( self.controllers if node in self.controllers else
                           [] ) ) )
+        if self.linkMonitor:
+            self.linkMonitor.remove( node )
         node.stop( deleteIntfs=True )
         node.terminate()
         nodes.remove( node )
-        del self.nameToNode[ node.name ]
+        for name in [ name for name, n in self.nameToNode.items()
+                      if n is node ]:
+            del self.nameToNode[ name ]
+        self.nodeOpts.pop( self.shortName( node ), None )
 
     def delHost( self, host ):
         "Delete a host"
@@ -254,16 +380,31 @@ def addSwitch( self, name, cls=None, **params ):
            cls: custom switch class/constructor (optional)
            returns: added switch
            side effect: increments listenPort ivar ."""
+        if self.prefix and self.listenPort and not self.inNamespace:
+            used = [ s.listenPort for s in self.switches ]
+            while ( self.listenPort in used or
+                    not self.portFree( self.listenPort ) ):
+                self.listenPort += 1
         defaults = { 'listenPort': self.listenPort,
                      'inNamespace': self.inNamespace }
+        nums = re.findall( r'\d+', name )
+        if self.prefix and nums:
+            # The prefix mustn't change the default dpid (s1 -> 1)
+            defaults[ 'dpid' ] = hex( int( nums[ 0 ] ) )[ 2: ]
+        if self.pool:
+            defaults[ 'pool' ] = self.pool
+        if self.deferTC:
+            defaults[ 'deferTC' ] = True
         defaults.update( params )
         if not cls:
             cls = self.switch
-        sw = cls( name, **defaults )
+        sw = cls( self.prefix + name, **defaults )
         if not self.inNamespace and self.listenPort:
             self.listenPort += 1
         self.switches.append( sw )
-        self.nameToNode[ name ] = sw
+        if self.linkMonitor:
+            self.linkMonitor.add( [ sw ] )
+        self.addName( name, sw )
         return sw
 
     def delSwitch( self, switch ):
@@ -284,11 +425,17 @@ def addController( self, name='c0', controller=None, **params ):
             name = controller_new.name
             # pylint: enable=maybe-no-member
         else:
-            controller_new = controller( name, **params )
+            cls = getattr( controller, 'func', controller )  # partial
+            if ( self.prefix and 'port' not in params and not (
+                    isinstance( cls, type ) and
+                    issubclass( cls, RemoteController ) ) ):
+                params[ 'port' ] = self.freePort(
+                    6653, [ c.port for c in self.controllers ] )
+            controller_new = controller( self.prefix + name, **params )
         # Add new controller to net
         if controller_new:  # allow controller-less setups
             self.controllers.append( controller_new )
-            self.nameToNode[ name ] = controller_new
+            self.addName( name, controller_new )
         return controller_new
 
     def delController( self, controller ):
@@ -407,6 +554,7 @@ def delLink( self, link ):
         "Remove a link from this network"
         link.delete()
         self.links.remove( link )
+        self.linkOpts.pop( link, None )
 
     def linksBetween( self, node1, node2 ):
         "Return Links between node1 and node2"
@@ -429,22 +577,48 @@ def delLinkBetween( self, node1, node2, index=0, allLinks=False ):
 
     def configHosts( self ):
         "Configure a set of hosts."
-        for host in self.hosts:
-            info( host.name + ' ' )
-            intf = host.defaultIntf()
-            if intf:
-                host.configDefault()
-            else:
-                # Don't configure nonexistent intf
-                host.configDefault( ip=None, mac=None )
-            # You're low priority, dude!
-            # BL: do we want to do this here or not?
-            # May not make sense if we have CPU lmiting...
-            # quietRun( 'renice +18 -p ' + repr( host.pid ) )
-            # This may not be the right place to do this, but
-            # it needs to be done somewhere.
+        # CPULimitedHosts' cgroup (v2) writes are made in one pass
+        with CPULimitedHost.batchWrites():
+            for host in self.hosts:
+                info( host.name + ' ' )
+                intf = host.defaultIntf()
+                if intf:
+                    host.configDefault()
+                else:
+                    # Don't configure nonexistent intf
+                    host.configDefault( ip=None, mac=None )
+                # You're low priority, dude!
+                # BL: do we want to do this here or not?
+                # May not make sense if we have CPU lmiting...
+                # quietRun( 'renice +18 -p ' + repr( host.pid ) )
+                # This may not be the right place to do this, but
+                # it needs to be done somewhere.
         info( '\n' )
 
+    def addDefaultControllers( self ):
+        "Add our default controller(s), unless we have some already"
+        if self.controllers or not self.controller or self.routing:
+            return
+        # Add a default controller
+        info( '*** Adding controller\n' )
+        classes = self.controller
+        if not isinstance( classes, list ):
+            classes = [ classes ]
+        if self.shards > 1 and len( classes ) == 1:
+            # One controller of our default class per shard
+            for i in range( self.shards ):
+                used = [ c.port for c in self.controllers ]
+                self.addController( 'c%d' % i, classes[ 0 ],
+                                    port=self.freePort( 6653 + i,
+                                                        used ) )
+            classes = []
+        for i, cls in enumerate( classes ):
+            # Allow Controller objects because nobody understands partial()
+            if isinstance( cls, Controller ):
+                self.addController( cls )
+            else:
+                self.addController( 'c%d' % i, cls )
+
     def buildFromTopo( self, topo=None ):
         """Build mininet from a topology object
            At the end of this function, everything should be connected
@@ -456,22 +630,15 @@ def buildFromTopo( self, topo=None ):
             pass
 
         info( '*** Creating network\n' )
+        self.addDefaultControllers()
 
-        if not self.controllers and self.controller:
-            # Add a default controller
-            info( '*** Adding controller\n' )
-            classes = self.controller
-            if not isinstance( classes, list ):
-                classes = [ classes ]
-            for i, cls in enumerate( classes ):
-                # Allow Controller objects because nobody understands partial()
-                if isinstance( cls, Controller ):
-                    self.addController( cls )
-                else:
-                    self.addController( 'c%d' % i, cls )
+        if self.autoPinCpus:
+            # Place communicating hosts on the same NUMA node
+            self.cpuPlan.update( self.planner().plan( topo ) )
 
         info( '*** Adding hosts:\n' )
         for hostName in topo.hosts():
+            self.nodeOpts[ hostName ] = dict( topo.nodeInfo( hostName ) )
             self.addHost( hostName, **topo.nodeInfo( hostName ) )
             info( hostName + ' ' )
 
@@ -479,6 +646,8 @@ def buildFromTopo( self, topo=None ):
         for switchName in topo.switches():
             # A bit ugly: add batch parameter if appropriate
             params = topo.nodeInfo( switchName)
+            self.nodeOpts[ switchName ] = dict( params )
+            params = dict( params )
             cls = params.get( 'cls', self.switch )
             if hasattr( cls, 'batchStartup' ):
                 params.setdefault( 'batch', True )
@@ -488,24 +657,58 @@ def buildFromTopo( self, topo=None ):
         info( '\n*** Adding links:\n' )
         for srcName, dstName, params in topo.links(
                 sort=True, withInfo=True ):
-            self.addLink( **params )
+            link = self.addLink( **params )
+            self.linkOpts[ link ] = dict( params )
             info( '(%s, %s) ' % ( srcName, dstName ) )
 
         info( '\n' )
 
+    def apply( self, topo ):
+        """Change the running network to match topo, changing only
+           the nodes and links which differ (see mininet.diff)
+           topo: target Topo
+           returns: TopoDiff describing the changes"""
+        return TopoDiff( self, topo ).apply()
+
     def configureControlNetwork( self ):
         "Control net config hook: override in subclass"
         raise Exception( 'configureControlNetwork: '
                          'should be overriden in subclass', self )
 
+    def buildFromPlan( self, topo ):
+        """Build mininet from topo using a compiled plan (self.plan),
+           compiling it if necessary (see mininet.plan)
+           returns: True, or False if topo couldn't be planned"""
+        plan = self.plan
+        try:
+            if plan is True:
+                plan = compilePlan( self, topo )
+            elif isinstance( plan, BaseString ):
+                plan = cachedPlan( self, topo, plan )
+        except Exception as e:  # pylint: disable=broad-except
+            warn( '*** Cannot use a build plan (%s); building normally\n'
+                  % e )
+            return False
+        info( '*** Creating network from build plan\n' )
+        self.addDefaultControllers()
+        plan.execute( self )
+        return True
+
     def build( self ):
         "Build mininet."
-        if self.topo:
+        planned = False
+        if self.topo and self.plan:
+            planned = self.buildFromPlan( self.topo )
+        if self.topo and not planned:
             self.buildFromTopo( self.topo )
         if self.inNamespace:
             self.configureControlNetwork()
-        info( '*** Configuring hosts\n' )
-        self.configHosts()
+        if not planned:
+            # (Build plans configure hosts themselves)
+            info( '*** Configuring hosts\n' )
+            self.configHosts()
+        # Switch ports are shaped when we start the switches
+        self.shapeLinks( self.hosts )
         if self.xterms:
             self.startTerms()
         if self.autoStaticArp:
@@ -540,6 +743,9 @@ def start( self ):
         "Start controller and switches."
         if not self.built:
             self.build()
+        if self.shards > 1:
+            self.assignShards()
+            self.pinShards()
         info( '*** Starting controller\n' )
         for controller in self.controllers:
             info( controller.name + ' ')
@@ -548,7 +754,8 @@ def start( self ):
         info( '*** Starting %s switches\n' % len( self.switches ) )
         for switch in self.switches:
             info( switch.name + ' ')
-            switch.start( self.controllers )
+            switch.start( self.switchControllers( switch ) )
+        self.pinReservedCpus()
         started = {}
         for swclass, switches in groupby(
                 sorted( self.switches,
@@ -558,11 +765,212 @@ def start( self ):
                 success = swclass.batchStartup( switches )
                 started.update( { s: s for s in success } )
         info( '\n' )
-        if self.waitConn:
+        self.deferTC = False
+        self.shapeLinks()
+        if self.linkState and not self.linkMonitor:
+            self.watchLinks()
+        if self.routing:
+            self.routes = installRoutes( self, mode=self.routing )
+        if self.waitConn and self.controllers:
             self.waitConnected()
+        if self.stateFile:
+            self.saveState()
+
+    def shapeLinks( self, nodes=None ):
+        """Apply TCIntf shaping, which our nodes defer while we build,
+           once, with one tc -batch per node. We shape hosts at the end
+           of build(), and switches in start(), after they have
+           attached (and possibly reset) their ports.
+           nodes: nodes to shape (default: all hosts and switches)
+           returns: list of intfs whose shaping failed"""
+        if nodes is None:
+            nodes = self.hosts + self.switches
+        for node in nodes:
+            node.deferTC = False
+        intfs = [ intf for node in nodes for intf in node.intfList()
+                  if isinstance( intf, TCIntf ) and intf.pendingTC ]
+        if not intfs:
+            return []
+        info( '*** Shaping %d interfaces\n' % len( intfs ) )
+        return TCIntf.batchShape( intfs )
+
+    def saveState( self, stateFile=None ):
+        """Pin node namespaces and save our state, so that another
+           process can re-attach to us (see mininet.state)
+           stateFile: file to write (default: self.stateFile)"""
+        stateFile = stateFile or self.stateFile
+        pinNamespaces( self.hosts + self.switches )
+        writeState( netState( self ), stateFile )
+        debug( '*** Saved state to %s\n' % stateFile )
+
+    @classmethod
+    def attach( cls, stateFile, **params ):
+        """Re-attach to a running network whose state was saved in
+           stateFile, without recreating anything
+           params: additional Mininet parameters
+           returns: started Mininet"""
+        state = readState( stateFile )
+        params.update( prefix=state[ 'prefix' ], ipBase=state[ 'ipBase' ],
+                       listenPort=None, stateFile=stateFile )
+        net = cls( build=False, **params )
+        net.nextIP = state[ 'nextIP' ]
+        net.listenPort = state[ 'listenPort' ]
+        info( '*** Attaching to %d nodes\n' % len( state[ 'nodes' ] ) )
+        roles = { 'host': net.hosts, 'switch': net.switches,
+                  'controller': net.controllers }
+        for nodeInfo in state[ 'nodes' ]:
+            node = attachNode( nodeInfo )
+            roles[ nodeInfo[ 'role' ] ].append( node )
+            net.addName( net.shortName( node ), node )
+        for linkInfo in state[ 'links' ]:
+            net.links.append( attachLink( linkInfo, net.nameToNode ) )
+        net.built = True
+        # The network has already started, so we shape links right away
+        net.deferTC = False
+        return net
+
+    def switchOrder( self ):
+        """Return switches in breadth-first order over the links
+           between them, so that neighboring switches are adjacent"""
+        neighbors = dict( ( switch, [] ) for switch in self.switches )
+        for link in self.links:
+            node1, node2 = link.intf1.node, link.intf2.node
+            if node1 in neighbors and node2 in neighbors:
+                neighbors[ node1 ].append( node2 )
+                neighbors[ node2 ].append( node1 )
+        order, seen = [], set()
+        for root in self.switches:
+            if root in seen:
+                continue
+            seen.add( root )
+            queue = [ root ]
+            while queue:
+                switch = queue.pop( 0 )
+                order.append( switch )
+                for neighbor in neighbors[ switch ]:
+                    if neighbor not in seen:
+                        seen.add( neighbor )
+                        queue.append( neighbor )
+        return order
+
+    def assignShards( self ):
+        """Assign each switch to one of our controllers, by hashing
+           its name or (shardBy='topo') by cutting the switch graph
+           into contiguous parts"""
+        self.shardMap = {}
+        controllers = self.controllers
+        if len( controllers ) < 2:
+            return
+        if self.shardBy == 'topo':
+            order = self.switchOrder()
+            for i, switch in enumerate( order ):
+                self.shardMap[ switch ] = controllers[
+                    i * len( controllers ) // len( order ) ]
+        else:
+            for switch in self.switches:
+                # crc32 (unlike hash()) is stable across runs
+                index = crc32( switch.name.encode() ) % len( controllers )
+                self.shardMap[ switch ] = controllers[ index ]
+        for controller in controllers:
+            debug( '%s: %d switches\n' % ( controller, sum(
+                1 for c in self.shardMap.values() if c is controller ) ) )
+
+    def assignShard( self, switch ):
+        """Assign a switch which was added after start() to one of our
+           controllers, without moving other switches: to the
+           controller of most of its neighbors (shardBy='topo'), or
+           else by hashing its name"""
+        controllers = self.controllers
+        if self.shards < 2 or len( controllers ) < 2:
+            return
+        if self.shardBy == 'topo':
+            shards = [ self.shardMap[ node ] for link in self.links
+                       for node in ( link.intf1.node, link.intf2.node )
+                       if switch in ( link.intf1.node, link.intf2.node )
+                       and node is not switch and node in self.shardMap ]
+            if shards:
+                self.shardMap[ switch ] = max( controllers,
+                                               key=shards.count )
+                return
+        index = crc32( switch.name.encode() ) % len( controllers )
+        self.shardMap[ switch ] = controllers[ index ]
+
+    def startSwitch( self, switch ):
+        """Start a switch which was added (or stopped) after start(),
+           connecting it to its shard's controller"""
+        if switch not in self.shardMap:
+            self.assignShard( switch )
+        switch.start( self.switchControllers( switch ) )
+
+    def switchControllers( self, switch ):
+        "Return the controllers switch should connect to"
+        if switch in self.shardMap:
+            return [ self.shardMap[ switch ] ]
+        return self.controllers
+
+    def planner( self ):
+        "Return our CPUPlanner, creating it if necessary"
+        if not self.cpuPlanner:
+            self.cpuPlanner = CPUPlanner( reserve=self.reserveCpus )
+        return self.cpuPlanner
+
+    def shardCpus( self ):
+        """Return CPUs for local controllers: our reserved CPUs, if
+           any, or else those which have no hosts placed on them"""
+        planner = self.planner()
+        return planner.reserved or planner.free()
+
+    def pinShards( self ):
+        """Pin each local controller to its own CPU (see shardCpus()),
+           before it is started"""
+        cpus = self.shardCpus()
+        if not cpus:
+            warn( '*** No free CPUs: not pinning controllers\n' )
+            return
+        controllers = [ c for c in self.controllers if c.shell ]
+        for i, controller in enumerate( controllers ):
+            # The controller process inherits its shell's affinity
+            pinPids( [ controller.pid ], [ cpus[ i % len( cpus ) ] ] )
+
+    def shardStats( self ):
+        """Report switch assignment, connections and (for controllers
+           with stats(), e.g. PythonController) load for each
+           controller
+           returns: dict of controller -> dict of port, switches,
+                    connected and any packetIns, flowMods and
+                    packetOuts"""
+        stats = {}
+        for controller in self.controllers:
+            switches = [ s for s in self.switches
+                         if controller in self.switchControllers( s ) ]
+            entry = dict( port=controller.port, switches=len( switches ),
+                          connected=sum( 1 for s in switches
+                                         if s.connected() ) )
+            if hasattr( controller, 'stats' ):
+                counters = controller.stats().values()
+                for key in 'packetIns', 'flowMods', 'packetOuts':
+                    entry[ key ] = sum( c.get( key, 0 ) for c in counters )
+            stats[ controller ] = entry
+        return stats
+
+    def pinReservedCpus( self ):
+        """Pin switch and controller processes (including any
+           ovs-vswitchd) to our reserved CPUs, if any"""
+        if not self.cpuPlanner or not self.cpuPlanner.reserved:
+            return
+        nodes = self.controllers + self.switches
+        pids = [ node.pid for node in nodes if node.shell ]
+        pids += quietRun( 'pgrep -x ovs-vswitchd' ).split()
+        info( '*** Pinning switches and controllers to CPUs %s\n' %
+              cpuListStr( self.cpuPlanner.reserved ) )
+        pinPids( pids, self.cpuPlanner.reserved )
 
     def stop( self ):
         "Stop the controller(s), switches and hosts"
+        for monitor in self.monitors:
+            monitor.stop()
+        self.monitors = []
+        self.linkMonitor = None
         info( '*** Stopping %i controllers\n' % len( self.controllers ) )
         for controller in self.controllers:
             info( controller.name + ' ' )
@@ -595,6 +1003,8 @@ def stop( self ):
         for host in self.hosts:
             info( host.name + ' ' )
             host.terminate()
+        if self.stateFile and os.path.exists( self.stateFile ):
+            os.unlink( self.stateFile )
         info( '\n*** Done\n' )
 
     def run( self, test, *args, **kwargs ):
@@ -605,6 +1015,101 @@ def run( self, test, *args, **kwargs ):
         self.stop()
         return result
 
+    def monitorLinks( self, interval=1.0, nodes=None ):
+        """Start sampling interface counters for nodes (default: all
+           hosts and switches) from a background thread, without
+           running any commands; sampling stops when we stop
+           interval: sampling interval in seconds
+           returns: running LinkMonitor"""
+        if nodes is None:
+            nodes = self.hosts + self.switches
+        monitor = LinkMonitor( nodes, interval=interval ).start()
+        self.monitors.append( monitor )
+        return monitor
+
+    def watchLinks( self, nodes=None, callback=None ):
+        """Keep interface addresses and link state for nodes (default:
+           all hosts and switches, and any we add later) up to date
+           using rtnetlink events, so that Intf.IP(), MAC(), isUp()
+           etc. are current and don't run any commands; watching stops
+           when we stop
+           callback: optional fn( intf, field, old, new ) to call for
+               each change
+           returns: running LinkStateMonitor"""
+        if nodes is None:
+            nodes = self.hosts + self.switches
+        if self.linkMonitor:
+            self.linkMonitor.add( nodes )
+        else:
+            self.linkMonitor = LinkStateMonitor( nodes ).start()
+            self.monitors.append( self.linkMonitor )
+        if callback:
+            self.linkMonitor.addCallback( callback )
+        return self.linkMonitor
+
+    def monitorQdiscs( self, interval=.1, intfs=None ):
+        """Start sampling qdisc statistics for intfs (default: all
+           TCIntfs) from a background thread; sampling stops when
+           we stop
+           interval: sampling interval in seconds
+           returns: running QdiscMonitor"""
+        if intfs is None:
+            intfs = [ intf for node in self.hosts + self.switches
+                      for intf in node.intfList()
+                      if isinstance( intf, TCIntf ) ]
+        monitor = QdiscMonitor( intfs, interval=interval ).start()
+        self.monitors.append( monitor )
+        return monitor
+
+    def ovsSwitches( self, switches=None ):
+        "Return OVS switches in switches (default: all switches)"
+        if switches is None:
+            switches = self.switches
+        return [ switch for switch in switches
+                 if isinstance( switch, OVSSwitch ) ]
+
+    def flowStats( self, switches=None ):
+        """Fetch flow statistics for switches (default: all OVS
+           switches), running ovs-ofctl for each switch concurrently
+           returns: dict of switch -> list of flows, each a dict with
+                    table, priority, match, actions, cookie, packets,
+                    bytes and duration"""
+        return dumpFlows( self.ovsSwitches( switches ) )
+
+    def portStats( self, switches=None ):
+        """Fetch port statistics for switches (default: all OVS
+           switches), running ovs-ofctl for each switch concurrently
+           returns: dict of switch -> dict of port -> counters
+                    (rxPackets, rxBytes, rxDrops, rxErrors, tx...)"""
+        return dumpPorts( self.ovsSwitches( switches ) )
+
+    def monitorOFStats( self, interval=1.0, switches=None, **kwargs ):
+        """Start sampling flow and port statistics for switches
+           (default: all OVS switches) from a background thread;
+           sampling stops when we stop
+           interval: sampling interval in seconds
+           kwargs: additional OFStatsMonitor parameters
+           returns: running OFStatsMonitor"""
+        monitor = OFStatsMonitor( self.ovsSwitches( switches ),
+                                  interval=interval, **kwargs ).start()
+        self.monitors.append( monitor )
+        return monitor
+
+    def monitorDatapath( self, interval=1.0, switches=None, **kwargs ):
+        """Start sampling kernel datapath flow cache statistics for
+           switches (default: all kernel datapath OVS switches) from a
+           background thread, warning if upcalls saturate; call
+           mark() on the monitor to start each experiment phase
+           interval: sampling interval in seconds
+           kwargs: additional DatapathMonitor parameters
+           returns: running DatapathMonitor"""
+        switches = [ switch for switch in self.ovsSwitches( switches )
+                     if switch.datapath == 'kernel' ]
+        monitor = DatapathMonitor( switches, interval=interval,
+                                   **kwargs ).start()
+        self.monitors.append( monitor )
+        return monitor
+
     def monitor( self, hosts=None, timeoutms=-1 ):
         """Monitor a set of hosts (or all hosts by default),
            and return their output, a line at a time.
@@ -867,17 +1372,13 @@ def runCpuLimitTest( self, cpu, duration=5 ):
         # get the initial cpu time for each host
         for host in hosts:
             outputs[ host ] = []
-            with open( '/sys/fs/cgroup/cpuacct/%s/cpuacct.usage' %
-                       host, 'r' ) as f:
-                time[ host ] = float( f.read() )
+            time[ host ] = host.cpuUsage()
         for _ in range( duration ):
             sleep( 1 )
             for host in hosts:
-                with open( '/sys/fs/cgroup/cpuacct/%s/cpuacct.usage' %
-                           host, 'r' ) as f:
-                    readTime = float( f.read() )
-                outputs[ host ].append( ( ( readTime - time[ host ] )
-                                        / 1000000000 ) / cores * 100 )
+                readTime = host.cpuUsage()
+                outputs[ host ].append( ( readTime - time[ host ] )
+                                        / cores * 100 )
                 time[ host ] = readTime
         for h, pids in pids.items():
             for pid in pids:
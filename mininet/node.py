@@ -18,6 +18,9 @@
 CPULimitedHost: a virtual host whose CPU bandwidth is limited by
     RT or CFS bandwidth limiting.
 
+NetnsHost: a lightweight host whose namespace is pinned by a named
+    network namespace (ip netns) rather than a resident shell.
+
 Switch: superclass for switch nodes.
 
 UserSwitch: a switch using the user-space switch from the OpenFlow
@@ -40,6 +43,9 @@
 
 Ryu: The Ryu controller (https://osrg.github.io/ryu/)
 
+PythonController: Mininet's own asyncio OpenFlow 1.0/1.3 learning
+    controller (mininet.ofcontroller), for networks with many switches
+
 RemoteController: a remote controller node, which may use any
     arbitrary OpenFlow-compatible controller, and which is not
     created or managed by Mininet.
@@ -52,23 +58,30 @@
 - Create proxy objects for remote nodes (Mininet: Cluster Edition)
 """
 
+import json
 import os
 import pty
 import re
 import signal
 import select
+import socket
+import sys
 from distutils.version import StrictVersion
+from contextlib import contextmanager
+from errno import ENOENT
 from re import findall
-from subprocess import Popen, PIPE
+from subprocess import Popen, PIPE, STDOUT
 from sys import exit  # pylint: disable=redefined-builtin
 from time import sleep
 
 from mininet.log import info, error, warn, debug
 from mininet.util import ( quietRun, errRun, errFail, moveIntf, isShellBuiltin,
                            numCores, retry, mountCgroups, BaseString, decode,
-                           encode, getincrementaldecoder, Python3, which )
+                           encode, getincrementaldecoder, Python3, which,
+                           runInNetns, isListening, cgroupVersion )
 from mininet.moduledeps import moduleDeps, pathCheck, TUN
 from mininet.link import Link, Intf, TCIntf, OVSIntf
+from mininet import agent as nodeagent
 
 
 # pylint: disable=too-many-arguments
@@ -80,10 +93,21 @@ class Node( object ):
 
     portBase = 0  # Nodes always start with eth0/port0, even in OF 1.0
 
+    nsDir = '/var/run/netns'  # where named network namespaces live
+    nsPrefix = 'mininet-'  # prefix for our named network namespaces
+
+    reusableShell = True  # may our shell be returned to a NodePool?
+
     def __init__( self, name, inNamespace=True, **params ):
         """name: name of node
            inNamespace: in network namespace?
            privateDirs: list of private directory strings or tuples
+           agent: use framed exec agent rather than a shell on a pty?
+                  (see mininet.agent; requires Python 3)
+           attached: re-attach to our existing (pinned) namespace
+                     rather than creating one (see Mininet.attach())
+           pool: NodePool to take our shell from and return it to
+           deferTC: defer TCIntf shaping (see Mininet.shapeLinks())
            params: Node parameters (see config() for details)"""
 
         # Make sure class actually works
@@ -96,9 +120,28 @@ def __init__( self, name, inNamespace=True, **params ):
         # Python 3 complains if we don't wait for shell exit
         self.waitExited = params.get( 'waitExited', Python3 )
 
+        # Use framed exec agent instead of interactive shell?
+        self.useAgent = params.get( 'agent', False )
+        self.agent = None  # AgentClient, if we are using an agent
+
+        # Warm shell pool, if any (see mininet.pool)
+        self.pool = params.get( 'pool' )
+        self.shellOpts = None
+
+        # Defer TCIntf shaping? (see Mininet.shapeLinks())
+        self.deferTC = params.get( 'deferTC', False )
+
+        # LinkStateMonitor watching our interfaces (see mininet.linkstate)
+        self.linkMonitor = None
+
         # Stash configuration parameters for future reference
         self.params = params
 
+        # Name of our pinned network namespace, if any (see pinNetns())
+        self.attached = params.get( 'attached', False )
+        self.nsPinned = ( self.nsPrefix + self.name
+                          if self.attached and self.inNamespace else None )
+
         # dict of port numbers to interfacse
         self.intfs = {}
 
@@ -112,8 +155,13 @@ def __init__( self, name, inNamespace=True, **params ):
         ( self.shell, self.execed, self.pid, self.stdin, self.stdout,
             self.lastPid, self.lastCmd, self.pollOut ) = (
                 None, None, None, None, None, None, None, None )
+        self.lastCmdId, self.lastExitCode = None, None
+        self.nsFd, self.nsFdPath = None, None
+        self.agentDone = False
         self.waiting = False
-        self.readbuf = ''
+        self.readbuf = bytearray()
+        self.readSize = self.readMin
+        self.batched = None  # ( commands, outputs ) (see batch())
 
         # Incremental decoder for buffered reading
         self.decoder = getincrementaldecoder()
@@ -121,7 +169,8 @@ def __init__( self, name, inNamespace=True, **params ):
         # Start command interpreter shell
         self.master, self.slave = None, None  # pylint
         self.startShell()
-        self.mountPrivateDirs()
+        if not self.attached:
+            self.mountPrivateDirs()
 
     # File descriptor to node mapping support
     # Class variables and methods
@@ -137,33 +186,42 @@ def fdToNode( cls, fd ):
         node = cls.outToNode.get( fd )
         return node or cls.inToNode.get( fd )
 
+    def unmapFds( self ):
+        """Remove our entries from inToNode and outToNode, so that we
+           can be garbage collected and our fds reused by other nodes"""
+        for fdToNode, f in ( ( self.inToNode, self.stdin ),
+                             ( self.outToNode, self.stdout ) ):
+            if f and not f.closed and fdToNode.get( f.fileno() ) is self:
+                del fdToNode[ f.fileno() ]
+
     # Command support via shell process in namespace
     def startShell( self, mnopts=None ):
         "Start a shell process for running commands"
         if self.shell:
             error( "%s: shell is already running\n" % self.name )
             return
-        # mnexec: (c)lose descriptors, (d)etach from tty,
-        # (p)rint pid, and run in (n)amespace
-        opts = '-cd' if mnopts is None else mnopts
-        if self.inNamespace:
-            opts += 'n'
-        # bash -i: force interactive
-        # -s: pass $* to shell, and make process easy to find in ps
-        # prompt is set to sentinel chr( 127 )
-        cmd = [ 'mnexec', opts, 'env', 'PS1=' + chr( 127 ),
-                'bash', '--norc', '--noediting',
-                '-is', 'mininet:' + self.name ]
-
-        # Spawn a shell subprocess in a pseudo-tty, to disable buffering
-        # in the subprocess and insulate it from signals (e.g. SIGINT)
-        # received by the parent
-        self.master, self.slave = pty.openpty()
-        self.shell = self._popen( cmd, stdin=self.slave, stdout=self.slave,
-                                  stderr=self.slave, close_fds=False )
-        # XXX BL: This doesn't seem right, and we should also probably
-        # close our files when we exit...
-        self.stdin = os.fdopen( self.master, 'r' )
+        opts = self.mnexecOpts( mnopts )
+        if self.useAgent:
+            self.startAgent( opts )
+            return
+        self.shellOpts = opts
+        pooled = self.pool.get( opts ) if self.pool else None
+        if pooled:
+            # Take a warm shell (and its pty) from our pool
+            self.shell, self.stdin, self.slave = pooled
+            self.master = self.stdin.fileno()
+        else:
+            cmd = [ 'mnexec' ] + opts + self.shellArgs( self.name )
+            # Spawn a shell subprocess in a pseudo-tty, to disable
+            # buffering in the subprocess and insulate it from signals
+            # (e.g. SIGINT) received by the parent
+            self.master, self.slave = pty.openpty()
+            self.shell = self._popen( cmd, stdin=self.slave,
+                                      stdout=self.slave,
+                                      stderr=self.slave, close_fds=False )
+            # XXX BL: This doesn't seem right, and we should also
+            # probably close our files when we exit...
+            self.stdin = os.fdopen( self.master, 'r' )
         self.stdout = self.stdin
         self.pid = self.shell.pid
         self.pollOut = select.poll()
@@ -176,7 +234,11 @@ def startShell( self, mnopts=None ):
         self.execed = False
         self.lastCmd = None
         self.lastPid = None
-        self.readbuf = ''
+        self.readbuf = bytearray()
+        if pooled:
+            # Replace the pooled shell with a fresh one, under our name
+            self.write( "exec env PS1=$'\\177' bash --norc --noediting "
+                        "-is mininet:%s\n" % self.name )
         # Wait for prompt
         while True:
             data = self.read( 1024 )
@@ -187,23 +249,81 @@ def startShell( self, mnopts=None ):
         # +m: disable job control notification
         self.cmd( 'unset HISTFILE; stty -echo; set +m' )
 
+    @staticmethod
+    def shellArgs( name ):
+        "Return command to start a shell for node name (after mnexec)"
+        # bash -i: force interactive
+        # -s: pass $* to shell, and make process easy to find in ps
+        # prompt is set to sentinel chr( 127 )
+        return [ 'env', 'PS1=' + chr( 127 ), 'bash', '--norc',
+                 '--noediting', '-is', 'mininet:' + name ]
+
+    def mnexecOpts( self, mnopts=None ):
+        """Return mnexec arguments for starting our shell
+           mnopts: mnexec options (-cd)"""
+        # mnexec: (c)lose descriptors, (d)etach from tty,
+        # (p)rint pid, and run in (n)amespace
+        opts = '-cd' if mnopts is None else mnopts
+        if self.attached and self.inNamespace:
+            # Enter our existing namespace rather than creating one
+            return [ opts, '-a', os.path.join( self.nsDir, self.nsPinned ) ]
+        if self.inNamespace:
+            opts += 'n'
+        return [ opts ]
+
+    def pinNetns( self ):
+        """Pin our network namespace with a named namespace file, so
+           that it (and our interfaces) will outlive our shell, and
+           can be re-attached to; the caller should run the returned
+           command, e.g. with nodelib.ipBatch()
+           returns: ip command (without 'ip'), or None"""
+        if not self.inNamespace or self.nsPinned:
+            return None
+        self.nsPinned = self.nsPrefix + self.name
+        return 'netns attach %s %d' % ( self.nsPinned, self.pid )
+
+    def startAgent( self, opts ):
+        """Start a framed exec agent (see mininet.agent), which runs
+           our shell and reports output and exit status per command
+           opts: list of mnexec arguments"""
+        agentPath = os.path.abspath( nodeagent.__file__ ).replace(
+            '.pyc', '.py' )
+        cmd = [ 'mnexec' ] + opts + [ sys.executable, agentPath,
+                                      'mininet:' + self.name ]
+        self.shell = self._popen( cmd, stdin=PIPE, stdout=PIPE )
+        self.stdin, self.stdout = self.shell.stdin, self.shell.stdout
+        self.agent = nodeagent.AgentClient( self.shell )
+        self.pid = self.agent.waitReady()
+        self.pollOut = select.poll()
+        self.pollOut.register( self.stdout )
+        self.outToNode[ self.stdout.fileno() ] = self
+        self.inToNode[ self.stdin.fileno() ] = self
+        self.execed = False
+        self.lastCmd = None
+        self.lastPid = None
+        self.readbuf = bytearray()
+        self.waiting = False
+
     def mountPrivateDirs( self ):
         "mount private directories"
         # Avoid expanding a string into a list of chars
         assert not isinstance( self.privateDirs, BaseString )
-        for directory in self.privateDirs:
-            if isinstance( directory, tuple ):
-                # mount given private directory
-                privateDir = directory[ 1 ] % self.__dict__
-                mountPoint = directory[ 0 ]
-                self.cmd( 'mkdir -p %s' % privateDir )
-                self.cmd( 'mkdir -p %s' % mountPoint )
-                self.cmd( 'mount --bind %s %s' %
-                               ( privateDir, mountPoint ) )
-            else:
-                # mount temporary filesystem on directory
-                self.cmd( 'mkdir -p %s' % directory )
-                self.cmd( 'mount -n -t tmpfs tmpfs %s' % directory )
+        if not self.privateDirs:
+            return
+        with self.batch():
+            for directory in self.privateDirs:
+                if isinstance( directory, tuple ):
+                    # mount given private directory
+                    privateDir = directory[ 1 ] % self.__dict__
+                    mountPoint = directory[ 0 ]
+                    self.cmd( 'mkdir -p %s' % privateDir )
+                    self.cmd( 'mkdir -p %s' % mountPoint )
+                    self.cmd( 'mount --bind %s %s' %
+                              ( privateDir, mountPoint ) )
+                else:
+                    # mount temporary filesystem on directory
+                    self.cmd( 'mkdir -p %s' % directory )
+                    self.cmd( 'mount -n -t tmpfs tmpfs %s' % directory )
 
     def unmountPrivateDirs( self ):
         "mount private directories"
@@ -213,6 +333,41 @@ def unmountPrivateDirs( self ):
             else:
                 self.cmd( 'umount ', directory )
 
+    def netnsId( self ):
+        """Return an identifier for our network namespace which
+           ip(8) understands, e.g. for ip link set intf netns <id>"""
+        return self.pid
+
+    def netnsPath( self ):
+        "Return path of our network namespace file"
+        return '/proc/%d/ns/net' % self.pid
+
+    def netnsFd( self ):
+        "Return (cached) file descriptor for our network namespace"
+        path = self.netnsPath()
+        if self.nsFd is None or self.nsFdPath != path:
+            self.closeNetnsFd()
+            self.nsFd, self.nsFdPath = os.open( path, os.O_RDONLY ), path
+        return self.nsFd
+
+    def closeNetnsFd( self ):
+        "Close our cached network namespace file descriptor"
+        if self.nsFd is not None:
+            os.close( self.nsFd )
+            self.nsFd, self.nsFdPath = None, None
+
+    # pylint: disable=redefined-builtin
+    def socket( self, family=socket.AF_INET, type=socket.SOCK_STREAM,
+                proto=0 ):
+        """Return a socket in our network namespace, created by the
+           calling (Python) process rather than by a command in the node
+           family, type, proto: as for socket.socket()"""
+        if not self.inNamespace:
+            return socket.socket( family, type, proto )
+        return runInNetns( self.netnsFd(), socket.socket,
+                           family, type, proto )
+    # pylint: enable=redefined-builtin
+
     def _popen( self, cmd, **params ):
         """Internal method: spawn and return a process
             cmd: command to run (list)
@@ -230,10 +385,15 @@ def cleanup( self ):
         # for intfName in self.intfNames():
         # if self.name in intfName:
         # quietRun( 'ip link del ' + intfName )
+        self.closeNetnsFd()
+        self.unmapFds()
         if self.shell:
-            # Close ptys
+            # Close ptys (or agent pipes)
             self.stdin.close()
-            os.close(self.slave)
+            if self.agent:
+                self.stdout.close()
+            else:
+                os.close(self.slave)
             if self.waitExited:
                 debug( 'waiting for', self.pid, 'to terminate\n' )
                 self.shell.wait()
@@ -241,43 +401,95 @@ def cleanup( self ):
 
     # Subshell I/O, commands and control
 
+    # Output buffering: self.readbuf is a bytearray of output which
+    # has been read from the node but not yet consumed. We read in
+    # chunks of self.readSize bytes, which grows (up to readMax) while
+    # the node keeps filling our reads, and we decode each byte once.
+
+    readMin, readMax = 1024, 65536
+
+    def readRaw( self, size ):
+        """Read up to size bytes of output from node, potentially blocking.
+           returns: bytes"""
+        if self.agent:
+            return self.agentRead()
+        data = os.read( self.stdout.fileno(), size )
+        # Adapt our read size to the rate of output
+        if len( data ) == size:
+            self.readSize = min( self.readSize * 2, self.readMax )
+        elif len( data ) < size // 4:
+            self.readSize = max( self.readSize // 2, self.readMin )
+        return data
+
     def read( self, size=1024 ):
         """Buffered read from node, potentially blocking.
-           size: maximum number of characters to return"""
-        count = len( self.readbuf )
-        if count < size:
-            data = os.read( self.stdout.fileno(), size - count )
-            self.readbuf += self.decoder.decode( data )
-        if size >= len( self.readbuf ):
-            result = self.readbuf
-            self.readbuf = ''
-        else:
-            result = self.readbuf[ :size ]
-            self.readbuf = self.readbuf[ size: ]
-        return result
+           size: maximum number of bytes to return (as a string)"""
+        if not self.readbuf:
+            self.readbuf += self.readRaw( max( size, self.readSize ) )
+        result = self.readbuf[ :size ]
+        del self.readbuf[ :size ]
+        # Our command is only done once we've consumed all of its output
+        if self.agentDone and not self.readbuf:
+            self.agentDone = False
+            self.waiting = False
+        return self.decoder.decode( bytes( result ) )
 
     def readline( self ):
         """Buffered readline from node, potentially blocking.
            returns: line (minus newline) or None"""
-        self.readbuf += self.read( 1024 )
-        if '\n' not in self.readbuf:
-            return None
-        pos = self.readbuf.find( '\n' )
-        line = self.readbuf[ 0: pos ]
-        self.readbuf = self.readbuf[ pos + 1: ]
-        return line
+        pos = self.readbuf.find( b'\n' )
+        if pos < 0:
+            start = len( self.readbuf )
+            self.readbuf += self.readRaw( self.readSize )
+            pos = self.readbuf.find( b'\n', start )
+            if pos < 0:
+                return None
+        line = self.readbuf[ :pos ]
+        del self.readbuf[ :pos + 1 ]
+        return self.decoder.decode( bytes( line ) )
 
     def write( self, data ):
         """Write data to node.
            data: string"""
-        os.write( self.stdin.fileno(), encode( data ) )
+        if self.agent:
+            self.agent.send( nodeagent.INPUT, encode( data ) )
+        else:
+            os.write( self.stdin.fileno(), encode( data ) )
+
+    def agentRead( self ):
+        """Read output of our commands from agent, potentially blocking.
+           Set self.agentDone if the last command has completed.
+           returns: merged stdout and stderr output (bytes)"""
+        frames = self.agent.receive()
+        if frames is None:
+            # Agent has exited
+            self.agentDone = True
+            return b''
+        data = []
+        for kind, reqid, payload in frames:
+            if kind in ( nodeagent.STDOUT, nodeagent.STDERR ):
+                data.append( payload )
+            elif kind == nodeagent.EXIT and reqid == self.lastCmdId:
+                self.lastExitCode, pid = self.agent.parseExit( payload )
+                if self.lastCmd.endswith( '&' ):
+                    self.lastPid = pid
+                self.agentDone = True
+        return b''.join( data )
 
     def terminate( self ):
         "Send kill signal to Node and clean up after it."
-        self.unmountPrivateDirs()
-        if self.shell:
+        if not self.attached:
+            # (Attached shells don't share our old mount namespace)
+            self.unmountPrivateDirs()
+        if self.shell and self.pool and self.pool.put( self ):
+            # Our shell has been reset and returned to the pool
+            self.shell = None
+        elif self.shell:
             if self.shell.poll() is None:
                 os.killpg( self.shell.pid, signal.SIGHUP )
+        if self.nsPinned:
+            quietRun( 'ip netns del ' + self.nsPinned )
+            self.nsPinned = None
         self.cleanup()
 
     def stop( self, deleteIntfs=False ):
@@ -290,10 +502,10 @@ def stop( self, deleteIntfs=False ):
     def waitReadable( self, timeoutms=None ):
         """Wait until node's output is readable.
            timeoutms: timeout in ms or None to wait indefinitely.
-           returns: result of poll()"""
+           returns: result of poll(), or True if output is buffered"""
         if len( self.readbuf ) == 0:
             return self.pollOut.poll( timeoutms )
-        return None
+        return True
 
     def sendCmd( self, *args, **kwargs ):
         """Send a command, followed by a command to echo a sentinel,
@@ -315,6 +527,15 @@ def sendCmd( self, *args, **kwargs ):
             # Replace empty commands with something harmless
             cmd = 'echo -n'
         self.lastCmd = cmd
+        self.lastPid = None
+        if self.agent:
+            # The agent reports the PID of a backgrounded command
+            if ( printPid and cmd[ -1 ] != '&' and
+                 not isShellBuiltin( cmd ) ):
+                cmd = 'mnexec -p ' + cmd
+            self.lastCmdId = self.agent.send( nodeagent.CMD, encode( cmd ) )
+            self.waiting = True
+            return
         # if a builtin command is backgrounded, it still yields a PID
         if len( cmd ) > 0 and cmd[ -1 ] == '&':
             # print ^A{pid}\n so monitor() can set lastPid
@@ -322,11 +543,14 @@ def sendCmd( self, *args, **kwargs ):
         elif printPid and not isShellBuiltin( cmd ):
             cmd = 'mnexec -p ' + cmd
         self.write( cmd + '\n' )
-        self.lastPid = None
         self.waiting = True
 
     def sendInt( self, intr=chr( 3 ) ):
         "Interrupt running command."
+        if self.agent:
+            debug( 'sendInt: sending SIGINT\n' )
+            self.agent.send( nodeagent.SIGNAL, b'%d' % signal.SIGINT )
+            return
         debug( 'sendInt: writing chr(%d)\n' % ord( intr ) )
         self.write( intr )
 
@@ -338,10 +562,10 @@ def monitor( self, timeoutms=None, findPid=True ):
         ready = self.waitReadable( timeoutms )
         if not ready:
             return ''
-        data = self.read( 1024 )
+        data = self.read( self.readSize )
         pidre = r'\[\d+\] \d+\r\n'
         # Look for PID
-        marker = chr( 1 ) + r'\d+\r\n'
+        marker = chr( 1 ) + r'\d+\r?\n'
         if findPid and chr( 1 ) in data:
             # suppress the job and PID of a backgrounded command
             if re.findall( pidre, data ):
@@ -369,16 +593,18 @@ def waitOutput( self, verbose=False, findPid=True ):
            the output, including trailing newline.
            verbose: print output interactively"""
         log = info if verbose else debug
-        output = ''
+        output = []
         while self.waiting:
             data = self.monitor( findPid=findPid )
-            output += data
+            output.append( data )
             log( data )
-        return output
+        return ''.join( output )
 
     def cmd( self, *args, **kwargs ):
         """Send a command, wait for output, and return it.
            cmd: string"""
+        if self.batched is not None:
+            return self.queueCmd( *args )
         verbose = kwargs.get( 'verbose', False )
         log = info if verbose else debug
         log( '*** %s : %s\n' % ( self.name, args ) )
@@ -389,6 +615,154 @@ def cmd( self, *args, **kwargs ):
             warn( '(%s exited - ignoring cmd%s)\n' % ( self, args ) )
         return None
 
+    # Command batching: within a batch() context, cmd() queues
+    # commands, which are sent as one script when the context exits.
+    # Each command is evaluated as its own newline-terminated script
+    # (so comments, heredocs or unbalanced quotes can't affect the
+    # others) and is followed by a builtin printf of batchMarker, so
+    # that we can split the output back into per-command outputs.
+
+    batchMarker = chr( 2 )
+    batchMax = 2048  # maximum script line length
+
+    @contextmanager
+    def batch( self, enabled=True ):
+        """Context in which cmd() queues commands (and returns '')
+           rather than running them; on exit, the queued commands are
+           run as one script, in a single round trip to our shell.
+           Commands whose output is needed right away (e.g. isUp())
+           shouldn't be run in a batch. Nested batches join the
+           outermost one.
+           enabled: batch commands? (if False, they run right away)
+           yields: list of outputs of the queued commands, which is
+           filled in on exit"""
+        if self.batched is not None:
+            yield self.batched[ 1 ]
+            return
+        if not enabled:
+            yield []
+            return
+        cmds, outputs = self.batched = [], []
+        try:
+            yield outputs
+        finally:
+            self.batched = None
+            outputs.extend( self.runBatch( cmds ) )
+
+    def queueCmd( self, *args ):
+        """Internal method: queue a command in our current batch
+           returns: ''"""
+        if len( args ) == 1 and isinstance( args[ 0 ], list ):
+            args = args[ 0 ]
+        cmd = ' '.join( [ str( c ) for c in args ] ).strip()
+        debug( '*** %s : queued %s\n' % ( self.name, cmd ) )
+        self.batched[ 0 ].append( cmd )
+        return ''
+
+    @staticmethod
+    def evalQuote( cmd ):
+        """Return an eval command which runs cmd (plus a newline) as a
+           script, using bash's $'...' quoting so that it fits on one
+           line"""
+        quoted = ''.join(
+            '\\' + c if c in '\\\'' else
+            '\\n' if c == '\n' else
+            '\\x%02x' % ord( c ) if ord( c ) < 32 or ord( c ) == 127 else
+            c for c in cmd )
+        return "eval $'%s\\n'" % quoted
+
+    def runBatch( self, cmds ):
+        """Internal method: run cmds as one script
+           returns: list of outputs, one per command"""
+        if not cmds:
+            return []
+        marker = "printf '\\%03o'" % ord( self.batchMarker )
+        scripts, size = [ [] ], 0
+        for cmd in cmds:
+            cmd = self.evalQuote( cmd ) + '; ' + marker
+            # Stay well under the tty's line length limit (4096)
+            if size and size + len( cmd ) > self.batchMax:
+                scripts.append( [] )
+                size = 0
+            scripts[ -1 ].append( cmd )
+            size += len( cmd ) + 2
+        output = ''.join( self.cmd( '; '.join( script ) ) or ''
+                          for script in scripts )
+        outputs = output.split( self.batchMarker )[ :len( cmds ) ]
+        outputs += [ '' ] * ( len( cmds ) - len( outputs ) )
+        # Suppress the job and PID of backgrounded commands
+        return [ re.sub( r'\[\d+\] \d+\r?\n', '', out )
+                 if cmd.endswith( '&' ) else out
+                 for cmd, out in zip( cmds, outputs ) ]
+
+    def cmdIter( self, *args, **kwargs ):
+        """Send a command and yield its output incrementally, as it
+           arrives, rather than returning it as one (possibly huge) string.
+           If the iterator is closed early, the command is interrupted.
+           cmd: string"""
+        self.sendCmd( *args, **kwargs )
+        try:
+            while self.waiting:
+                data = self.monitor()
+                if data:
+                    yield data
+        finally:
+            if self.waiting:
+                self.sendInt()
+                self.waitOutput()
+
+    def cmdFull( self, *args, **kwargs ):
+        """Send a command, wait for it to complete, and return its
+           output and exit status.
+           cmd: string
+           returns: out, err, exitcode
+           (without an agent, err is merged into out)"""
+        if len( args ) == 1 and isinstance( args[ 0 ], list ):
+            args = args[ 0 ]
+        cmd = ' '.join( [ str( c ) for c in args ] )
+        return self.pipelineCmds( [ cmd ], **kwargs )[ 0 ]
+
+    def pipelineCmds( self, cmds, verbose=False ):
+        """Send several commands without waiting for each one to
+           complete (if we have an agent), then collect their results.
+           cmds: list of command strings
+           verbose: log output interactively
+           returns: list of ( out, err, exitcode )"""
+        log = info if verbose else debug
+        assert self.shell and not self.waiting
+        if not self.agent:
+            results = []
+            for cmd in cmds:
+                out = self.cmd( cmd, verbose=verbose )
+                exitcode = int( self.cmd( 'echo $?' ) )
+                results.append( ( out, '', exitcode ) )
+            return results
+        log( '*** %s : %s\n' % ( self.name, cmds ) )
+        reqids = [ self.agent.queue( nodeagent.CMD, encode( cmd ) )
+                   for cmd in cmds ]
+        outs = { reqid: ( [], [] ) for reqid in reqids }
+        codes = {}
+        while len( codes ) < len( reqids ):
+            # Keep reading replies while we send requests
+            frames = self.agent.exchange()
+            if frames is None:
+                raise Exception( '%s: agent exited' % self.name )
+            for kind, reqid, payload in frames:
+                if reqid not in outs:
+                    continue
+                if kind == nodeagent.STDOUT:
+                    outs[ reqid ][ 0 ].append( payload )
+                elif kind == nodeagent.STDERR:
+                    outs[ reqid ][ 1 ].append( payload )
+                elif kind == nodeagent.EXIT:
+                    codes[ reqid ] = self.agent.parseExit( payload )[ 0 ]
+        results = [ ( decode( b''.join( outs[ reqid ][ 0 ] ) ),
+                      decode( b''.join( outs[ reqid ][ 1 ] ) ),
+                      codes[ reqid ] ) for reqid in reqids ]
+        for out, err, _exitcode in results:
+            log( out + err )
+        return results
+
     def cmdPrint( self, *args):
         """Call cmd and printing its output
            cmd: string"""
@@ -619,13 +993,39 @@ def config( self, mac=None, ip=None,
         # the superclass config method here as follows:
         # r = Parent.config( **_params )
         r = {}
-        self.setParam( r, 'setMAC', mac=mac )
-        self.setParam( r, 'setIP', ip=ip )
-        self.setParam( r, 'setDefaultRoute', defaultRoute=defaultRoute )
-        # This should be examined
-        self.cmd( 'ifconfig lo ' + lo )
+        # These commands don't need each other's output, so we send
+        # them in one batch, unless we (or our default intf) have
+        # overridden methods which may need it
+        with self.batch( enabled=self.batchableConfig() ):
+            self.setParam( r, 'setMAC', mac=mac )
+            self.setParam( r, 'setIP', ip=ip )
+            self.setParam( r, 'setDefaultRoute', defaultRoute=defaultRoute )
+            # This should be examined
+            self.cmd( 'ifconfig lo ' + lo )
         return r
 
+    @staticmethod
+    def overrides( obj, base, *methods ):
+        "Does obj's class override any of base's methods?"
+        for method in methods:
+            for cls in type( obj ).__mro__:
+                if method in cls.__dict__:
+                    break
+            if cls is not base:  # pylint: disable=undefined-loop-variable
+                return True
+        return False
+
+    def batchableConfig( self ):
+        """May config() batch its commands? Not if setMAC(), setIP()
+           or setDefaultRoute() (ours or our default intf's) might
+           need the output of cmd()"""
+        if self.overrides( self, Node, 'setMAC', 'setIP',
+                           'setDefaultRoute' ):
+            return False
+        intf = self.intfs[ min( self.intfs ) ] if self.intfs else None
+        return not ( intf and self.overrides(
+            intf, Intf, 'setMAC', 'setIP', 'ifconfig', 'cmd' ) )
+
     def configDefault( self, **moreParams ):
         "Configure with default parameters"
         self.params.update( moreParams )
@@ -685,17 +1085,32 @@ class CPULimitedHost( Host ):
 
     "CPU limited host"
 
+    # Our shell lives in our cgroup, so it can't go back to a pool
+    reusableShell = False
+
     def __init__( self, name, sched='cfs', **kwargs ):
         Host.__init__( self, name, **kwargs )
         # Initialize class if necessary
         if not CPULimitedHost.inited:
             CPULimitedHost.init()
-        # Create a cgroup and move shell into it
-        self.cgroup = 'cpu,cpuacct,cpuset:/' + self.name
-        errFail( 'cgcreate -g ' + self.cgroup )
-        # We don't add ourselves to a cpuset because you must
-        # specify the cpu and memory placement first
-        errFail( 'cgclassify -g cpu,cpuacct:/%s %s' % ( self.name, self.pid ) )
+        if self.cgroupV2:
+            # Create a cgroup and move shell into it, directly on the
+            # unified hierarchy (no libcgroup tools required)
+            if sched == 'rt':
+                raise Exception( 'sched=rt is not supported with cgroup v2' )
+            self.cgroup = self.name
+            self.cgroupPath = os.path.join( self.cgroupV2Root, self.name )
+            if not os.path.isdir( self.cgroupPath ):
+                os.mkdir( self.cgroupPath )
+            self.cgroupWrite( 'cgroup.procs', self.pid )
+        else:
+            # Create a cgroup and move shell into it
+            self.cgroup = 'cpu,cpuacct,cpuset:/' + self.name
+            errFail( 'cgcreate -g ' + self.cgroup )
+            # We don't add ourselves to a cpuset because you must
+            # specify the cpu and memory placement first
+            errFail( 'cgclassify -g cpu,cpuacct:/%s %s' %
+                     ( self.name, self.pid ) )
         # BL: Setting the correct period/quota is tricky, particularly
         # for RT. RT allows very small quotas, but the overhead
         # seems to be high. CFS has a mininimum quota of 1 ms, but
@@ -706,8 +1121,49 @@ def __init__( self, name, sched='cfs', **kwargs ):
             self.checkRtGroupSched()
             self.rtprio = 20
 
+    def cgroupWrite( self, fname, value ):
+        """Write value to one of our cgroup (v2) files, or queue the
+           write if we are batching (see batchWrites())"""
+        path = os.path.join( self.cgroupPath, fname )
+        if CPULimitedHost.pendingWrites is not None:
+            CPULimitedHost.pendingWrites.append( ( path, value ) )
+            return
+        with open( path, 'w' ) as f:
+            f.write( '%s\n' % value )
+
+    # Queued cgroup (v2) writes while batching, or None
+    pendingWrites = None
+
+    @classmethod
+    @contextmanager
+    def batchWrites( cls ):
+        """Queue cgroup (v2) writes for all hosts, e.g. while
+           Mininet.configHosts() configures them, and then make them
+           in one pass, in order"""
+        if cls.pendingWrites is not None:
+            # Already batching
+            yield
+            return
+        cls.pendingWrites = []
+        try:
+            yield
+        finally:
+            writes, cls.pendingWrites = cls.pendingWrites, None
+        for path, value in writes:
+            with open( path, 'w' ) as f:
+                f.write( '%s\n' % value )
+
+    def cgroupRead( self, fname ):
+        "Return contents of one of our cgroup (v2) files"
+        with open( os.path.join( self.cgroupPath, fname ) ) as f:
+            return f.read().strip()
+
     def cgroupSet( self, param, value, resource='cpu' ):
         "Set a cgroup parameter and return its value"
+        if self.cgroupV2:
+            # The kernel rejects invalid writes, so we don't read back
+            self.cgroupWrite( '%s.%s' % ( resource, param ), value )
+            return value
         cmd = 'cgset -r %s.%s=%s /%s' % (
             resource, param, value, self.name )
         quietRun( cmd )
@@ -718,7 +1174,11 @@ def cgroupSet( self, param, value, resource='cpu' ):
         return nvalue
 
     def cgroupGet( self, param, resource='cpu' ):
-        "Return value of cgroup parameter"
+        "Return (integer) value of cgroup parameter"
+        if self.cgroupV2:
+            value = self.cgroupRead( '%s.%s' % ( resource, param ) )
+            # v2 says 'max' where v1 uses -1 for unlimited
+            return -1 if value == 'max' else int( value )
         cmd = 'cgget -r %s.%s /%s' % (
             resource, param, self.name )
         return int( quietRun( cmd ).split()[ -1 ] )
@@ -726,6 +1186,13 @@ def cgroupGet( self, param, resource='cpu' ):
     def cgroupDel( self ):
         "Clean up our cgroup"
         # info( '*** deleting cgroup', self.cgroup, '\n' )
+        if self.cgroupV2:
+            try:
+                os.rmdir( self.cgroupPath )
+            except OSError as e:
+                # Processes may take a moment to leave the cgroup
+                return e.errno == ENOENT
+            return True
         _out, _err, exitcode = errRun( 'cgdelete -r ' + self.cgroup )
         # Sometimes cgdelete returns a resource busy error but still
         # deletes the group; next attempt will give "no such file"
@@ -826,6 +1293,12 @@ def setCPUFrac( self, f, sched=None ):
             pstr, qstr, period, quota = self.cfsInfo( f )
         else:
             return
+        if self.cgroupV2:
+            # cpu.max holds both quota and period
+            self.cgroupWrite( 'cpu.max', '%s %d' % (
+                quota if quota >= 0 else 'max', period ) )
+            info( '(%s %d/%dus) ' % ( sched, quota, period ) )
+            return
         # Set cgroup's period and quota
         setPeriod = self.cgroupSet( pstr, period )
         setQuota = self.cgroupSet( qstr, quota )
@@ -840,6 +1313,13 @@ def setCPUs( self, cores, mems=0 ):
             return
         if isinstance( cores, list ):
             cores = ','.join( [ str( c ) for c in cores ] )
+        if isinstance( mems, list ):
+            mems = ','.join( [ str( m ) for m in mems ] )
+        if self.cgroupV2:
+            # Our shell is already in our cgroup for all controllers
+            self.cgroupWrite( 'cpuset.cpus', cores )
+            self.cgroupWrite( 'cpuset.mems', mems )
+            return
         self.cgroupSet( resource='cpuset', param='cpus',
                         value=cores )
         # Memory placement is probably not relevant, but we
@@ -852,26 +1332,147 @@ def setCPUs( self, cores, mems=0 ):
                  self.name, self.pid ) )
 
     # pylint: disable=arguments-differ
-    def config( self, cpu=-1, cores=None, **params ):
+    def config( self, cpu=-1, cores=None, mems=None, **params ):
         """cpu: desired overall system CPU fraction
            cores: (real) core(s) this host can run on
+           mems: NUMA memory node(s) for this host (0)
            params: parameters for Node.config()"""
         r = Node.config( self, **params )
         # Was considering cpu={'cpu': cpu , 'sched': sched}, but
         # that seems redundant
         self.setParam( r, 'setCPUFrac', cpu=cpu )
+        if cores is not None:
+            # Pass cores and mems together (setParam() takes one value)
+            cores = dict( cores=cores, mems=0 if mems is None else mems )
         self.setParam( r, 'setCPUs', cores=cores )
         return r
 
+    def cpuUsage( self ):
+        "Return total CPU time (in seconds) used by our cgroup"
+        if self.cgroupV2:
+            for line in self.cgroupRead( 'cpu.stat' ).split( '\n' ):
+                if line.startswith( 'usage_usec ' ):
+                    return int( line.split()[ 1 ] ) / 1e6
+            return 0.0
+        with open( '/sys/fs/cgroup/cpuacct/%s/cpuacct.usage' %
+                   self.name ) as f:
+            return int( f.read() ) / 1e9
+
     inited = False
+    cgroupV2 = False  # using unified (v2) cgroup hierarchy?
+    cgroupV2Root = '/sys/fs/cgroup/mininet'
 
     @classmethod
     def init( cls ):
         "Initialization for CPULimitedHost class"
-        mountCgroups()
+        cls.cgroupV2 = cgroupVersion() == 2
+        mountCgroups( v2root=cls.cgroupV2Root )
         cls.inited = True
 
 
+class NetnsHost( Host ):
+    """A host whose network namespace is pinned by a named namespace
+       file (as created by ip netns add) rather than by a resident
+       shell. Commands run on demand via mnexec -a; a persistent
+       shell is only started when something (e.g. sendCmd() or the
+       CLI) needs one. Note that shell state (cwd, variables) is not
+       preserved between on-demand commands."""
+
+    def __init__( self, name, **params ):
+        self.nsName = self.nsPrefix + name
+        self.nsPath = os.path.join( self.nsDir, self.nsName )
+        Host.__init__( self, name, **params )
+
+    def startShell( self, mnopts=None ):
+        "Create our namespace; our shell is started on demand"
+        if self.privateDirs:
+            raise Exception( '%s: NetnsHost does not support privateDirs'
+                             % self.name )
+        if not self.attached:
+            errFail( 'ip netns add ' + self.nsName )
+
+    def mnexecOpts( self, mnopts=None ):
+        "Return mnexec arguments for running a shell in our namespace"
+        return [ '-cd' if mnopts is None else mnopts, '-a', self.nsPath ]
+
+    def pinNetns( self ):
+        "Our namespace is always pinned"
+        return None
+
+    def ensureShell( self ):
+        "Start our persistent shell if it isn't running yet"
+        if not self.shell:
+            Host.startShell( self )
+
+    def netnsId( self ):
+        "Return the name of our network namespace"
+        return self.nsName
+
+    def netnsPath( self ):
+        "Return path of our network namespace file"
+        return self.nsPath
+
+    def sendCmd( self, *args, **kwargs ):
+        "Start our shell if necessary, and send it a command"
+        self.ensureShell()
+        return Host.sendCmd( self, *args, **kwargs )
+
+    def cmd( self, *args, **kwargs ):
+        """Run a command and return its output, using our shell if
+           it is running, or else running the command on demand.
+           cmd: string"""
+        if len( args ) == 1 and isinstance( args[ 0 ], list ):
+            args = args[ 0 ]
+        cmd = ' '.join( [ str( c ) for c in args ] )
+        if self.batched is not None:
+            return self.queueCmd( cmd )
+        # Background commands need a shell to keep track of them
+        if self.shell or cmd.strip().endswith( '&' ):
+            self.ensureShell()
+            return Host.cmd( self, cmd, **kwargs )
+        log = info if kwargs.get( 'verbose', False ) else debug
+        log( '*** %s : %s\n' % ( self.name, args ) )
+        popen = self.popen( [ 'bash', '-c', cmd ], stdin=PIPE,
+                            stdout=PIPE, stderr=STDOUT )
+        out = decode( popen.communicate()[ 0 ] )
+        self.lastExitCode = popen.wait()
+        log( out )
+        return out
+
+    def pipelineCmds( self, cmds, verbose=False ):
+        """Run several commands, using our shell if it is running
+           cmds: list of command strings
+           verbose: log output interactively
+           returns: list of ( out, err, exitcode )"""
+        if self.shell:
+            return Host.pipelineCmds( self, cmds, verbose=verbose )
+        log = info if verbose else debug
+        log( '*** %s : %s\n' % ( self.name, cmds ) )
+        results = [ self.pexec( 'bash', '-c', cmd ) for cmd in cmds ]
+        for out, err, _exitcode in results:
+            log( out + err )
+        return results
+
+    def popen( self, *args, **kwargs ):
+        "Return a Popen() object in our namespace"
+        kwargs.setdefault( 'mncmd', [ 'mnexec', '-da', self.nsPath ] )
+        return Host.popen( self, *args, **kwargs )
+
+    def terminate( self ):
+        "Stop our shell and anything else in our namespace, and remove it"
+        Host.terminate( self )
+        pids = quietRun( 'ip netns pids ' + self.nsName ).split()
+        if pids:
+            quietRun( 'kill -9 ' + ' '.join( pids ) )
+        quietRun( 'ip netns del ' + self.nsName )
+
+    @classmethod
+    def setup( cls ):
+        "Make sure our dependencies are available"
+        Host.setup()
+        pathCheck( 'ip', moduleName='NetnsHost' )
+
+
 # Some important things to note:
 #
 # The "IP" address which setIP() assigns to the switch is not
@@ -1024,6 +1625,10 @@ def TCReapply( intf ):
             if res is None:  # link may not have TC parameters
                 return
 
+            if intf.pendingTC:
+                # We need our TCIntf configuration now
+                intf.batchShape( [ intf ] )
+
             # Re-add qdisc, root, and default classes user switch created, but
             # with new parent, as setup by Mininet's TCIntf
             parent = res['parent']
@@ -1138,8 +1743,10 @@ def vsctl( self, *args, **kwargs ):
     def TCReapply( intf ):
         """Unfortunately OVS and Mininet are fighting
            over tc queuing disciplines. As a quick hack/
-           workaround, we clear OVS's and reapply our own."""
-        if isinstance( intf, TCIntf ):
+           workaround, we clear OVS's and reapply our own.
+           (Shaping which is still pending is applied after OVS is
+           done; on a deferring node, config() makes it pending.)"""
+        if isinstance( intf, TCIntf ) and not intf.pendingTC:
             intf.config( **intf.params )
 
     def attach( self, intf ):
@@ -1269,8 +1876,7 @@ def batchStartup( cls, switches, run=errRun ):
         # Reapply link config if necessary...
         for switch in switches:
             for intf in switch.intfs.values():
-                if isinstance( intf, TCIntf ):
-                    intf.config( **intf.params )
+                cls.TCReapply( intf )
         return switches
 
     def stop( self, deleteIntfs=True ):
@@ -1297,6 +1903,33 @@ def batchShutdown( cls, switches, run=errRun ):
             switch.terminate()
         return switches
 
+    @classmethod
+    def batchAttach( cls, pairs, run=errRun ):
+        """Connect data ports to running OVS switches, using a single
+           ovs-vsctl command
+           pairs: list of ( switch, intf )"""
+        if not pairs:
+            return
+        run( 'ovs-vsctl ' + ' -- '.join(
+            'add-port %s %s%s' % ( switch, intf, switch.intfOpts( intf ) )
+            for switch, intf in pairs ) )
+        run( 'sh -c "%s"' % '; '.join( 'ip link set %s up' % intf
+                                        for _switch, intf in pairs ) )
+        for _switch, intf in pairs:
+            cls.TCReapply( intf )
+
+    @classmethod
+    def batchDetach( cls, pairs, run=errRun ):
+        """Disconnect data ports from OVS switches, using a single
+           ovs-vsctl command
+           pairs: list of ( switch, intf )"""
+        if not pairs:
+            return
+        delcmd = 'del-port %s %s'
+        if not pairs[ 0 ][ 0 ].isOldOVS():
+            delcmd = '--if-exists ' + delcmd
+        run( 'ovs-vsctl ' + ' -- '.join( delcmd % pair for pair in pairs ) )
+
 
 OVSKernelSwitch = OVSSwitch
 
@@ -1418,15 +2051,7 @@ def __init__( self, name, inNamespace=False, command='controller',
 
     def checkListening( self ):
         "Make sure no controllers are running on our port"
-        # Verify that Telnet is installed first:
-        out, _err, returnCode = errRun( "which telnet" )
-        if 'telnet' not in out or returnCode != 0:
-            raise Exception( "Error running telnet to check for listening "
-                             "controllers; please check that it is "
-                             "installed." )
-        listening = self.cmd( "echo A | telnet -e A %s %d" %
-                              ( self.ip, self.port ) )
-        if 'Connected' in listening:
+        if isListening( self, self.ip, self.port ):
             servers = self.cmd( 'netstat -natp' ).split( '\n' )
             pstr = ':%d ' % self.port
             clist = servers[ 0:1 ] + [ s for s in servers if pstr in s ]
@@ -1533,6 +2158,46 @@ def __init__( self, name, *ryuArgs, **kwargs ):
                              **kwargs )
 
 
+class PythonController( Controller ):
+    """Mininet's own asyncio OpenFlow 1.0/1.3 learning switch
+       controller (mininet/ofcontroller.py), which handles thousands
+       of switches in one process and needs nothing but Python 3.7+"""
+
+    script = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ),
+                           'ofcontroller.py' )
+
+    def __init__( self, name, idle=60, **kwargs ):
+        """name: name to give controller
+           idle: idle timeout for learned flows (seconds)"""
+        self.statsFile = '/tmp/%s.stats' % name
+        kwargs.setdefault( 'command', sys.executable )
+        kwargs.setdefault( 'cargs', '%s --port %%d --idle %d --stats %s' %
+                           ( self.script, idle, self.statsFile ) )
+        Controller.__init__( self, name, **kwargs )
+
+    def start( self ):
+        "Start controller, removing any old stats file"
+        if os.path.exists( self.statsFile ):
+            os.unlink( self.statsFile )
+        Controller.start( self )
+
+    def stats( self ):
+        """Return per-switch counters, updated every second
+           returns: dict of dpid -> dict of packetIns, flowMods,
+                    packetOuts, floods, connected and (if the switch
+                    has disconnected) disconnected times"""
+        try:
+            with open( self.statsFile ) as f:
+                return json.load( f )
+        except ( IOError, ValueError ):
+            return {}
+
+    @classmethod
+    def isAvailable( cls ):
+        "Is controller available?"
+        return sys.version_info >= ( 3, 7 )
+
+
 class RemoteController( Controller ):
     "Controller running outside of Mininet's control."
 
@@ -1573,8 +2238,7 @@ def checkListening( self ):
 
     def isListening( self, ip, port ):
         "Check if a remote controller is listening at a specific ip and port"
-        listening = self.cmd( "echo A | telnet -e A %s %d" % ( ip, port ) )
-        if 'Connected' not in listening:
+        if not isListening( self, ip, port ):
             warn( "Unable to contact the remote controller"
                   " at %s:%d\n" % ( ip, port ) )
             return False
@@ -1582,7 +2246,7 @@ def isListening( self, ip, port ):
             return True
 
 
-DefaultControllers = ( Controller, OVSController )
+DefaultControllers = ( Controller, OVSController, PythonController )
 
 def findController( controllers=DefaultControllers ):
     "Return first available controller from list, if any"
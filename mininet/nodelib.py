@@ -4,63 +4,180 @@
 This contains additional Node types which you may find to be useful.
 """
 
+from subprocess import Popen, PIPE, STDOUT
+
 from mininet.node import Node, Switch
-from mininet.log import info, warn
+from mininet.log import info, warn, debug, error
 from mininet.moduledeps import pathCheck
-from mininet.util import quietRun
+from mininet.util import quietRun, encode, decode
+
+
+def ipBatch( cmds, node=None, tool='ip' ):
+    """Run ip commands with a single ip -batch
+       cmds: list of ip commands (without the leading 'ip')
+       node: node whose namespace we run in (None: root namespace)
+       tool: batch command (ip or tc)
+       returns: output (error messages, if any)"""
+    if not cmds:
+        return ''
+    args = [ tool, '-force', '-batch', '-' ]
+    if node:
+        popen = node.popen( args, stdin=PIPE, stdout=PIPE, stderr=STDOUT )
+    else:
+        popen = Popen( args, stdin=PIPE, stdout=PIPE, stderr=STDOUT )
+    out, _err = popen.communicate( encode( '\n'.join( cmds ) + '\n' ) )
+    return decode( out )
+
+
+def tcBatch( cmds, node=None ):
+    """Run tc commands with a single tc -batch
+       cmds: list of tc commands (without the leading 'tc')
+       node: node whose namespace we run in (None: root namespace)
+       returns: output (error messages, if any)"""
+    return ipBatch( cmds, node=node, tool='tc' )
 
 
 class LinuxBridge( Switch ):
     "Linux Bridge (with optional spanning tree)"
 
-    nextPrio = 100  # next bridge priority for spanning tree
+    prioBase = 100  # lowest bridge priority for spanning tree
+    prios = set()  # bridge priorities in use (released on terminate())
+    brctl = None  # is brctl installed?
 
-    def __init__( self, name, stp=False, prio=None, **kwargs ):
+    def __init__( self, name, stp=False, prio=None, batch=False,
+                  **kwargs ):
         """stp: use spanning tree protocol? (default False)
-           prio: optional explicit bridge priority for STP"""
+           prio: optional explicit bridge priority for STP
+           batch: defer startup to batchStartup()? (False)"""
         self.stp = stp
+        self.autoPrio = not prio
         if prio:
             self.prio = prio
         else:
-            self.prio = LinuxBridge.nextPrio
-            LinuxBridge.nextPrio += 1
+            # Lowest free priority, so that we don't run out in
+            # processes which create many networks
+            self.prio = self.prioBase
+            while self.prio in LinuxBridge.prios:
+                self.prio += 1
+            LinuxBridge.prios.add( self.prio )
+        self.batch = batch
         Switch.__init__( self, name, **kwargs )
 
     def connected( self ):
         "Are we forwarding yet?"
         if self.stp:
-            return 'forwarding' in self.cmd( 'brctl showstp', self )
+            ports = [ line for line in
+                      self.cmd( 'bridge link show' ).split( '\n' )
+                      if ' master %s ' % self in line ]
+            return any( 'forwarding' in line for line in ports )
         else:
             return True
 
+    def addCmds( self ):
+        "Return ip commands to create, populate and start our bridge"
+        opts = ( ' stp_state 1 priority %d' % self.prio if self.stp
+                 else '' )
+        cmds = [ 'link add %s type bridge%s' % ( self, opts ) ]
+        cmds += [ 'link set %s master %s' % ( intf, self )
+                  for intf in self.intfList() if self.name in intf.name ]
+        cmds.append( 'link set %s up' % self )
+        return cmds
+
     def start( self, _controllers ):
-        "Start Linux bridge"
-        self.cmd( 'ifconfig', self, 'down' )
-        self.cmd( 'brctl delbr', self )
-        self.cmd( 'brctl addbr', self )
-        if self.stp:
-            self.cmd( 'brctl setbridgeprio', self.prio )
-            self.cmd( 'brctl stp', self, 'on' )
-        for i in self.intfList():
-            if self.name in i.name:
-                self.cmd( 'brctl addif', self, i )
-        self.cmd( 'ifconfig', self, 'up' )
+        "Start Linux bridge (or wait for batchStartup())"
+        if self.batch:
+            return
+        # Remove any stale bridge, then create ours
+        ipBatch( [ 'link del %s' % self ], node=self )
+        out = ipBatch( self.addCmds(), node=self )
+        if out:
+            error( '*** %s: error starting bridge: %s' % ( self, out ) )
 
     def stop( self, deleteIntfs=True ):
         """Stop Linux bridge
            deleteIntfs: delete interfaces? (True)"""
-        self.cmd( 'ifconfig', self, 'down' )
-        self.cmd( 'brctl delbr', self )
+        self.cmd( 'ip link del', self )
         super( LinuxBridge, self ).stop( deleteIntfs )
 
+    def terminate( self ):
+        "Release our bridge priority and terminate"
+        if self.autoPrio:
+            LinuxBridge.prios.discard( self.prio )
+            self.autoPrio = False
+        super( LinuxBridge, self ).terminate()
+
+    @classmethod
+    def batchStartup( cls, switches ):
+        """Start bridges which are waiting for us, using a few
+           ip -batch commands for all bridges in the root namespace
+           returns: bridges we started"""
+        switches = [ s for s in switches if s.batch ]
+        for switch in switches:
+            switch.batch = False
+        local = [ s for s in switches if not s.inNamespace ]
+        ipBatch( [ 'link del %s' % s for s in local ] )
+        out = ipBatch( sum( [ s.addCmds() for s in local ], [] ) )
+        if out:
+            error( '*** error starting bridges: %s' % out )
+        for switch in switches:
+            if switch.inNamespace:
+                switch.start( [] )
+        return switches
+
+    @classmethod
+    def batchShutdown( cls, switches ):
+        """Delete bridges, using one ip -batch command for all
+           bridges in the root namespace
+           returns: bridges we stopped"""
+        local = [ s for s in switches if not s.inNamespace ]
+        out = ipBatch( [ 'link del %s' % s for s in local ] )
+        if out:
+            debug( 'batchShutdown:', out )
+        for switch in switches:
+            if switch.inNamespace:
+                switch.stop()
+        return switches
+
+    def attach( self, intf ):
+        "Connect a data port"
+        ipBatch( [ 'link set %s master %s up' % ( intf, self ) ], node=self )
+
+    def detach( self, intf ):
+        "Disconnect a data port"
+        ipBatch( [ 'link set %s nomaster' % intf ], node=self )
+
+    @classmethod
+    def batchAttach( cls, pairs ):
+        """Connect data ports, using one ip -batch command for all
+           bridges in the root namespace
+           pairs: list of ( bridge, intf )"""
+        ipBatch( [ 'link set %s master %s up' % ( intf, switch )
+                   for switch, intf in pairs if not switch.inNamespace ] )
+        for switch, intf in pairs:
+            if switch.inNamespace:
+                switch.attach( intf )
+
+    @classmethod
+    def batchDetach( cls, pairs ):
+        """Disconnect data ports, using one ip -batch command for all
+           bridges in the root namespace
+           pairs: list of ( bridge, intf )"""
+        ipBatch( [ 'link set %s nomaster' % intf
+                   for switch, intf in pairs if not switch.inNamespace ] )
+        for switch, intf in pairs:
+            if switch.inNamespace:
+                switch.detach( intf )
+
     def dpctl( self, *args ):
-        "Run brctl command"
-        return self.cmd( 'brctl', *args )
+        "Run brctl command (or bridge command, if brctl is missing)"
+        if self.brctl is None:
+            LinuxBridge.brctl = bool( quietRun( 'which brctl' ) )
+        return self.cmd( 'brctl' if self.brctl else 'bridge', *args )
 
     @classmethod
     def setup( cls ):
         "Check dependencies and warn about firewalling"
-        pathCheck( 'brctl', moduleName='bridge-utils' )
+        pathCheck( 'ip', 'bridge', moduleName='iproute2' )
         # Disable Linux bridge firewalling so that traffic can flow!
         for table in 'arp', 'ip', 'ip6':
             cmd = 'sysctl net.bridge.bridge-nf-call-%stables' % table
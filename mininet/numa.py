@@ -0,0 +1,214 @@
+"""
+numa.py: topology- and NUMA-aware CPU pinning for Mininet
+
+Simple round-robin pinning (core = host number % cores) ignores the
+machine's layout: on a multi-socket machine, hosts which talk to each
+other may end up on different NUMA nodes, and hosts may be packed onto
+SMT siblings while other physical cores sit idle.
+
+CPULayout reads the CPU and NUMA layout from sysfs, and CPUPlanner
+uses it, along with a Topo's adjacency, to place hosts:
+
+- hosts are ordered by a breadth-first walk of the topology, so that
+  hosts on the same (or nearby) switches are adjacent in the order
+
+- the order is cut into contiguous runs, one per NUMA node, filling
+  each node's available CPUs in turn (or, if there are more hosts
+  than CPUs, in proportion to each node's share of the CPUs)
+
+- within a node, hosts are spread over distinct physical cores before
+  SMT siblings are used, and each host's memory placement (mems) is
+  set to its node
+
+Hosts added later (e.g. with Mininet.addHost() outside a Topo) are
+placed one at a time on the least used available CPU.
+
+Optionally, some CPUs may be reserved (on the first NUMA node) for
+switch and controller processes such as ovs-vswitchd.
+"""
+
+import os
+from glob import glob
+
+from mininet.util import quietRun
+
+
+def parseCpuList( cpulist ):
+    "Parse a sysfs/cpuset CPU list such as '0-3,8,10-11'"
+    cpus = []
+    for part in cpulist.strip().split( ',' ):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split( '-' )
+            cpus += range( int( first ), int( last ) + 1 )
+        else:
+            cpus.append( int( part ) )
+    return cpus
+
+
+def cpuListStr( cpus ):
+    "Return CPU list string (e.g. for taskset or cpuset.cpus)"
+    return ','.join( str( cpu ) for cpu in cpus )
+
+
+class CPULayout( object ):
+    "CPU and NUMA layout of this machine, as reported by sysfs"
+
+    def __init__( self, sysfs='/sys/devices/system' ):
+        """sysfs: sysfs system devices directory
+           (/sys/devices/system)"""
+        self.sysfs = sysfs
+        self.online = self.readCpus( 'cpu/online' )
+        self.nodes = {}  # NUMA node -> CPUs, in placement order
+        for path in glob( os.path.join( sysfs, 'node', 'node[0-9]*' ) ):
+            node = int( os.path.basename( path )[ 4: ] )
+            cpus = [ cpu for cpu in self.readCpus(
+                os.path.join( 'node', 'node%d' % node, 'cpulist' ) )
+                     if cpu in self.online ]
+            if cpus:
+                self.nodes[ node ] = self.placementOrder( cpus )
+        if not self.nodes:
+            # No NUMA information: a single node with all CPUs
+            self.nodes[ 0 ] = self.placementOrder( self.online )
+
+    def read( self, path ):
+        "Return contents of a sysfs file, or None"
+        try:
+            with open( os.path.join( self.sysfs, path ) ) as f:
+                return f.read().strip()
+        except ( IOError, OSError ):
+            return None
+
+    def readCpus( self, path ):
+        "Return CPU list from a sysfs file"
+        cpulist = self.read( path )
+        return parseCpuList( cpulist ) if cpulist else []
+
+    def core( self, cpu ):
+        "Return ( package, core ) identifying cpu's physical core"
+        topology = 'cpu/cpu%d/topology/' % cpu
+        package = self.read( topology + 'physical_package_id' )
+        core = self.read( topology + 'core_id' )
+        if package is None or core is None:
+            return ( 0, 'cpu%d' % cpu )
+        return ( int( package ), int( core ) )
+
+    def placementOrder( self, cpus ):
+        """Order cpus so that the first thread of every physical core
+           comes before any of their SMT siblings"""
+        cores = {}
+        for cpu in sorted( cpus ):
+            cores.setdefault( self.core( cpu ), [] ).append( cpu )
+        threads = sorted( cores.values() )
+        order = []
+        for i in range( max( len( t ) for t in threads ) ):
+            order += [ t[ i ] for t in threads if i < len( t ) ]
+        return order
+
+    def __repr__( self ):
+        return '<CPULayout %s>' % ', '.join(
+            'node%d: %s' % ( node, cpuListStr( cpus ) )
+            for node, cpus in sorted( self.nodes.items() ) )
+
+
+class CPUPlanner( object ):
+    "Plan placement of hosts (and reserved CPUs) on a CPULayout"
+
+    def __init__( self, layout=None, reserve=0 ):
+        """layout: CPULayout (default: read from sysfs)
+           reserve: number of CPUs to reserve for switches and
+                    controllers (0)"""
+        self.layout = layout or CPULayout()
+        nodes = self.layout.nodes
+        first = min( nodes )
+        if reserve >= sum( len( cpus ) for cpus in nodes.values() ):
+            raise Exception( 'cannot reserve %d of %d CPUs' %
+                             ( reserve, len( self.layout.online ) ) )
+        # Reserve CPUs (distinct physical cores) from the first node
+        self.reserved = nodes[ first ][ :reserve ]
+        self.available = {}
+        for node, cpus in sorted( nodes.items() ):
+            cpus = [ cpu for cpu in cpus if cpu not in self.reserved ]
+            if cpus:
+                self.available[ node ] = cpus
+        self.used = {}  # CPU -> number of hosts placed on it
+
+    @staticmethod
+    def hostOrder( topo ):
+        """Return topo's hosts in breadth-first order over the
+           topology, so that neighboring hosts are adjacent"""
+        neighbors = {}
+        for src, dst in topo.links():
+            neighbors.setdefault( src, [] ).append( dst )
+            neighbors.setdefault( dst, [] ).append( src )
+        hosts = set( topo.hosts() )
+        order, seen = [], set()
+        for root in topo.switches() + topo.hosts():
+            if root in seen:
+                continue
+            seen.add( root )
+            queue = [ root ]
+            while queue:
+                node = queue.pop( 0 )
+                if node in hosts:
+                    order.append( node )
+                # Visit our hosts first, then other switches
+                for neighbor in sorted( neighbors.get( node, [] ),
+                                        key=lambda n: ( n not in hosts, n ) ):
+                    if neighbor not in seen:
+                        seen.add( neighbor )
+                        queue.append( neighbor )
+        return order
+
+    def plan( self, topo=None, hosts=None ):
+        """Plan host placement
+           topo: Topo whose hosts we should place
+           hosts: list of host names, in placement order (if no topo)
+           returns: dict of host name -> { 'cores': [ cpu ],
+                                           'mems': [ node ] }"""
+        order = self.hostOrder( topo ) if topo else list( hosts or [] )
+        total = sum( len( cpus ) for cpus in self.available.values() )
+        placement, start, share = {}, 0, 0
+        for node, cpus in sorted( self.available.items() ):
+            # Give each node a contiguous run of hosts: as many as it
+            # has CPUs if there are enough to go around, or else in
+            # proportion to its share of the available CPUs
+            share += len( cpus )
+            if len( order ) <= total:
+                end = share
+            else:
+                end = ( len( order ) * share + total - 1 ) // total
+            for i, host in enumerate( order[ start:end ] ):
+                placement[ host ] = self.use( node, cpus[ i % len( cpus ) ] )
+            start = end
+        return placement
+
+    def use( self, node, cpu ):
+        "Record a host placed on cpu; return its cores and mems"
+        self.used[ cpu ] = self.used.get( cpu, 0 ) + 1
+        return { 'cores': [ cpu ], 'mems': [ node ] }
+
+    def place( self ):
+        """Place one more host on the least used available CPU
+           returns: { 'cores': [ cpu ], 'mems': [ node ] }"""
+        _count, _order, node, cpu = min(
+            ( self.used.get( cpu, 0 ), i, node, cpu )
+            for node, cpus in sorted( self.available.items() )
+            for i, cpu in enumerate( cpus ) )
+        return self.use( node, cpu )
+
+    def free( self ):
+        "Return available CPUs which have no hosts placed on them"
+        return [ cpu for _node, cpus in sorted( self.available.items() )
+                 for cpu in cpus if not self.used.get( cpu ) ]
+
+
+def pinPids( pids, cpus, threads=True ):
+    """Pin processes to cpus using taskset
+       pids: list of process ids
+       cpus: list of CPUs
+       threads: pin all of each process's threads? (True)"""
+    opts = '-apc' if threads else '-pc'
+    for pid in pids:
+        quietRun( 'taskset %s %s %s' % ( opts, cpuListStr( cpus ), pid ) )
@@ -0,0 +1,323 @@
+"""
+ofcontroller.py: a small asyncio OpenFlow learning switch controller
+
+This is the controller run by mininet.node.PythonController, so that
+Mininet networks don't depend on an external controller being
+installed. It speaks just enough OpenFlow 1.0 and 1.3 to act as an L2
+learning switch:
+
+- version negotiation (using the hello version bitmap if the switch
+  sends one), echo replies, and a features request for each switch's
+  datapath id
+
+- for OpenFlow 1.3, a table-miss flow which sends packets to us
+
+- MAC learning on packet-in: packets to known destinations get a
+  flow (with an idle timeout) and a packet-out, and others are flooded
+
+All switch connections are handled by one asyncio event loop, so a
+single controller process can handle thousands of switches. Per-switch
+counters (packet-ins, flow-mods, packet-outs, floods, and connection
+and disconnection times) are periodically written to a JSON stats file.
+
+Usage: python3 -m mininet.ofcontroller [--port 6653] [--idle 60]
+           [--stats file] [--interval 1]
+
+Note: requires Python 3.7 or later.
+"""
+
+import asyncio
+import json
+import os
+import struct
+import sys
+from argparse import ArgumentParser
+from time import time
+
+OFP10, OFP13 = 1, 4
+VERSIONS = ( OFP10, OFP13 )
+
+# Message types (the same in OpenFlow 1.0 and 1.3 for those we use)
+HELLO, ERROR, ECHO_REQUEST, ECHO_REPLY = 0, 1, 2, 3
+FEATURES_REQUEST, FEATURES_REPLY, SET_CONFIG = 5, 6, 9
+PACKET_IN, PACKET_OUT, FLOW_MOD = 10, 13, 14
+
+HEADER = struct.Struct( '!BBHI' )  # version, type, length, xid
+NO_BUFFER = 0xffffffff
+HELLO_BITMAP = 1
+
+# OpenFlow 1.0
+MATCH10 = struct.Struct( '!IH6s6sHBxHBBxxIIHH' )
+FLOW_MOD10 = struct.Struct( '!QHHHHIHH' )
+PACKET_IN10 = struct.Struct( '!IHHBx' )
+PACKET_OUT10 = struct.Struct( '!IHH' )
+OUTPUT10 = struct.Struct( '!HHHH' )
+OFPFW_ALL = ( 1 << 22 ) - 1
+OFPFW_IN_PORT, OFPFW_DL_SRC, OFPFW_DL_DST = 1, 4, 8
+OFPP10_FLOOD, OFPP10_NONE = 0xfffb, 0xffff
+
+# OpenFlow 1.3
+FLOW_MOD13 = struct.Struct( '!QQBBHHHIIIH2x' )
+PACKET_IN13 = struct.Struct( '!IHBBQ' )
+PACKET_OUT13 = struct.Struct( '!IIH6x' )
+OUTPUT13 = struct.Struct( '!HHIH6x' )
+APPLY_ACTIONS = 4
+OXM_IN_PORT, OXM_ETH_DST, OXM_ETH_SRC = 0x80000004, 0x80000606, 0x80000806
+OFPP13_FLOOD, OFPP13_CONTROLLER = 0xfffffffb, 0xfffffffd
+OFPP13_ANY, OFPG_ANY = 0xffffffff, 0xffffffff
+OFPCML_NO_BUFFER = 0xffff
+
+
+def pad8( data ):
+    "Pad data to a multiple of 8 bytes"
+    return data + b'\0' * ( -len( data ) % 8 )
+
+
+def match13( fields ):
+    "Return an OXM match for fields: list of ( oxm header, value bytes )"
+    oxms = b''.join( struct.pack( '!I', oxm ) + value
+                     for oxm, value in fields )
+    return pad8( struct.pack( '!HH', 1, 4 + len( oxms ) ) + oxms )
+
+
+def parseMatch13( data, offset ):
+    """Parse an OXM match at offset
+       returns: dict of oxm header -> value bytes, offset past match"""
+    _kind, length = struct.unpack_from( '!HH', data, offset )
+    fields, pos, end = {}, offset + 4, offset + length
+    while pos + 4 <= end:
+        oxm, = struct.unpack_from( '!I', data, pos )
+        size = oxm & 0xff
+        fields[ oxm ] = data[ pos + 4:pos + 4 + size ]
+        pos += 4 + size
+    return fields, offset + ( ( length + 7 ) // 8 ) * 8
+
+
+class SwitchConnection( object ):
+    "Connection to one OpenFlow switch, acting as a learning switch"
+
+    def __init__( self, controller, reader, writer ):
+        self.controller = controller
+        self.reader, self.writer = reader, writer
+        self.version = OFP13
+        self.dpid = None
+        self.xid = 0
+        self.macs = {}  # MAC address -> port
+        self.counters = dict( packetIns=0, flowMods=0, packetOuts=0,
+                              floods=0, connected=time() )
+
+    def send( self, kind, body=b'', xid=None ):
+        "Send an OpenFlow message"
+        if xid is None:
+            self.xid = ( self.xid + 1 ) & 0xffffffff
+            xid = self.xid
+        self.writer.write( HEADER.pack( self.version, kind,
+                                        HEADER.size + len( body ), xid ) +
+                           body )
+
+    async def run( self ):
+        "Handle messages from our switch until it disconnects"
+        # Offer OpenFlow 1.0 and 1.3 in a version bitmap
+        bitmap = sum( 1 << v for v in VERSIONS )
+        self.send( HELLO, struct.pack( '!HHI', HELLO_BITMAP, 8, bitmap ) )
+        try:
+            while True:
+                header = await self.reader.readexactly( HEADER.size )
+                version, kind, length, xid = HEADER.unpack( header )
+                body = await self.reader.readexactly( length - HEADER.size )
+                self.handle( version, kind, xid, body )
+                await self.writer.drain()
+        except ( asyncio.IncompleteReadError, ConnectionError ):
+            pass
+        finally:
+            self.writer.close()
+
+    def handle( self, version, kind, xid, body ):
+        "Handle a message"
+        if kind == HELLO:
+            self.hello( version, body )
+        elif kind == ECHO_REQUEST:
+            self.send( ECHO_REPLY, body, xid )
+        elif kind == FEATURES_REPLY:
+            self.dpid = '%016x' % struct.unpack_from( '!Q', body )[ 0 ]
+            self.controller.switches[ self.dpid ] = self
+            self.controller.counters[ self.dpid ] = self.counters
+        elif kind == PACKET_IN:
+            self.packetIn( body )
+        elif kind == ERROR:
+            errType, code = struct.unpack_from( '!HH', body )
+            self.controller.log( '%s: error type %d code %d' %
+                                 ( self.dpid, errType, code ) )
+
+    def hello( self, version, body ):
+        """Negotiate version and configure switch
+           version: version in the switch's hello
+           body: hello body (possibly containing a version bitmap)"""
+        theirs = None
+        pos = 0
+        while pos + 4 <= len( body ):
+            element, length = struct.unpack_from( '!HH', body, pos )
+            if element == HELLO_BITMAP and length >= 8:
+                theirs = struct.unpack_from( '!I', body, pos + 4 )[ 0 ]
+            if length < 4:
+                break
+            pos += ( length + 7 ) // 8 * 8
+        if theirs:
+            common = [ v for v in VERSIONS if theirs & ( 1 << v ) ]
+            if not common:
+                self.controller.log( 'no common OpenFlow version' )
+                self.writer.close()
+                return
+            self.version = max( common )
+        else:
+            # Without a bitmap, use the lower of our version and theirs
+            self.version = OFP13 if version >= OFP13 else OFP10
+        self.send( FEATURES_REQUEST )
+        self.send( SET_CONFIG, struct.pack( '!HH', 0, OFPCML_NO_BUFFER ) )
+        if self.version == OFP13:
+            # Table-miss flow: send unmatched packets to us
+            actions = OUTPUT13.pack( 0, OUTPUT13.size, OFPP13_CONTROLLER,
+                                     OFPCML_NO_BUFFER )
+            self.flowMod( match13( [] ), actions, priority=0, idle=0 )
+
+    def flowMod( self, match, actions, priority, idle ):
+        "Add a flow"
+        if self.version == OFP10:
+            body = match + FLOW_MOD10.pack( 0, 0, idle, 0, priority,
+                                            NO_BUFFER, OFPP10_NONE, 0 )
+            body += actions
+        else:
+            instruction = struct.pack( '!HH4x', APPLY_ACTIONS,
+                                       8 + len( actions ) ) + actions
+            body = FLOW_MOD13.pack( 0, 0, 0, 0, idle, 0, priority,
+                                    NO_BUFFER, OFPP13_ANY, OFPG_ANY,
+                                    0 ) + match + instruction
+        self.send( FLOW_MOD, body )
+        self.counters[ 'flowMods' ] += 1
+
+    def packetOut( self, bufferId, inPort, port, data ):
+        "Send a packet (or a buffered one) out of port"
+        if bufferId != NO_BUFFER:
+            data = b''
+        if self.version == OFP10:
+            actions = OUTPUT10.pack( 0, OUTPUT10.size, port, 0 )
+            body = PACKET_OUT10.pack( bufferId, inPort, len( actions ) )
+        else:
+            actions = OUTPUT13.pack( 0, OUTPUT13.size, port, 0 )
+            body = PACKET_OUT13.pack( bufferId, inPort, len( actions ) )
+        self.send( PACKET_OUT, body + actions + data )
+        self.counters[ 'packetOuts' ] += 1
+
+    def packetIn( self, body ):
+        "Learn source MAC; forward or flood"
+        self.counters[ 'packetIns' ] += 1
+        if self.version == OFP10:
+            bufferId, _total, inPort, _reason = PACKET_IN10.unpack_from(
+                body )
+            data = body[ PACKET_IN10.size: ]
+            flood = OFPP10_FLOOD
+        else:
+            bufferId, _total, _reason, _table, _cookie = (
+                PACKET_IN13.unpack_from( body ) )
+            fields, pos = parseMatch13( body, PACKET_IN13.size )
+            inPort = struct.unpack( '!I', fields[ OXM_IN_PORT ] )[ 0 ]
+            data = body[ pos + 2: ]
+            flood = OFPP13_FLOOD
+        if len( data ) < 14:
+            return
+        dst, src = data[ 0:6 ], data[ 6:12 ]
+        if not src[ 0 ] & 1:
+            self.macs[ src ] = inPort
+        port = self.macs.get( dst )
+        if port is None or dst[ 0 ] & 1:
+            self.counters[ 'floods' ] += 1
+            self.packetOut( bufferId, inPort, flood, data )
+            return
+        if port == inPort:
+            return
+        idle = self.controller.idle
+        if self.version == OFP10:
+            wildcards = OFPFW_ALL & ~(
+                OFPFW_IN_PORT | OFPFW_DL_SRC | OFPFW_DL_DST )
+            match = MATCH10.pack( wildcards, inPort, src, dst,
+                                  0, 0, 0, 0, 0, 0, 0, 0, 0 )
+            actions = OUTPUT10.pack( 0, OUTPUT10.size, port, 0 )
+        else:
+            match = match13( [ ( OXM_IN_PORT, struct.pack( '!I', inPort ) ),
+                               ( OXM_ETH_DST, dst ), ( OXM_ETH_SRC, src ) ] )
+            actions = OUTPUT13.pack( 0, OUTPUT13.size, port, 0 )
+        self.flowMod( match, actions, priority=100, idle=idle )
+        self.packetOut( bufferId, inPort, port, data )
+
+
+class LearningController( object ):
+    "OpenFlow learning switch controller for many switches"
+
+    def __init__( self, port=6653, idle=60, statsFile=None, interval=1.0 ):
+        """port: TCP port to listen on
+           idle: idle timeout for flows (seconds)
+           statsFile: file to write JSON counters to, or None
+           interval: stats file update interval (seconds)"""
+        self.port, self.idle = port, idle
+        self.statsFile, self.interval = statsFile, interval
+        self.switches = {}  # dpid -> connected SwitchConnection
+        self.counters = {}  # dpid -> counters, kept after disconnection
+
+    @staticmethod
+    def log( message ):
+        "Log a message to stderr"
+        sys.stderr.write( message + '\n' )
+
+    async def connected( self, reader, writer ):
+        "Handle a new switch connection"
+        conn = SwitchConnection( self, reader, writer )
+        await conn.run()
+        conn.counters[ 'disconnected' ] = time()
+        if conn.dpid and self.switches.get( conn.dpid ) is conn:
+            del self.switches[ conn.dpid ]
+
+    def stats( self ):
+        "Return dict of dpid -> counters"
+        return self.counters
+
+    def writeStats( self ):
+        "Write our stats file atomically"
+        tmp = self.statsFile + '.tmp'
+        with open( tmp, 'w' ) as f:
+            json.dump( self.stats(), f )
+        os.rename( tmp, self.statsFile )
+
+    async def serve( self ):
+        "Accept switch connections forever"
+        server = await asyncio.start_server( self.connected, port=self.port,
+                                             backlog=4096 )
+        self.log( 'listening on port %d' % self.port )
+        async with server:
+            while True:
+                await asyncio.sleep( self.interval )
+                if self.statsFile:
+                    self.writeStats()
+
+
+def main():
+    "Run controller"
+    parser = ArgumentParser( description='Mininet learning controller' )
+    parser.add_argument( '--port', type=int, default=6653 )
+    parser.add_argument( '--idle', type=int, default=60,
+                         help='flow idle timeout (seconds)' )
+    parser.add_argument( '--stats', default=None,
+                         help='file to write per-switch counters to' )
+    parser.add_argument( '--interval', type=float, default=1.0,
+                         help='stats update interval (seconds)' )
+    args = parser.parse_args()
+    controller = LearningController( port=args.port, idle=args.idle,
+                                     statsFile=args.stats,
+                                     interval=args.interval )
+    try:
+        asyncio.run( controller.serve() )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,445 @@
+"""
+plan.py: compiled build plans
+
+Building a network from a Topo normally takes several shell round
+trips per link and per host: creating each veth pair, moving and
+configuring each interface (ifconfig, ethtool, tc) and configuring
+each host (IP address, default route, lo).
+
+compilePlan( net, topo ) works out all of those commands up front,
+using the same rules as Mininet.buildFromTopo() (IP and MAC address
+allocation, port numbers, interface names), and groups them:
+
+- nodes: hosts and switches to create (one shell and namespace each)
+- ip: one ip -batch for the root namespace, which creates all veth
+  pairs directly in their nodes' namespaces, and one per namespace
+  to configure addresses, routes and interfaces
+- tc: one tc -batch per namespace for TCIntf shaping
+- sh: one shell command per namespace (e.g. ethtool offloads)
+
+Switches are still started by their classes' batchStartup() (e.g. a
+single ovs-vsctl transaction for all OVSSwitches).
+
+Mininet( topo, plan=True ) compiles a plan and builds from it; a
+BuildPlan may also be saved, loaded and reused (plan='file.json'
+compiles and saves a plan if the file doesn't hold one for the same
+topo and options), and printed as a script (mn --plan-only).
+
+Plans support Host-like nodes (whose config() is Node.config()),
+any switch class, Link/TCLink/TCULink and Intf/TCIntf. Other classes
+(e.g. CPULimitedHost, OVSLink, or interfaces with ifconfig options)
+raise an Exception from compilePlan(), and Mininet falls back to
+building normally.
+"""
+
+import hashlib
+import json
+import os
+from collections import namedtuple
+from functools import partial
+
+from mininet.link import Link, TCLink, TCULink, Intf, TCIntf
+from mininet.log import info, error, debug
+from mininet.node import Node
+from mininet.nodelib import ipBatch, tcBatch
+from mininet.state import className, findClass, writeState
+from mininet.util import ipAdd, macColonHex, quietRun
+
+VERSION = 1
+
+# Link classes we can plan: ( defaults, overrides ) which their
+# constructors apply to link options
+TCOPTS = { 'cls1': TCIntf, 'cls2': TCIntf }
+LINKOPTS = { Link: ( {}, {} ), TCLink: ( TCOPTS, {} ),
+             TCULink: ( TCOPTS, { 'txo': False, 'rxo': False } ) }
+
+# Stand-in node for TCIntf.bwCmds()
+PlanNode = namedtuple( 'PlanNode', 'name' )
+
+
+def unwrap( cls, params=None ):
+    """Return class and params for a class or partial( class, ... )
+       params: options which override the partial's"""
+    params = dict( params or {} )
+    while isinstance( cls, partial ):
+        params = dict( cls.keywords or {}, **params )
+        cls = cls.func
+    return cls, params
+
+
+def sameMethod( cls, base, name ):
+    "Does cls use base's implementation of method name?"
+    method, baseMethod = getattr( cls, name ), getattr( base, name )
+    return ( getattr( method, '__func__', method ) is
+             getattr( baseMethod, '__func__', baseMethod ) )
+
+
+def toJSON( value ):
+    "Return a JSON-able version of value, which may contain classes"
+    if isinstance( value, ( list, tuple ) ):
+        return [ toJSON( v ) for v in value ]
+    if isinstance( value, dict ):
+        return dict( ( k, toJSON( v ) ) for k, v in value.items() )
+    if isinstance( value, partial ):
+        return { '__class__': className( unwrap( value )[ 0 ] ),
+                 'params': toJSON( unwrap( value )[ 1 ] ) }
+    if isinstance( value, type ):
+        return { '__class__': className( value ) }
+    try:
+        json.dumps( value )
+    except ( TypeError, ValueError ):
+        raise Exception( 'cannot save %r in a build plan' % ( value, ) )
+    return value
+
+
+def fromJSON( value ):
+    "Reverse toJSON()"
+    if isinstance( value, list ):
+        return [ fromJSON( v ) for v in value ]
+    if isinstance( value, dict ):
+        if '__class__' in value:
+            cls = findClass( [ value[ '__class__' ] ] )
+            if 'params' in value:
+                return partial( cls, **fromJSON( value[ 'params' ] ) )
+            return cls
+        return dict( ( k, fromJSON( v ) ) for k, v in value.items() )
+    return value
+
+
+def planKey( net, topo ):
+    "Return a digest of topo and the net options which plans depend on"
+    options = { 'nodes': [ ( n, topo.nodeInfo( n ) )
+                           for n in topo.nodes( sort=True ) ],
+                'links': topo.links( sort=True, withInfo=True ),
+                'net': [ net.prefix, net.ipBase, net.nextIP,
+                         net.autoSetMacs, net.inNamespace, net.host,
+                         net.switch, net.link, net.intf ] }
+    try:
+        data = json.dumps( toJSON( options ), sort_keys=True )
+    except Exception:  # pylint: disable=broad-except
+        # Can't be saved, so we don't need a key
+        return None
+    return hashlib.sha1( data.encode() ).hexdigest()
+
+
+def tcIntfCmds( cls, name, nodeName, params ):
+    """Return ( ethtool command, tc commands ) which TCIntf.config()
+       would run for intf name on node nodeName"""
+    gro = not params.get( 'disable_gro', not params.get( 'gro', False ) )
+    ethtool = 'ethtool -K %s gro %s tx %s rx %s' % tuple(
+        [ name ] + [ 'on' if opt else 'off' for opt in
+                     ( gro, params.get( 'txo', True ),
+                       params.get( 'rxo', True ) ) ] )
+    if ( params.get( 'bw' ) is None and not params.get( 'delay' ) and
+         not params.get( 'loss' ) and
+         params.get( 'max_queue_size' ) is None ):
+        return ethtool, []
+    intf = cls.__new__( cls )
+    intf.name, intf.node = name, PlanNode( nodeName )
+    cmds, parent = intf.bwCmds( **dict(
+        ( k, params[ k ] ) for k in ( 'bw', 'speedup', 'use_hfsc',
+                                      'use_tbf', 'latency_ms',
+                                      'enable_ecn', 'enable_red' )
+        if k in params ) )
+    delayCmds, parent = intf.delayCmds( parent=parent, **dict(
+        ( k, params[ k ] ) for k in ( 'delay', 'jitter', 'loss',
+                                      'max_queue_size' )
+        if k in params ) )
+    return ethtool, [ ( cmd % ( '', name ) ).strip()
+                      for cmd in cmds + delayCmds ]
+
+
+class BuildPlan( object ):
+    "Compiled commands to build a network (see compilePlan())"
+
+    def __init__( self, key=None, nodes=None, links=None, ip=None,
+                  tc=None, sh=None ):
+        """key: digest of the topo and options we were compiled from
+           nodes: [ { name, role, params, opts, intf } ]
+           links: [ { cls, opts, intf1, intf2 } ]
+           ip, tc, sh: namespace ('' for root or short node name) ->
+               list of commands"""
+        self.key = key
+        self.nodes = nodes or []
+        self.links = links or []
+        self.ip, self.tc, self.sh = ip or {}, tc or {}, sh or {}
+
+    def save( self, path ):
+        "Save plan to path"
+        writeState( toJSON( { 'version': VERSION, 'key': self.key,
+                              'nodes': self.nodes, 'links': self.links,
+                              'ip': self.ip, 'tc': self.tc,
+                              'sh': self.sh } ), path )
+
+    @classmethod
+    def load( cls, path ):
+        "Load a saved plan from path"
+        with open( path ) as f:
+            plan = fromJSON( json.load( f ) )
+        if plan.pop( 'version', None ) != VERSION:
+            raise Exception( '%s: unsupported build plan version' % path )
+        return cls( **plan )
+
+    def script( self ):
+        "Return our plan as a readable script"
+        lines = [ '# Mininet build plan: %d nodes, %d links' %
+                  ( len( self.nodes ), len( self.links ) ) ]
+        for node in self.nodes:
+            lines.append( '%s %s %s' % ( node[ 'role' ], node[ 'name' ],
+                                         json.dumps( toJSON(
+                                             node[ 'params' ] ),
+                                             sort_keys=True ) ) )
+        for tool, batches in ( ( 'ip', self.ip ), ( 'tc', self.tc ),
+                               ( 'sh', self.sh ) ):
+            for ns in sorted( batches ):
+                lines.append( '# %s: %s' % ( ns or 'root namespace',
+                                             tool if tool == 'sh' else
+                                             tool + ' -batch' ) )
+                lines += batches[ ns ]
+        return '\n'.join( lines ) + '\n'
+
+    def execute( self, net ):
+        "Build net (which should be empty) using our plan"
+        info( '*** Adding hosts and switches:\n' )
+        for node in self.nodes:
+            name, params = node[ 'name' ], dict( node[ 'params' ] )
+            if node[ 'role' ] == 'host':
+                net.addHost( name, **params )
+            else:
+                net.addSwitch( name, **params )
+            net.nodeOpts[ name ] = dict( node[ 'opts' ] )
+            info( name + ' ' )
+        info( '\n*** Running build plan\n' )
+        nodes = dict( ( node[ 'name' ], net[ node[ 'name' ] ] )
+                      for node in self.nodes )
+        netns = dict( ( name, node.netnsId() )
+                      for name, node in nodes.items() )
+        out = ipBatch( [ cmd % netns for cmd in self.ip.get( '', [] ) ] )
+        for name, cmds in self.ip.items():
+            if name:
+                out += ipBatch( cmds, node=nodes[ name ] )
+        for name, cmds in self.tc.items():
+            out += tcBatch( cmds, node=nodes.get( name ) )
+        if out.strip():
+            error( '*** Error running build plan:\n%s' % out )
+        for name, cmds in self.sh.items():
+            # As in TCIntf.config(), we ignore ethtool's output
+            cmd = '; '.join( cmds )
+            debug( nodes[ name ].cmd( cmd ) if name
+                   else quietRun( cmd, shell=True ) )
+        self.attach( net, nodes )
+
+    def attach( self, net, nodes ):
+        """Create Intf and Link objects for the interfaces our plan
+           created and configured
+           nodes: short name -> node"""
+        for entry in self.links:
+            intfs = []
+            for end in entry[ 'intf1' ], entry[ 'intf2' ]:
+                intf = end[ 'cls' ]( end[ 'name' ],
+                                     node=nodes[ end[ 'node' ] ],
+                                     port=end[ 'port' ], mac=end[ 'mac' ],
+                                     attached=True, **end[ 'params' ] )
+                intf.ip, intf.prefixLen = end[ 'ip' ], end[ 'prefixLen' ]
+                intfs.append( intf )
+            link = entry[ 'cls' ].attach( *intfs )
+            net.links.append( link )
+            net.linkOpts[ link ] = dict( entry[ 'opts' ] )
+        for node in self.nodes:
+            params, intf = node[ 'params' ], node.get( 'intf' )
+            if intf:
+                intf = nodes[ node[ 'name' ] ].intf( intf )
+                if params.get( 'ip' ):
+                    intf.ip, intf.prefixLen = params[ 'ip' ].split( '/' )
+                if params.get( 'mac' ):
+                    intf.mac = params[ 'mac' ]
+
+
+class PlanCompiler( object ):
+    "Compile a BuildPlan for net and topo (see compilePlan())"
+
+    def __init__( self, net, topo ):
+        self.net, self.topo = net, topo
+        self.plan = BuildPlan( key=planKey( net, topo ) )
+        self.inNamespace = {}  # short name -> in its own namespace?
+        self.ports = {}  # short name -> used ports
+        self.portBase = {}  # short name -> first port
+        self.intfCmds = {}  # short name -> ip commands for its intfs
+
+    def compile( self ):
+        "Return compiled BuildPlan"
+        net, topo = self.net, self.topo
+        if net.autoPinCpus:
+            raise Exception( 'build plans do not support autoPinCpus' )
+        nextIP = net.nextIP
+        for name in topo.hosts():
+            opts = topo.nodeInfo( name )
+            params = { 'ip': ipAdd( nextIP, ipBaseNum=net.ipBaseNum,
+                                    prefixLen=net.prefixLen ) +
+                       '/%s' % net.prefixLen }
+            if net.autoSetMacs:
+                params[ 'mac' ] = macColonHex( nextIP )
+            nextIP += 1
+            params.update( opts )
+            cls, clsParams = unwrap( params.get( 'cls', net.host ) )
+            if not sameMethod( cls, Node, 'config' ):
+                raise Exception( 'cannot plan %s: %s.config() is not '
+                                 'Node.config()' % ( name, cls.__name__ ) )
+            self.addNode( name, 'host', params, opts, clsParams.get(
+                'inNamespace', params.get( 'inNamespace', True ) ), cls )
+        for name in topo.switches():
+            opts = topo.nodeInfo( name )
+            params = dict( opts )
+            cls, clsParams = unwrap( params.get( 'cls', net.switch ) )
+            if hasattr( cls, 'batchStartup' ):
+                params.setdefault( 'batch', True )
+            self.addNode( name, 'switch', params, opts, clsParams.get(
+                'inNamespace', params.get( 'inNamespace',
+                                           net.inNamespace ) ), cls )
+        for _src, _dst, opts in topo.links( sort=True, withInfo=True ):
+            self.addLink( opts )
+        for node in self.plan.nodes:
+            self.configHost( node )
+        return self.plan
+
+    def addNode( self, name, role, params, opts, inNamespace, cls ):
+        "Add a node to our plan"
+        self.plan.nodes.append( { 'name': name, 'role': role,
+                                  'params': params, 'opts': dict( opts ),
+                                  'intf': None } )
+        self.inNamespace[ name ] = inNamespace
+        self.ports[ name ] = []
+        self.portBase[ name ] = cls.portBase
+        self.intfCmds[ name ] = []
+
+    def ns( self, name ):
+        "Return plan namespace key for node name"
+        return name if self.inNamespace[ name ] else ''
+
+    def newPort( self, name ):
+        "Return next port for node name (see Node.newPort())"
+        ports = self.ports[ name ]
+        return max( ports ) + 1 if ports else self.portBase[ name ]
+
+    def addLink( self, opts ):
+        "Add a link (as Mininet.addLink() and Link() would make it)"
+        net, plan = self.net, self.plan
+        cls, params = unwrap( opts.get( 'cls', net.link ), opts )
+        if cls not in LINKOPTS:
+            raise Exception( 'cannot plan links of class %s' %
+                             cls.__name__ )
+        defaults, overrides = LINKOPTS[ cls ]
+        params = dict( defaults, **params )
+        params.update( overrides )
+        for key in 'cls', 'fast':
+            params.pop( key, None )
+        names = params.pop( 'node1' ), params.pop( 'node2' )
+        intf = params.pop( 'intf', net.intf )
+        ends = []
+        for i, name in enumerate( names ):
+            n = str( i + 1 )
+            port = params.pop( 'port' + n, None )
+            if port is None:
+                port = self.newPort( name )
+            self.ports[ name ].append( port )
+            intfCls = params.pop( 'cls' + n, None ) or intf
+            end = { 'node': name, 'port': port, 'cls': intfCls,
+                    'name': ( params.pop( 'intfName' + n, None ) or
+                              '%s%s-eth%d' % ( net.prefix, name, port ) ),
+                    'mac': params.pop( 'addr' + n, None ) or net.randMac(),
+                    'params': dict( params.pop( 'params' + n, None ) or {} ),
+                    'ip': None, 'prefixLen': None }
+            ends.append( end )
+        for end in ends:
+            end[ 'params' ].update( params )
+            self.configIntf( end )
+        plan.ip.setdefault( '', [] ).append(
+            'link add %s address %s netns %%(%s)s type veth '
+            'peer name %s address %s netns %%(%s)s' % (
+                ends[ 0 ][ 'name' ], ends[ 0 ][ 'mac' ], ends[ 0 ][ 'node' ],
+                ends[ 1 ][ 'name' ], ends[ 1 ][ 'mac' ],
+                ends[ 1 ][ 'node' ] ) )
+        plan.links.append( { 'cls': cls, 'opts': dict( opts ),
+                             'intf1': ends[ 0 ], 'intf2': ends[ 1 ] } )
+
+    def configIntf( self, end ):
+        "Add commands to configure an interface (as Intf.config() would)"
+        cls, params, name = end[ 'cls' ], end[ 'params' ], end[ 'name' ]
+        if sameMethod( cls, TCIntf, 'config' ):
+            ethtool, tc = tcIntfCmds( cls, name, self.net.prefix +
+                                      end[ 'node' ], params )
+            ns = self.ns( end[ 'node' ] )
+            self.plan.sh.setdefault( ns, [] ).append( ethtool )
+            if tc:
+                self.plan.tc.setdefault( ns, [] ).extend( tc )
+        elif not sameMethod( cls, Intf, 'config' ):
+            raise Exception( 'cannot plan interfaces of class %s' %
+                             cls.__name__ )
+        if params.get( 'ifconfig' ):
+            raise Exception( 'cannot plan ifconfig options for %s' % name )
+        cmds = self.intfCmds[ end[ 'node' ] ]
+        if params.get( 'ip' ):
+            if '/' not in params[ 'ip' ]:
+                raise Exception( 'no prefix length for %s' % name )
+            end[ 'ip' ], end[ 'prefixLen' ] = params[ 'ip' ].split( '/' )
+            cmds.append( 'addr add %s brd + dev %s' % ( params[ 'ip' ],
+                                                         name ) )
+        if params.get( 'up', True ):
+            cmds.append( 'link set %s up' % name )
+
+    def configHost( self, node ):
+        "Add commands to configure a host (as Node.config() would)"
+        name, params = node[ 'name' ], node[ 'params' ]
+        ns = self.ns( name )
+        cmds = []
+        if node[ 'role' ] == 'host':
+            ports = self.ports[ name ]
+            intf = None
+            if ports:
+                port = min( ports )
+                intf = [ end[ 'name' ] for link in self.plan.links
+                         for end in ( link[ 'intf1' ], link[ 'intf2' ] )
+                         if end[ 'node' ] == name and
+                         end[ 'port' ] == port ][ 0 ]
+                node[ 'intf' ] = intf
+                if params.get( 'mac' ):
+                    cmds.append( 'link set %s address %s' %
+                                 ( intf, params[ 'mac' ] ) )
+                if params.get( 'ip' ):
+                    if '/' not in params[ 'ip' ]:
+                        raise Exception( 'no prefix length for %s' % name )
+                    cmds.append( 'addr add %s brd + dev %s' %
+                                 ( params[ 'ip' ], intf ) )
+            cmds += self.intfCmds[ name ]
+            route = params.get( 'defaultRoute' )
+            if route:
+                cmds.append( 'route replace default %s' % (
+                    route if ' ' in str( route ) else 'dev %s' % route ) )
+            cmds.append( 'link set lo %s' % params.get( 'lo', 'up' ) )
+        else:
+            cmds += self.intfCmds[ name ]
+        if cmds:
+            self.plan.ip.setdefault( ns, [] ).extend( cmds )
+
+
+def compilePlan( net, topo ):
+    """Compile a BuildPlan for building topo in net (an unbuilt
+       Mininet), using net's options and default classes
+       raises Exception if topo uses something we can't plan"""
+    return PlanCompiler( net, topo ).compile()
+
+
+def cachedPlan( net, topo, path ):
+    """Return the plan saved in path if it was compiled from the same
+       topo and options, or else compile, save and return a plan"""
+    key = planKey( net, topo )
+    if os.path.exists( path ):
+        try:
+            plan = BuildPlan.load( path )
+            if key and plan.key == key:
+                return plan
+        except Exception as e:  # pylint: disable=broad-except
+            error( '*** Ignoring build plan %s: %s\n' % ( path, e ) )
+    plan = compilePlan( net, topo )
+    plan.save( path )
+    return plan
@@ -0,0 +1,210 @@
+"""
+pool.py: a warm pool of pre-spawned node shells
+
+Starting a node costs an mnexec (creating its network and mount
+namespaces), a bash startup and a prompt synchronization, and
+stopping it costs a namespace teardown. Test suites which build and
+tear down many small networks pay this for every node, every time.
+
+A NodePool keeps namespaced shells ready, spawning new ones from a
+background thread. A node created with pool=<NodePool> (e.g. via
+Mininet( pool=... ), which passes it to addHost() and addSwitch())
+takes a shell from the pool rather than spawning one, and replaces
+it with a fresh bash (exec, so no new namespace) running under the
+node's own name.
+
+When the node terminates, its shell is reset and returned to the
+pool rather than killed:
+
+- all other processes in its network namespace are killed
+- all interfaces but lo are deleted (taking their routes with them),
+  and lo is brought back down
+- a list of commonly changed sysctls (NodePool.sysctls) are restored
+  to the values which a fresh namespace has
+- privateDirs are unmounted (as usual) and the cwd is restored
+
+Shell variables, functions and traps disappear when the next node's
+fresh bash is exec'ed. Other state (e.g. iptables rules, or mounts
+which the node made itself) is not reset, so nodes which make such
+changes shouldn't use a pool.
+
+Shells which have been moved to another cgroup or given another CPU
+affinity (e.g. by CPULimitedHost, which sets reusableShell = False)
+are never returned to the pool, since the next node would inherit
+their placement; they are killed as usual.
+"""
+
+import os
+import pty
+import select
+import signal
+from collections import deque
+from subprocess import Popen
+from threading import Thread, Event
+
+from mininet.log import debug
+from mininet.util import decode
+
+
+def netnsPids( pid ):
+    "Return pids of processes in pid's network namespace, except pid"
+    netns = os.readlink( '/proc/%d/ns/net' % pid )
+    pids = []
+    for entry in os.listdir( '/proc' ):
+        if not entry.isdigit() or int( entry ) == pid:
+            continue
+        try:
+            if os.readlink( '/proc/%s/ns/net' % entry ) == netns:
+                pids.append( int( entry ) )
+        except OSError:
+            pass
+    return pids
+
+
+def placement( pid ):
+    "Return ( cgroups, CPU affinity ) of process pid"
+    with open( '/proc/%d/cgroup' % pid ) as f:
+        cgroups = f.read()
+    return cgroups, os.sched_getaffinity( pid )
+
+
+class NodePool( object ):
+    "Pool of pre-spawned namespaced shells"
+
+    # Namespace sysctls which nodes commonly change
+    sysctls = ( 'net.ipv4.ip_forward',
+                'net.ipv4.conf.all.forwarding',
+                'net.ipv4.conf.all.rp_filter',
+                'net.ipv4.conf.default.rp_filter',
+                'net.ipv4.conf.all.arp_ignore',
+                'net.ipv4.conf.all.arp_announce',
+                'net.ipv4.icmp_echo_ignore_all',
+                'net.ipv4.icmp_echo_ignore_broadcasts',
+                'net.ipv6.conf.all.forwarding',
+                'net.ipv6.conf.all.disable_ipv6',
+                'net.ipv6.conf.default.disable_ipv6' )
+
+    def __init__( self, size=32, opts=( '-cdn', ) ):
+        """size: number of shells to keep ready (we keep up to twice
+                 as many returned shells)
+           opts: mnexec options for our shells (see Node.mnexecOpts())"""
+        self.size = size
+        self.opts = list( opts )
+        self.cwd = os.getcwd()
+        self.shells = deque()  # ( popen, master file, slave )
+        self.defaults = None  # sysctl values in a fresh namespace
+        self.home = None  # cgroups and CPU affinity of a fresh shell
+        self.wanted = Event()
+        self.running = True
+        self.thread = Thread( target=self.fill )
+        self.thread.daemon = True
+        self.thread.start()
+
+    @staticmethod
+    def readPrompt( master, timeout=10 ):
+        "Read from master until we see a prompt; return output"
+        output = b''
+        poller = select.poll()
+        poller.register( master, select.POLLIN )
+        while not output.endswith( b'\x7f' ):
+            if not poller.poll( timeout * 1000 ):
+                raise Exception( 'NodePool: timed out waiting for shell' )
+            output += os.read( master, 1024 )
+        return decode( output )
+
+    def spawn( self ):
+        "Spawn a shell and wait for it to be ready"
+        # Deferred import (node imports us)
+        from mininet.node import Node  # pylint: disable=cyclic-import
+        master, slave = pty.openpty()
+        popen = Popen( [ 'mnexec' ] + self.opts +
+                       Node.shellArgs( 'pool' ), stdin=slave,
+                       stdout=slave, stderr=slave, close_fds=False )
+        self.readPrompt( master )
+        os.write( master, b'unset HISTFILE; stty -echo; set +m\n' )
+        self.readPrompt( master )
+        if self.defaults is None:
+            os.write( master, ( 'sysctl -e %s\n' %
+                                ' '.join( self.sysctls ) ).encode() )
+            output = self.readPrompt( master )
+            self.defaults = [ line.strip().split( ' = ' )
+                              for line in output.split( '\n' )
+                              if ' = ' in line ]
+            self.home = placement( popen.pid )
+        return popen, os.fdopen( master, 'r' ), slave
+
+    def fill( self ):
+        "Keep the pool full (in our background thread)"
+        while self.running:
+            if len( self.shells ) >= self.size:
+                self.wanted.wait()
+                self.wanted.clear()
+                continue
+            try:
+                self.shells.append( self.spawn() )
+            except Exception as e:  # pylint: disable=broad-except
+                debug( 'NodePool: %s\n' % e )
+                self.running = False
+
+    def get( self, opts ):
+        """Return a ready shell ( popen, master file, slave ) for
+           mnexec options opts, or None"""
+        if opts != self.opts or not self.running:
+            return None
+        try:
+            shell = self.shells.popleft()
+        except IndexError:
+            shell = None
+        self.wanted.set()
+        return shell
+
+    def put( self, node ):
+        """Reset node's shell and return it to the pool
+           returns: True if we took the shell"""
+        if ( not self.running or len( self.shells ) >= 2 * self.size or
+             getattr( node, 'shellOpts', None ) != self.opts or
+             node.waiting or node.shell.poll() is not None or
+             not getattr( node, 'reusableShell', True ) ):
+            return False
+        try:
+            # Don't pass on another cgroup or CPU affinity
+            if placement( node.pid ) != self.home:
+                return False
+            for pid in netnsPids( node.pid ):
+                os.kill( pid, signal.SIGKILL )
+            # One ip fork per remaining interface (and one for lo
+            # if it is up); everything else is a shell builtin
+            cmds = [ 'for i in /sys/class/net/*; do i=${i##*/}; '
+                     '[ $i != lo ] && ip link del $i; done',
+                     'read f < /sys/class/net/lo/flags',
+                     '[ $f = 0x8 ] || ip link set lo down',
+                     'cd %s' % self.cwd ]
+            cmds += [ 'echo %s > /proc/sys/%s' %
+                      ( value, key.replace( '.', '/' ) )
+                      for key, value in self.defaults or [] ]
+            node.cmd( '; '.join( cmds ) )
+        except Exception as e:  # pylint: disable=broad-except
+            debug( 'NodePool: could not reset %s: %s\n' % ( node, e ) )
+            return False
+        # Reset shells are reused first; we now own node's pty (and
+        # its file object, so that it's only closed once)
+        self.shells.appendleft( ( node.shell, node.stdin, node.slave ) )
+        return True
+
+    @staticmethod
+    def kill( shell ):
+        "Kill a shell and close its pty"
+        popen, master, slave = shell
+        if popen.poll() is None:
+            os.killpg( popen.pid, signal.SIGHUP )
+        master.close()
+        os.close( slave )
+        popen.wait()
+
+    def stop( self ):
+        "Stop refilling and kill our shells"
+        self.running = False
+        self.wanted.set()
+        self.thread.join()
+        while self.shells:
+            self.kill( self.shells.popleft() )
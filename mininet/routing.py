@@ -0,0 +1,230 @@
+"""
+routing.py: proactive, controller-less forwarding for OVS switches
+
+Rather than waiting for a reactive controller to flood, learn and
+install flows, we can compute forwarding for the whole network from
+its links and host MAC addresses, and install it in every OVSSwitch
+before any traffic starts. No controller need be started, and
+there is nothing to wait for.
+
+Two modes are supported:
+
+- shortest: unicast traffic to each host follows shortest paths
+  (in hops); where there are several equal-cost next hops, traffic
+  is spread over them (ECMP), using OpenFlow select groups for
+  switches which speak OpenFlow 1.3, or else by destination
+
+- tree: unicast traffic follows a spanning tree, for networks
+  (e.g. TorusTopo) where shortest paths aren't wanted
+
+In either mode, broadcast and multicast (e.g. ARP requests) are
+flooded along a spanning tree, so looped topologies are safe.
+
+Each switch's flows (and groups) are written to a file and installed
+with a single ovs-ofctl replace-flows (and add-groups), running
+concurrently for all switches.
+"""
+
+import os
+from tempfile import mkstemp
+
+from mininet.log import info, debug, warn
+from mininet.node import OVSSwitch
+from mininet.util import runAll
+
+FLOOD_MATCH = 'dl_dst=01:00:00:00:00:00/01:00:00:00:00:00'
+
+
+class Routes( object ):
+    "Proactive forwarding for a network's OVS switches"
+
+    def __init__( self, switches, hosts, links, mode='shortest',
+                  ecmp=True, priority=1000 ):
+        """switches: (OVS) switches to program
+           hosts: hosts to route to
+           links: list of Links
+           mode: 'shortest' (shortest paths) or 'tree' (spanning tree)
+           ecmp: spread traffic over equal-cost paths? (True)
+           priority: base flow priority (1000)"""
+        if mode not in ( 'shortest', 'tree' ):
+            raise Exception( 'unknown routing mode %s' % mode )
+        self.mode, self.ecmp, self.priority = mode, ecmp, priority
+        self.switches = list( switches )
+        self.neighbors = dict( ( s, {} ) for s in self.switches )
+        self.hosts = dict( ( s, [] ) for s in self.switches )
+        hosts = set( hosts )
+        for link in links:
+            for intf, peer in ( ( link.intf1, link.intf2 ),
+                                ( link.intf2, link.intf1 ) ):
+                switch, node = intf.node, peer.node
+                if switch not in self.neighbors:
+                    continue
+                port = switch.ports[ intf ]
+                if node in self.neighbors:
+                    self.neighbors[ switch ].setdefault(
+                        node, [] ).append( port )
+                elif node in hosts:
+                    mac = peer.MAC() or peer.updateMAC()
+                    if mac:
+                        self.hosts[ switch ].append( ( mac, port ) )
+        self.tree = self.spanningTree()
+
+    def spanningTree( self ):
+        """Compute a breadth-first spanning tree (one per connected
+           component) rooted at the first switch in each component
+           returns: dict of switch -> { neighbor: port } for tree edges"""
+        tree = dict( ( s, {} ) for s in self.switches )
+        seen = set()
+        for root in self.switches:
+            if root in seen:
+                continue
+            seen.add( root )
+            queue = [ root ]
+            while queue:
+                switch = queue.pop( 0 )
+                for neighbor, ports in sorted(
+                        self.neighbors[ switch ].items(),
+                        key=lambda item: item[ 0 ].name ):
+                    if neighbor in seen:
+                        continue
+                    seen.add( neighbor )
+                    queue.append( neighbor )
+                    tree[ switch ][ neighbor ] = ports[ 0 ]
+                    tree[ neighbor ][ switch ] = (
+                        self.neighbors[ neighbor ][ switch ][ 0 ] )
+        return tree
+
+    def graph( self ):
+        "Return adjacency for unicast: switch -> { neighbor: [ ports ] }"
+        if self.mode == 'tree':
+            return dict( ( s, dict( ( n, [ p ] ) for n, p in
+                                    self.tree[ s ].items() ) )
+                         for s in self.switches )
+        return self.neighbors
+
+    @staticmethod
+    def distances( graph, dst ):
+        "Return hop counts from every reachable switch to dst"
+        dist, queue = { dst: 0 }, [ dst ]
+        while queue:
+            switch = queue.pop( 0 )
+            for neighbor in graph[ switch ]:
+                if neighbor not in dist:
+                    dist[ neighbor ] = dist[ switch ] + 1
+                    queue.append( neighbor )
+        return dist
+
+    @staticmethod
+    def useGroups( switch ):
+        "Can we use OpenFlow 1.3 select groups on switch?"
+        return 'OpenFlow13' in ( getattr( switch, 'protocols', None ) or '' )
+
+    def compute( self ):
+        """Compute flows and groups for each switch
+           returns: dict of switch -> ( [ flows ], [ groups ] ), in
+                    ovs-ofctl add-flows/add-groups syntax"""
+        graph = self.graph()
+        flows = dict( ( s, [] ) for s in self.switches )
+        groups = dict( ( s, {} ) for s in self.switches )  # ports -> id
+        index = 0  # destination number, for ECMP without groups
+        for dst in self.switches:
+            if not self.hosts[ dst ]:
+                continue
+            dist = self.distances( graph, dst )
+            for mac, port in self.hosts[ dst ]:
+                flows[ dst ].append( 'priority=%d,dl_dst=%s,actions=output:%d'
+                                     % ( self.priority + 1, mac, port ) )
+                for switch, hops in dist.items():
+                    if switch is dst:
+                        continue
+                    ports = sorted( p for n, ps in graph[ switch ].items()
+                                    if dist.get( n ) == hops - 1
+                                    for p in ps )
+                    if not self.ecmp:
+                        ports = ports[ :1 ]
+                    if len( ports ) > 1 and self.useGroups( switch ):
+                        key = tuple( ports )
+                        if key not in groups[ switch ]:
+                            groups[ switch ][ key ] = len(
+                                groups[ switch ] ) + 1
+                        action = 'group:%d' % groups[ switch ][ key ]
+                    else:
+                        action = 'output:%d' % ports[ index % len( ports ) ]
+                    flows[ switch ].append( 'priority=%d,dl_dst=%s,actions=%s'
+                                            % ( self.priority, mac, action ) )
+                index += 1
+        for switch in self.switches:
+            # Flood broadcast and multicast along the spanning tree;
+            # OVS won't send a packet back out of its input port
+            ports = sorted( list( self.tree[ switch ].values() ) +
+                            [ port for _mac, port in self.hosts[ switch ] ] )
+            if ports:
+                flows[ switch ].append( 'priority=%d,%s,actions=%s' % (
+                    self.priority - 1, FLOOD_MATCH,
+                    ','.join( 'output:%d' % p for p in ports ) ) )
+        return dict(
+            ( switch, ( flows[ switch ], [
+                'group_id=%d,type=select,%s' % (
+                    gid, ','.join( 'bucket=output:%d' % p for p in ports ) )
+                for ports, gid in sorted( groups[ switch ].items(),
+                                          key=lambda item: item[ 1 ] ) ] ) )
+            for switch in self.switches )
+
+    def install( self ):
+        """Install flows (and groups) in all of our switches, using
+           one replace-flows per switch, all running concurrently
+           returns: number of flows installed"""
+        tables = self.compute()
+        files, count = [], 0
+        groupCmds, flowCmds = {}, {}
+
+        def writeFile( lines ):
+            "Write lines to a temporary file and return its name"
+            fd, path = mkstemp( prefix='mn-routes-' )
+            with os.fdopen( fd, 'w' ) as f:
+                f.write( '\n'.join( lines ) + '\n' )
+            files.append( path )
+            return path
+
+        for switch, ( flows, groups ) in tables.items():
+            opts = [ '-O', switch.protocols ] if switch.protocols else []
+            if groups:
+                groupCmds[ switch ] = [ 'ovs-ofctl' ] + opts + [
+                    'add-groups', switch.name, writeFile( groups ) ]
+            flowCmds[ switch ] = [ 'ovs-ofctl' ] + opts + [
+                'replace-flows', switch.name, writeFile( flows ) ]
+            count += len( flows )
+            debug( '%s: %d flows, %d groups\n' %
+                   ( switch, len( flows ), len( groups ) ) )
+        info( '*** Installing %d %s flows in %d switches\n' %
+              ( count, self.mode, len( flowCmds ) ) )
+        try:
+            # Remove old groups (and flows which use them) first
+            runAll( dict( ( switch, [ 'ovs-ofctl', '-O', switch.protocols,
+                                      'del-groups', switch.name ] )
+                          for switch in groupCmds ) )
+            runAll( groupCmds )
+            runAll( flowCmds )
+        finally:
+            for path in files:
+                os.unlink( path )
+        return count
+
+
+def installRoutes( net, mode='shortest', ecmp=True ):
+    """Install proactive forwarding in a network's OVS switches
+       net: Mininet (or anything with switches and links)
+       mode: 'shortest' or 'tree'
+       ecmp: spread traffic over equal-cost paths? (True)
+       returns: Routes
+       Other switches are left out of the routed graph, so paths
+       never cross them, and hosts behind them get no routes."""
+    switches = [ s for s in net.switches if isinstance( s, OVSSwitch ) ]
+    others = [ s for s in net.switches if s not in switches ]
+    if others:
+        warn( '*** Warning: cannot install routes in non-OVS switches',
+              ' '.join( s.name for s in others ),
+              '- routing around them\n' )
+    routes = Routes( switches, net.hosts, net.links, mode=mode, ecmp=ecmp )
+    routes.install()
+    return routes
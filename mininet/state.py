@@ -0,0 +1,172 @@
+"""
+state.py: save a running network's state, and re-attach to it
+
+Normally a network lives only as long as the Python process which
+created it: each node's namespace is held open by its shell, and if
+the process dies, the shells, namespaces and veth pairs go with it.
+
+If a Mininet is given a stateFile, start() pins each node's network
+namespace with a named namespace file (ip netns attach, all in one
+ip -batch) and writes a JSON description of the network: nodes,
+their classes, constructor arguments and pids, interfaces and ports
+with their IP and MAC addresses, and links with their parameters.
+
+Mininet.attach( stateFile ) then rebuilds Node, Intf and Link
+objects around the running network from a new process, opening a
+new shell in each pinned namespace (with mnexec -a) but without
+creating or configuring any interfaces, switches or links.
+
+Caveats: controllers are re-attached as RemoteControllers, since
+we no longer own their processes; privateDirs are not restored,
+since new shells don't share the old shells' mount namespaces; and
+node classes which can't be imported (e.g. those defined in the old
+process's script) are replaced by their nearest importable base.
+"""
+
+import json
+import os
+from importlib import import_module
+
+from mininet.log import debug, warn
+from mininet.node import Node, RemoteController
+from mininet.nodelib import ipBatch
+
+VERSION = 1
+
+
+def className( cls ):
+    "Return module.name for a class"
+    return '%s.%s' % ( cls.__module__, cls.__name__ )
+
+
+def findClass( names ):
+    """Return the first importable class in names (module.name)
+       names: class names, most specific first"""
+    for name in names:
+        module, _dot, cls = name.rpartition( '.' )
+        try:
+            return getattr( import_module( module ), cls )
+        except ( ImportError, AttributeError ):
+            debug( 'cannot import %s\n' % name )
+    raise Exception( 'no importable class in %s' % names )
+
+
+def classNames( obj ):
+    "Return names of obj's class and its bases, most specific first"
+    return [ className( cls ) for cls in type( obj ).__mro__
+             if cls is not object ]
+
+
+def jsonable( value ):
+    "Can value be saved as JSON?"
+    try:
+        json.dumps( value )
+        return True
+    except ( TypeError, ValueError ):
+        return False
+
+
+def initArgs( obj ):
+    """Return obj's (JSON-able) named constructor arguments, taken
+       from attributes with the same names"""
+    args = {}
+    for cls in reversed( type( obj ).__mro__ ):
+        code = getattr( cls.__dict__.get( '__init__' ), '__code__', None )
+        if not code:
+            continue
+        for name in code.co_varnames[ 1: code.co_argcount ]:
+            value = getattr( obj, name, None )
+            if ( name not in ( 'name', 'batch' ) and value is not None
+                 and jsonable( value ) ):
+                args[ name ] = value
+    return args
+
+
+def nodeState( node, role ):
+    "Return state for node, whose role is host, switch or controller"
+    params = dict( ( k, v ) for k, v in node.params.items()
+                   if jsonable( v ) )
+    params.update( initArgs( node ) )
+    params.pop( 'attached', None )
+    return { 'name': node.name, 'role': role, 'cls': classNames( node ),
+             'pid': node.pid, 'netns': node.nsPinned, 'params': params }
+
+
+def intfState( intf ):
+    "Return state for one end of a link"
+    return { 'node': intf.node.name, 'name': intf.name,
+             'port': intf.node.ports.get( intf ), 'cls': classNames( intf ),
+             'ip': intf.ip, 'prefixLen': intf.prefixLen, 'mac': intf.mac,
+             'params': dict( ( k, v ) for k, v in intf.params.items()
+                             if jsonable( v ) ) }
+
+
+def netState( net ):
+    "Return JSON-able state for a Mininet network"
+    roles = ( ( 'host', net.hosts ), ( 'switch', net.switches ),
+              ( 'controller', net.controllers ) )
+    return {
+        'version': VERSION,
+        'prefix': net.prefix, 'ipBase': net.ipBase, 'nextIP': net.nextIP,
+        'listenPort': net.listenPort,
+        'nodes': [ nodeState( node, role )
+                   for role, nodes in roles for node in nodes ],
+        'links': [ { 'cls': classNames( link ),
+                     'intf1': intfState( link.intf1 ),
+                     'intf2': intfState( link.intf2 ) }
+                   for link in net.links ] }
+
+
+def pinNamespaces( nodes ):
+    "Pin nodes' network namespaces (see Node.pinNetns()) in one batch"
+    out = ipBatch( [ cmd for cmd in ( node.pinNetns() for node in nodes )
+                     if cmd ] )
+    if out.strip():
+        warn( 'pinning namespaces: %s' % out )
+
+
+def writeState( state, path ):
+    "Write state to path (atomically, so readers never see half of it)"
+    tmp = path + '.tmp'
+    with open( tmp, 'w' ) as f:
+        json.dump( state, f, indent=1 )
+    os.rename( tmp, path )
+
+
+def readState( path ):
+    "Read state from path"
+    with open( path ) as f:
+        state = json.load( f )
+    if state.get( 'version' ) != VERSION:
+        raise Exception( '%s: unsupported state version %s' %
+                         ( path, state.get( 'version' ) ) )
+    return state
+
+
+def attachNode( info ):
+    "Return a node for info, attached to its running namespace"
+    params = dict( info[ 'params' ] )
+    if info[ 'role' ] == 'controller':
+        # We don't own the controller process any more
+        return RemoteController( info[ 'name' ], ip=params.get( 'ip' ),
+                                 port=params.get( 'port' ) )
+    if info[ 'netns' ] and not os.path.exists(
+            os.path.join( Node.nsDir, info[ 'netns' ] ) ):
+        raise Exception( '%s: namespace %s is gone' %
+                         ( info[ 'name' ], info[ 'netns' ] ) )
+    cls = findClass( info[ 'cls' ] )
+    params[ 'attached' ] = True
+    return cls( info[ 'name' ], **params )
+
+
+def attachLink( info, nameToNode ):
+    "Return a link for info, made of its existing interfaces"
+    intfs = []
+    for end in info[ 'intf1' ], info[ 'intf2' ]:
+        cls = findClass( end[ 'cls' ] )
+        intf = cls( end[ 'name' ], node=nameToNode[ end[ 'node' ] ],
+                    port=end[ 'port' ], attached=True, **end[ 'params' ] )
+        intf.ip, intf.prefixLen = end[ 'ip' ], end[ 'prefixLen' ]
+        intf.mac = end[ 'mac' ]
+        intfs.append( intf )
+    return findClass( info[ 'cls' ] ).attach( *intfs )
@@ -0,0 +1,852 @@
+"""
+stats.py: low-overhead statistics collection for Mininet experiments
+
+Running ifconfig, ip -s link or tc -s inside every node to watch an
+experiment adds load and perturbs the emulation. The monitors in this
+module instead sample from a single thread in the Mininet process,
+without forking anything per sample where possible, and store samples
+in preallocated numeric arrays.
+
+Monitor: periodic sampler (a base class, or given a sampler
+    function) which runs in a background thread
+
+LinkMonitor: interface counters (bytes, packets, drops) for every
+    Intf, read from each namespace's /proc/<pid>/net/dev
+
+QdiscMonitor: queue statistics (backlog, drops, overlimits...) for
+    the qdiscs on TC-shaped interfaces, from one rtnetlink qdisc dump
+    per namespace per sample
+
+Results may be retrieved as per-interface series or rates, or written
+out as CSV or (if numpy is installed) NPZ files.
+
+OpenFlow statistics from OVS switches are fetched with one ovs-ofctl
+process per switch, all running concurrently:
+
+dumpFlows(), dumpPorts(): parsed dump-flows and dump-ports output for
+    a list of switches
+
+OFStatsMonitor: periodic flow and port statistics, with deltas
+    between samples
+
+DatapathMonitor: kernel datapath flow cache statistics (hits, misses,
+    lost upcalls, flows) from ovs-dpctl show, split into experiment
+    phases, with warnings when upcalls saturate
+"""
+
+import os
+import socket
+import struct
+from array import array
+from bisect import bisect_right
+from collections import deque
+from threading import Thread, Event, Lock
+from time import time
+
+from mininet.log import debug, error, warn
+from mininet.util import runInNetns, runAll
+
+
+class Monitor( object ):
+    "Periodic sampler which runs in a background thread"
+
+    def __init__( self, interval=1.0, sampler=None ):
+        """interval: sampling interval in seconds
+           sampler: function to call for each sample (optional;
+                    subclasses override sample() instead)"""
+        self.interval = interval
+        self.sampler = sampler
+        self.thread = None
+        self.stopped = Event()
+
+    def sample( self ):
+        "Take one sample: call our sampler, if any"
+        if self.sampler:
+            self.sampler()
+
+    def run( self ):
+        "Sample every interval seconds until stopped"
+        nextTime = time()
+        while not self.stopped.is_set():
+            try:
+                self.sample()
+            except Exception as e:  # pylint: disable=broad-except
+                error( '*** %s: sample failed: %s\n' %
+                       ( self.__class__.__name__, e ) )
+            nextTime += self.interval
+            self.stopped.wait( max( nextTime - time(), 0 ) )
+
+    def start( self ):
+        "Start sampling in a background thread"
+        self.stopped.clear()
+        self.thread = Thread( target=self.run )
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop( self ):
+        "Stop sampling and wait for our thread to exit"
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+
+class SampleArray( object ):
+    """Preallocated, growable storage for samples: a timestamp and a
+       fixed number of values per sample. A monitor thread may append
+       while other threads read, so readers get copies."""
+
+    def __init__( self, width, capacity=1024 ):
+        """width: number of values per sample
+           capacity: initial number of samples to allocate"""
+        self.width = width
+        self.count = 0
+        self.times = array( 'd', [ 0.0 ] ) * capacity
+        self.values = array( 'd', [ 0.0 ] ) * ( capacity * width )
+        self.lock = Lock()
+
+    def append( self, timestamp, values ):
+        "Add a sample (len( values ) == width)"
+        if not isinstance( values, array ):
+            values = array( 'd', values )
+        with self.lock:
+            if self.count == len( self.times ):
+                # Double our capacity
+                self.times.extend( self.times )
+                self.values.extend( self.values )
+            start = self.count * self.width
+            self.times[ self.count ] = timestamp
+            self.values[ start:start + self.width ] = values
+            self.count += 1
+
+    def snapshot( self ):
+        """Return a consistent copy of our samples
+           returns: count, times, values (arrays holding count samples)"""
+        with self.lock:
+            count = self.count
+            return ( count, self.times[ :count ],
+                     self.values[ :count * self.width ] )
+
+    def column( self, col ):
+        "Return list of values in column col"
+        with self.lock:
+            return list(
+                self.values[ col:self.count * self.width:self.width ] )
+
+    def timestamps( self ):
+        "Return list of sample times"
+        with self.lock:
+            return list( self.times[ :self.count ] )
+
+    def series( self, col ):
+        "Return list of ( time, value ) for column col"
+        with self.lock:
+            return list( zip(
+                self.times[ :self.count ],
+                self.values[ col:self.count * self.width:self.width ] ) )
+
+
+def netnsFile( node, path ):
+    """Open /proc/<pid>/net/<path> for node's namespace, and return
+       its file descriptor; the namespace is bound when it is opened"""
+    if node.pid:
+        return os.open( '/proc/%d/net/%s' % ( node.pid, path ), os.O_RDONLY )
+    # No pid (e.g. NetnsHost): open it from within the namespace
+    return runInNetns( node.netnsFd(), os.open,
+                       '/proc/thread-self/net/' + path, os.O_RDONLY )
+
+
+def netnsGroups( nodes ):
+    """Group nodes by network namespace
+       returns: list of ( node, [ nodes in its namespace ] )"""
+    groups, seen = [], {}
+    for node in nodes:
+        try:
+            key = os.stat( node.netnsPath() ).st_ino
+        except ( OSError, TypeError ):
+            debug( 'skipping', node, '(no namespace)\n' )
+            continue
+        if key not in seen:
+            seen[ key ] = []
+            groups.append( ( node, seen[ key ] ) )
+        seen[ key ].append( node )
+    return groups
+
+
+def readFd( fd ):
+    "Return (text) contents of a /proc file from the beginning"
+    os.lseek( fd, 0, os.SEEK_SET )
+    chunks = []
+    while True:
+        data = os.read( fd, 65536 )
+        if not data:
+            break
+        chunks.append( data )
+    return b''.join( chunks ).decode()
+
+
+class LinkMonitor( Monitor ):
+    """Sample rx/tx bytes, packets and drops for interfaces, reading
+       /proc/<pid>/net/dev once per namespace per sample"""
+
+    fields = ( 'rxBytes', 'rxPackets', 'rxDrops',
+               'txBytes', 'txPackets', 'txDrops' )
+    # Columns of /proc/net/dev (after the interface name)
+    columns = ( 0, 1, 3, 8, 9, 11 )
+
+    def __init__( self, nodes, interval=1.0, capacity=1024 ):
+        """nodes: nodes whose interfaces we should monitor
+           interval: sampling interval in seconds
+           capacity: initial number of samples to allocate"""
+        Monitor.__init__( self, interval )
+        self.intfs = []
+        self.namespaces = []  # ( fd, { intf name: column offset } )
+        for first, members in netnsGroups( nodes ):
+            offsets = {}
+            self.namespaces.append( ( netnsFile( first, 'dev' ), offsets ) )
+            for intf in sum( [ n.intfList() for n in members ], [] ):
+                if intf.name == 'lo' or intf.name in offsets:
+                    continue
+                offsets[ intf.name ] = len( self.intfs ) * len( self.fields )
+                self.intfs.append( intf )
+        self.samples = SampleArray( len( self.intfs ) * len( self.fields ),
+                                    capacity )
+        self.row = array( 'd', [ 0.0 ] ) * self.samples.width
+
+    def sample( self ):
+        "Read counters for all of our interfaces"
+        row, width = self.row, len( self.columns )
+        timestamp = time()
+        for fd, offsets in self.namespaces:
+            for line in readFd( fd ).split( '\n' )[ 2: ]:
+                name, _sep, counters = line.partition( ':' )
+                offset = offsets.get( name.strip() )
+                if offset is None:
+                    continue
+                counters = counters.split()
+                for i in range( width ):
+                    row[ offset + i ] = float( counters[ self.columns[ i ] ] )
+        self.samples.append( timestamp, row )
+
+    def stop( self ):
+        "Stop sampling and close our files"
+        Monitor.stop( self )
+        for fd, _offsets in self.namespaces:
+            os.close( fd )
+        self.namespaces = []
+
+    def series( self, intf, field='txBytes' ):
+        """Return list of ( time, value ) samples for intf
+           field: one of LinkMonitor.fields"""
+        col = ( self.intfs.index( intf ) * len( self.fields ) +
+                self.fields.index( field ) )
+        return self.samples.series( col )
+
+    def rates( self, intf, field='txBytes' ):
+        """Return list of ( time, rate ) for intf, where rate is the
+           change in field per second since the previous sample"""
+        series = self.series( intf, field )
+        return [ ( t1, ( v1 - v0 ) / ( t1 - t0 ) )
+                 for ( t0, v0 ), ( t1, v1 ) in zip( series, series[ 1: ] )
+                 if t1 > t0 ]
+
+    def header( self ):
+        "Return column names (time, then intf:field for each intf)"
+        return [ 'time' ] + [ '%s:%s' % ( intf.name, field )
+                              for intf in self.intfs
+                              for field in self.fields ]
+
+    def dumpCSV( self, filename ):
+        "Write samples to a CSV file"
+        count, times, values = self.samples.snapshot()
+        width = self.samples.width
+        with open( filename, 'w' ) as f:
+            f.write( ','.join( self.header() ) + '\n' )
+            for i in range( count ):
+                row = values[ i * width:( i + 1 ) * width ]
+                f.write( ','.join( [ repr( times[ i ] ) ] +
+                                   [ '%d' % v for v in row ] ) + '\n' )
+
+    def dumpNPZ( self, filename ):
+        """Write samples to a numpy .npz file with arrays time,
+           counters ( samples x intfs x fields ), intfs and fields"""
+        try:
+            import numpy  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            raise Exception( 'dumpNPZ() requires numpy' )
+        count, times, values = self.samples.snapshot()
+        counters = numpy.frombuffer( values, dtype='d' )
+        numpy.savez( filename,
+                     time=numpy.frombuffer( times, dtype='d' ),
+                     counters=counters.reshape(
+                         count, len( self.intfs ), len( self.fields ) ),
+                     intfs=numpy.array( [ i.name for i in self.intfs ] ),
+                     fields=numpy.array( self.fields ) )
+
+
+# rtnetlink qdisc dumps (see rtnetlink(7) and linux/pkt_sched.h)
+
+NLMSG = struct.Struct( '=IHHII' )  # len, type, flags, seq, pid
+TCMSG = struct.Struct( '=BxxxiIII' )  # family, ifindex, handle, parent, info
+RTATTR = struct.Struct( '=HH' )  # len, type
+NLMSG_ERROR, NLMSG_DONE = 2, 3
+RTM_NEWQDISC, RTM_GETQDISC = 36, 38
+NLM_F_REQUEST, NLM_F_DUMP = 0x1, 0x300
+TCA_KIND, TCA_STATS2 = 1, 7
+TCA_STATS_BASIC, TCA_STATS_QUEUE = 1, 3
+STATS_BASIC = struct.Struct( '=QI' )  # bytes, packets
+STATS_QUEUE = struct.Struct( '=IIIII' )  # qlen, backlog, drops, ...
+
+
+def align4( n ):
+    "Round n up to a multiple of 4 (netlink alignment)"
+    return ( n + 3 ) & ~3
+
+
+def parseAttrs( data, start=0, end=None ):
+    "Parse rtattrs in data[ start:end ] into a dict of type -> bytes"
+    attrs, pos = {}, start
+    end = len( data ) if end is None else end
+    while pos + RTATTR.size <= end:
+        length, kind = RTATTR.unpack_from( data, pos )
+        if length < RTATTR.size:
+            break
+        attrs[ kind & 0x3fff ] = data[ pos + RTATTR.size:pos + length ]
+        pos += align4( length )
+    return attrs
+
+
+def handleStr( handle ):
+    "Return tc-style major handle string, e.g. 0x50000 -> '5:'"
+    return '%x:' % ( handle >> 16 )
+
+
+def parseQdiscs( data, seq=None ):
+    """Parse a buffer of rtnetlink RTM_NEWQDISC messages
+       seq: sequence number of our request; replies to any other
+            (e.g. left over from an interrupted dump) are discarded
+       returns: list of dicts with ifindex, handle, parent, kind and
+                stats, and done (True if NLMSG_DONE was seen)"""
+    qdiscs, pos, done = [], 0, False
+    while pos + NLMSG.size <= len( data ):
+        length, kind, _flags, mseq, _pid = NLMSG.unpack_from( data, pos )
+        if length < NLMSG.size:
+            break
+        if seq is not None and mseq != seq:
+            debug( 'parseQdiscs: discarding stale reply (seq %d)\n' %
+                   mseq )
+        elif kind == NLMSG_DONE:
+            done = True
+        elif kind == NLMSG_ERROR:
+            err = struct.unpack_from( '=i', data, pos + NLMSG.size )[ 0 ]
+            raise OSError( -err, os.strerror( -err ) )
+        elif kind == RTM_NEWQDISC:
+            body = pos + NLMSG.size
+            _family, ifindex, handle, parent, _info = TCMSG.unpack_from(
+                data, body )
+            attrs = parseAttrs( data, body + TCMSG.size, pos + length )
+            stats = dict( ( field, 0 ) for field in QdiscMonitor.fields )
+            nested = parseAttrs( attrs.get( TCA_STATS2, b'' ) )
+            if TCA_STATS_BASIC in nested:
+                stats[ 'bytes' ], stats[ 'packets' ] = (
+                    STATS_BASIC.unpack_from( nested[ TCA_STATS_BASIC ] ) )
+            if TCA_STATS_QUEUE in nested:
+                ( stats[ 'qlen' ], stats[ 'backlog' ], stats[ 'drops' ],
+                  stats[ 'requeues' ], stats[ 'overlimits' ] ) = (
+                      STATS_QUEUE.unpack_from( nested[ TCA_STATS_QUEUE ] ) )
+            qdiscs.append( dict(
+                ifindex=ifindex, handle=handleStr( handle ),
+                parent=parent,
+                kind=attrs.get( TCA_KIND, b'' ).rstrip( b'\0' ).decode(),
+                stats=stats ) )
+        pos += align4( length )
+    return qdiscs, done
+
+
+class QdiscDumper( object ):
+    "rtnetlink socket in a node's namespace which dumps qdisc stats"
+
+    def __init__( self, node ):
+        "node: node whose namespace we dump"
+        self.node = node
+        self.sock = node.socket( socket.AF_NETLINK, socket.SOCK_RAW,
+                                 socket.NETLINK_ROUTE )
+        self.sock.bind( ( 0, 0 ) )
+        self.seq = 0
+        self.pending = False  # is a dump still in progress?
+
+    def dump( self ):
+        "Return list of qdiscs (see parseQdiscs())"
+        if self.pending:
+            # Discard the rest of an interrupted dump: the kernel
+            # won't start another one on our socket until it's done
+            self.receive()
+        self.seq += 1
+        request = TCMSG.pack( socket.AF_UNSPEC, 0, 0, 0, 0 )
+        self.sock.send( NLMSG.pack( NLMSG.size + len( request ),
+                                    RTM_GETQDISC,
+                                    NLM_F_REQUEST | NLM_F_DUMP,
+                                    self.seq, 0 ) + request )
+        self.pending = True
+        return self.receive()
+
+    def receive( self ):
+        "Receive replies to our latest request, until it is done"
+        qdiscs, done = [], False
+        try:
+            while not done:
+                batch, done = parseQdiscs( self.sock.recv( 1 << 17 ),
+                                           seq=self.seq )
+                qdiscs += batch
+        except OSError:
+            # An error reply ends the dump
+            self.pending = False
+            raise
+        self.pending = False
+        return qdiscs
+
+    def close( self ):
+        "Close our socket"
+        self.sock.close()
+
+
+class QdiscMonitor( Monitor ):
+    """Sample queue statistics for the qdiscs on interfaces, using
+       one rtnetlink dump (rather than tc commands) per namespace
+       per sample; cheap enough for 10-100 Hz sampling"""
+
+    fields = ( 'bytes', 'packets', 'qlen', 'backlog', 'drops',
+               'requeues', 'overlimits' )
+
+    def __init__( self, intfs, interval=.1, capacity=1024 ):
+        """intfs: interfaces whose qdiscs we should monitor
+           interval: sampling interval in seconds
+           capacity: initial number of samples to allocate per qdisc"""
+        Monitor.__init__( self, interval )
+        self.capacity = capacity
+        self.intfs = list( intfs )
+        self.dumpers = []  # ( QdiscDumper, intfs, { ifindex: intf } )
+        self.kinds = {}  # ( intf, handle ) -> qdisc kind
+        self.samples = {}  # ( intf, handle ) -> SampleArray
+        nodes = []
+        for intf in self.intfs:
+            if intf.node not in nodes:
+                nodes.append( intf.node )
+        for first, members in netnsGroups( nodes ):
+            intfs = [ intf for intf in self.intfs if intf.node in members ]
+            self.dumpers.append( ( QdiscDumper( first ), intfs,
+                                   self.indexes( first, intfs ) ) )
+
+    @staticmethod
+    def indexes( node, intfs ):
+        """Look up ifindexes of intfs in node's namespace
+           returns: { ifindex: intf } for intfs which exist"""
+        fd, indexes = node.netnsFd(), {}
+        for intf in intfs:
+            try:
+                ifindex = runInNetns( fd, socket.if_nametoindex, intf.name )
+            except OSError:
+                debug( 'QdiscMonitor: no interface %s\n' % intf )
+                continue
+            indexes[ ifindex ] = intf
+        return indexes
+
+    def sample( self ):
+        "Dump qdisc statistics for all of our interfaces"
+        timestamp = time()
+        for dumper, intfs, indexes in self.dumpers:
+            qdiscs = dumper.dump()
+            unknown = set( q[ 'ifindex' ] for q in qdiscs ) - set( indexes )
+            if unknown:
+                # Interfaces may have been recreated with new indexes;
+                # remember the rest (e.g. lo) as None so we don't
+                # look them up again
+                indexes.clear()
+                indexes.update( self.indexes( dumper.node, intfs ) )
+                for ifindex in unknown:
+                    indexes.setdefault( ifindex, None )
+            for qdisc in qdiscs:
+                intf = indexes.get( qdisc[ 'ifindex' ] )
+                if intf is None:
+                    continue
+                key = ( intf, qdisc[ 'handle' ] )
+                if key not in self.samples:
+                    self.samples[ key ] = SampleArray( len( self.fields ),
+                                                       self.capacity )
+                    self.kinds[ key ] = qdisc[ 'kind' ]
+                stats = qdisc[ 'stats' ]
+                self.samples[ key ].append(
+                    timestamp, [ stats[ f ] for f in self.fields ] )
+
+    def stop( self ):
+        "Stop sampling and close our sockets"
+        Monitor.stop( self )
+        for dumper, _intfs, _indexes in self.dumpers:
+            dumper.close()
+        self.dumpers = []
+
+    def keys( self ):
+        "Return list of ( intf, handle ) for which we have samples"
+        return sorted( self.samples, key=lambda k: ( k[ 0 ].name, k[ 1 ] ) )
+
+    def series( self, intf, handle, field='backlog' ):
+        """Return list of ( time, value ) samples
+           intf: Intf
+           handle: qdisc handle, e.g. '5:'
+           field: one of QdiscMonitor.fields"""
+        samples = self.samples[ ( intf, handle ) ]
+        return samples.series( self.fields.index( field ) )
+
+    def dumpCSV( self, filename ):
+        "Write samples to a CSV file, one row per qdisc per sample"
+        with open( filename, 'w' ) as f:
+            f.write( ','.join( ( 'time', 'intf', 'handle', 'kind' ) +
+                               self.fields ) + '\n' )
+            for key in self.keys():
+                intf, handle = key
+                count, times, values = self.samples[ key ].snapshot()
+                width = len( self.fields )
+                for i in range( count ):
+                    row = values[ i * width:( i + 1 ) * width ]
+                    f.write( ','.join(
+                        [ repr( times[ i ] ), intf.name, handle,
+                          self.kinds[ key ] ] +
+                        [ '%d' % v for v in row ] ) + '\n' )
+
+
+# OpenFlow statistics via ovs-ofctl
+
+# dump-flows fields which are neither counters nor part of the match
+FLOW_OPTIONS = ( 'idle_timeout', 'hard_timeout', 'idle_age', 'hard_age',
+                 'importance', 'send_flow_rem', 'reset_counts',
+                 'no_packet_counts', 'no_byte_counts', 'check_overlap' )
+
+# dump-ports counter names -> our field name suffixes
+PORT_COUNTERS = { 'pkts': 'Packets', 'bytes': 'Bytes', 'drop': 'Drops',
+                  'errs': 'Errors' }
+
+
+def parseFlows( text ):
+    """Parse ovs-ofctl dump-flows output
+       returns: list of dicts with table, priority, match, actions,
+                cookie, packets, bytes and duration (seconds)"""
+    flows = []
+    for line in text.split( '\n' ):
+        fields, sep, actions = ( ' ' + line.strip() ).partition(
+            ' actions=' )
+        if not sep:
+            continue
+        flow = dict( table=0, priority=32768, match='',
+                     actions=actions.strip(), cookie='0x0',
+                     packets=0, bytes=0, duration=0.0 )
+        match = []
+        for field in fields.split( ',' ):
+            field = field.strip()
+            key, _sep, value = field.partition( '=' )
+            if key == 'n_packets':
+                flow[ 'packets' ] = int( value )
+            elif key == 'n_bytes':
+                flow[ 'bytes' ] = int( value )
+            elif key == 'duration':
+                flow[ 'duration' ] = float( value.rstrip( 's' ) )
+            elif key in ( 'table', 'priority' ):
+                flow[ key ] = int( value )
+            elif key == 'cookie':
+                flow[ key ] = value
+            elif key and key not in FLOW_OPTIONS:
+                match.append( field )
+        flow[ 'match' ] = ','.join( match )
+        flows.append( flow )
+    return flows
+
+
+def parsePorts( text ):
+    """Parse ovs-ofctl dump-ports output
+       returns: dict of port name (or number) -> dict of rx/tx
+                Packets, Bytes, Drops and Errors (e.g. rxBytes), or
+                None for counters the switch doesn't support"""
+    ports, port = {}, None
+    for line in text.split( '\n' ):
+        line = line.strip()
+        if line.startswith( 'port ' ):
+            name, _sep, line = line[ 5: ].partition( ': ' )
+            port = ports.setdefault( name.strip().strip( '"' ), {} )
+        if port is None or line[ :3 ] not in ( 'rx ', 'tx ' ):
+            continue
+        direction, counters = line[ :2 ], line[ 3: ]
+        for counter in counters.split( ',' ):
+            key, _sep, value = counter.strip().partition( '=' )
+            if key in PORT_COUNTERS:
+                port[ direction + PORT_COUNTERS[ key ] ] = (
+                    int( value ) if value.isdigit() else None )
+    return ports
+
+
+def ofctlArgs( switch, *args ):
+    "Return ovs-ofctl command line for switch"
+    opts = [ '-O', switch.protocols ] if getattr(
+        switch, 'protocols', None ) else []
+    return [ 'ovs-ofctl' ] + opts + [ args[ 0 ], switch.name ] + list(
+        args[ 1: ] )
+
+
+def ofctlAll( switches, *args ):
+    """Run an ovs-ofctl command for switches concurrently
+       args: ovs-ofctl command and args, e.g. 'dump-flows'
+       returns: dict of switch -> output"""
+    return runAll( dict( ( switch, ofctlArgs( switch, *args ) )
+                         for switch in switches ) )
+
+
+def dumpFlows( switches ):
+    """Fetch flow statistics for switches concurrently
+       returns: dict of switch -> list of flows (see parseFlows())"""
+    return dict( ( switch, parseFlows( text ) ) for switch, text in
+                 ofctlAll( switches, 'dump-flows' ).items() )
+
+
+def dumpPorts( switches ):
+    """Fetch port statistics for switches concurrently
+       returns: dict of switch -> dict of ports (see parsePorts())"""
+    return dict( ( switch, parsePorts( text ) ) for switch, text in
+                 ofctlAll( switches, 'dump-ports' ).items() )
+
+
+def flowKey( flow ):
+    "Return key identifying a flow entry: ( table, priority, match )"
+    return flow[ 'table' ], flow[ 'priority' ], flow[ 'match' ]
+
+
+class OFStatsMonitor( Monitor ):
+    """Sample OpenFlow flow and port statistics for OVS switches,
+       running ovs-ofctl for all switches concurrently each sample"""
+
+    def __init__( self, switches, interval=1.0, flows=True, ports=True,
+                  keep=None ):
+        """switches: switches to monitor
+           interval: sampling interval in seconds
+           flows: sample flow statistics? (True)
+           ports: sample port statistics? (True)
+           keep: number of samples to keep (None: all)"""
+        Monitor.__init__( self, interval )
+        self.switches = list( switches )
+        self.flows, self.ports = flows, ports
+        # ( time, { switch: flows }, { switch: ports } )
+        self.history = deque( maxlen=keep )
+
+    def sample( self ):
+        "Fetch flow and port statistics for all of our switches"
+        timestamp = time()
+        flows = dumpFlows( self.switches ) if self.flows else {}
+        ports = dumpPorts( self.switches ) if self.ports else {}
+        self.history.append( ( timestamp, flows, ports ) )
+
+    def flowDeltas( self, index=-1 ):
+        """Return change in flow counters between samples index-1 and
+           index, with counters of new (or re-added) flows counted
+           from zero
+           returns: interval, dict of switch -> list of flows
+                    whose packets and bytes are deltas"""
+        ( t0, flows0, _ports0 ), ( t1, flows1, _ports1 ) = (
+            self.pair( index ) )
+        deltas = {}
+        for switch, flows in flows1.items():
+            previous = dict( ( flowKey( f ), f )
+                             for f in flows0.get( switch, [] ) )
+            deltas[ switch ] = []
+            for flow in flows:
+                delta = dict( flow )
+                old = previous.get( flowKey( flow ) )
+                if old and old[ 'duration' ] <= flow[ 'duration' ]:
+                    delta[ 'packets' ] -= old[ 'packets' ]
+                    delta[ 'bytes' ] -= old[ 'bytes' ]
+                deltas[ switch ].append( delta )
+        return t1 - t0, deltas
+
+    def portDeltas( self, index=-1 ):
+        """Return change in port counters between samples index-1 and
+           index
+           returns: interval, dict of switch -> dict of port ->
+                    counter deltas (None if unsupported)"""
+        ( t0, _flows0, ports0 ), ( t1, _flows1, ports1 ) = (
+            self.pair( index ) )
+        deltas = {}
+        for switch, ports in ports1.items():
+            deltas[ switch ] = {}
+            for port, counters in ports.items():
+                old = ports0.get( switch, {} ).get( port, {} )
+                deltas[ switch ][ port ] = dict(
+                    ( key, None if value is None or old.get( key ) is None
+                      else value - old[ key ] )
+                    for key, value in counters.items() )
+        return t1 - t0, deltas
+
+    def pair( self, index ):
+        "Return samples index-1 and index"
+        if index < 0:
+            index += len( self.history )
+        if not 0 < index < len( self.history ):
+            raise Exception( 'need two samples for deltas' )
+        return self.history[ index - 1 ], self.history[ index ]
+
+
+# Datapath (kernel flow cache) statistics via ovs-dpctl
+
+def parseDatapaths( text ):
+    """Parse ovs-dpctl show output
+       returns: dict of datapath name -> dict with hit, missed, lost,
+                flows, maskHit, masks and ports (list of port names)"""
+    datapaths, dp = {}, None
+    for line in text.split( '\n' ):
+        if line[ :1 ].strip() and line.rstrip().endswith( ':' ):
+            dp = datapaths.setdefault(
+                line.strip()[ :-1 ],
+                dict( ( field, 0 ) for field in DatapathMonitor.fields ) )
+            dp[ 'ports' ] = []
+            continue
+        line = line.strip()
+        if dp is None or not line:
+            continue
+        label, _sep, rest = line.partition( ':' )
+        if label == 'lookups':
+            for pair in rest.split():
+                key, _sep, value = pair.partition( ':' )
+                if key in ( 'hit', 'missed', 'lost' ) and value.isdigit():
+                    dp[ key ] = int( value )
+        elif label == 'flows' and rest.strip().isdigit():
+            dp[ 'flows' ] = int( rest )
+        elif label == 'masks':
+            values = dict( pair.partition( ':' )[ ::2 ]
+                           for pair in rest.split() )
+            dp[ 'maskHit' ] = int( values.get( 'hit', 0 ) )
+            dp[ 'masks' ] = int( values.get( 'total', 0 ) )
+        elif label.startswith( 'port ' ) and rest.split():
+            dp[ 'ports' ].append( rest.split()[ 0 ] )
+    return datapaths
+
+
+class DatapathMonitor( Monitor ):
+    """Sample OVS datapath flow cache statistics (one ovs-dpctl per
+       sample for all datapaths) and warn when upcalls saturate:
+       lookups that miss the kernel flow cache go up to ovs-vswitchd,
+       and if it can't keep up, packets are delayed or lost and
+       the emulation no longer reflects the network being modeled"""
+
+    fields = ( 'hit', 'missed', 'lost', 'flows', 'maskHit', 'masks' )
+    command = [ 'ovs-dpctl', 'show' ]
+
+    def __init__( self, switches=None, interval=1.0, capacity=1024,
+                  maxMissRate=1000, maxMissRatio=.1 ):
+        """switches: monitor datapaths of these switches (None: all)
+           interval: sampling interval in seconds
+           capacity: initial number of samples to allocate
+           maxMissRate: warn above this many upcalls per second...
+           maxMissRatio: ...if this fraction of lookups miss"""
+        Monitor.__init__( self, interval )
+        self.names = ( None if switches is None else
+                       set( switch.name for switch in switches ) )
+        self.capacity = capacity
+        self.maxMissRate, self.maxMissRatio = maxMissRate, maxMissRatio
+        self.samples = {}  # datapath -> SampleArray
+        self.bridges = {}  # datapath -> [ bridge names ]
+        self.marks = []  # ( time, phase name )
+        self.warnings = []  # ( time, phase, datapath, message )
+        self.last = {}  # datapath -> ( time, stats )
+
+    def mark( self, phase ):
+        "Start a new experiment phase called phase"
+        self.marks.append( ( time(), phase ) )
+
+    def phase( self, timestamp=None ):
+        "Return name of phase at timestamp (default: now)"
+        timestamp = time() if timestamp is None else timestamp
+        current = None
+        for start, name in self.marks:
+            if start > timestamp:
+                break
+            current = name
+        return current
+
+    def sample( self ):
+        "Read statistics for all of our datapaths"
+        timestamp = time()
+        output = runAll( { 'dpctl': self.command } )[ 'dpctl' ]
+        for dp, stats in parseDatapaths( output ).items():
+            bridges = stats[ 'ports' ]
+            if self.names is not None:
+                bridges = [ b for b in bridges if b in self.names ]
+                if not bridges:
+                    continue
+            self.bridges[ dp ] = bridges
+            if dp not in self.samples:
+                self.samples[ dp ] = SampleArray( len( self.fields ),
+                                                  self.capacity )
+            self.samples[ dp ].append(
+                timestamp, [ stats[ f ] for f in self.fields ] )
+            self.check( dp, timestamp, stats )
+            self.last[ dp ] = ( timestamp, stats )
+
+    def check( self, dp, timestamp, stats ):
+        "Check for upcall saturation since the previous sample"
+        if dp not in self.last:
+            return
+        then, last = self.last[ dp ]
+        hit = stats[ 'hit' ] - last[ 'hit' ]
+        missed = stats[ 'missed' ] - last[ 'missed' ]
+        lost = stats[ 'lost' ] - last[ 'lost' ]
+        messages = []
+        if lost > 0:
+            messages.append( '%d upcalls lost' % lost )
+        if ( timestamp > then and hit + missed > 0 and
+             missed / ( timestamp - then ) > self.maxMissRate and
+             float( missed ) / ( hit + missed ) > self.maxMissRatio ):
+            messages.append( '%.0f upcalls/s (%.0f%% of lookups missed '
+                             'the flow cache)' %
+                             ( missed / ( timestamp - then ),
+                               100.0 * missed / ( hit + missed ) ) )
+        phase = self.phase( timestamp )
+        for message in messages:
+            self.warnings.append( ( timestamp, phase, dp, message ) )
+            warn( '*** Fidelity warning: %s%s: %s\n' %
+                  ( dp, ' (%s)' % phase if phase else '', message ) )
+
+    def series( self, dp, field='missed' ):
+        """Return list of ( time, value ) samples for datapath dp
+           field: one of DatapathMonitor.fields"""
+        samples = self.samples[ dp ]
+        return samples.series( self.fields.index( field ) )
+
+    def phases( self, dp ):
+        """Summarize each phase for datapath dp
+           returns: list of dicts with phase, start, end, hit, missed
+                    and lost (changes during the phase), maxFlows and
+                    missRatio"""
+        _count, times, values = self.samples[ dp ].snapshot()
+        times = list( times )
+        if len( times ) < 2:
+            return []
+        width = len( self.fields )
+        columns = dict( ( field, values[ i::width ] )
+                        for i, field in enumerate( self.fields ) )
+        bounds = [ ( times[ 0 ], self.phase( times[ 0 ] ) ) ] + [
+            mark for mark in self.marks if mark[ 0 ] > times[ 0 ] ]
+        summary = []
+        for i, ( start, name ) in enumerate( bounds ):
+            end = ( bounds[ i + 1 ][ 0 ] if i + 1 < len( bounds )
+                    else times[ -1 ] )
+            # Compare the last samples before the phase and its end
+            a = bisect_right( times, start ) - 1
+            b = bisect_right( times, end ) - 1
+            if b <= a:
+                continue
+            deltas = dict( ( f, int( columns[ f ][ b ] - columns[ f ][ a ] ) )
+                           for f in ( 'hit', 'missed', 'lost' ) )
+            lookups = deltas[ 'hit' ] + deltas[ 'missed' ]
+            summary.append( dict(
+                phase=name, start=start, end=end,
+                maxFlows=int( max( columns[ 'flows' ][ a:b + 1 ] ) ),
+                missRatio=( float( deltas[ 'missed' ] ) / lookups
+                            if lookups else 0.0 ),
+                **deltas ) )
+        return summary
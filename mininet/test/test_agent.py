@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test framed exec agent protocol (mininet.agent)"""
+
+import sys
+import time
+import unittest
+from subprocess import Popen, PIPE
+
+from mininet import agent
+from mininet.node import Host
+from mininet.util import quietRun
+from mininet.agent import ( AgentClient, packFrame, unpackFrames,
+                            CMD, STDOUT, STDERR, EXIT )
+
+
+class testFraming( unittest.TestCase ):
+    "Test frame packing and parsing"
+
+    def testPartialFrames( self ):
+        "Frames are only returned once they are complete"
+        data = packFrame( STDOUT, 1, b'hello' ) + packFrame( EXIT, 1, b'0 0' )
+        buf = bytearray( data[ :7 ] )
+        self.assertEqual( unpackFrames( buf ), [] )
+        buf += data[ 7: -1 ]
+        self.assertEqual( unpackFrames( buf ), [ ( STDOUT, 1, b'hello' ) ] )
+        buf += data[ -1: ]
+        self.assertEqual( unpackFrames( buf ), [ ( EXIT, 1, b'0 0' ) ] )
+        self.assertEqual( len( buf ), 0 )
+
+
+class testAgent( unittest.TestCase ):
+    "Test agent running outside of any namespace"
+
+    def setUp( self ):
+        self.popen = Popen( [ sys.executable, agent.__file__, 'mininet:test' ],
+                            stdin=PIPE, stdout=PIPE )
+        self.client = AgentClient( self.popen )
+        self.client.waitReady()
+
+    def tearDown( self ):
+        self.popen.stdin.close()
+        self.popen.wait()
+        self.popen.stdout.close()
+
+    def runCmds( self, *cmds ):
+        "Pipeline cmds and return list of ( out, err, exitcode )"
+        reqids = [ self.client.send( CMD, cmd ) for cmd in cmds ]
+        results = { reqid: [ b'', b'', None ] for reqid in reqids }
+        while any( r[ 2 ] is None for r in results.values() ):
+            for kind, reqid, data in self.client.receive():
+                if kind == STDOUT:
+                    results[ reqid ][ 0 ] += data
+                elif kind == STDERR:
+                    results[ reqid ][ 1 ] += data
+                elif kind == EXIT:
+                    results[ reqid ][ 2 ] = self.client.parseExit( data )[ 0 ]
+        return [ tuple( results[ reqid ] ) for reqid in reqids ]
+
+    def testOutputAndStatus( self ):
+        "Separate stdout and stderr, and exit status"
+        result = self.runCmds( b'echo out; echo err >&2; exit_unknown_cmd' )
+        out, err, exitcode = result[ 0 ]
+        self.assertEqual( out, b'out\n' )
+        self.assertTrue( b'err\n' in err )
+        self.assertEqual( exitcode, 127 )
+
+    def testShellState( self ):
+        "Shell state persists across pipelined commands"
+        results = self.runCmds( b'cd /; X=42', b'echo $X $PWD',
+                                b"echo 'q'\"'\"" )
+        self.assertEqual( results[ 1 ], ( b'42 /\n', b'', 0 ) )
+        self.assertEqual( results[ 2 ], ( b"q'\n", b'', 0 ) )
+
+    def testDeadlock( self ):
+        "Pipelining more than the pipes hold doesn't deadlock"
+        cmd = b'head -c 4096 /dev/zero; : ' + b'x' * 200
+        reqids = [ self.client.queue( CMD, cmd ) for _ in range( 500 ) ]
+        done, size = set(), 0
+        while len( done ) < len( reqids ):
+            for kind, reqid, data in self.client.exchange():
+                if kind == STDOUT:
+                    size += len( data )
+                elif kind == EXIT:
+                    done.add( reqid )
+        self.assertEqual( size, 500 * 4096 )
+
+
+class testAgentHost( unittest.TestCase ):
+    "Test a Host which uses an agent"
+
+    def setUp( self ):
+        self.host = Host( 'h1', agent=True )
+
+    def tearDown( self ):
+        self.host.terminate()
+
+    def testCmd( self ):
+        "cmd() returns merged output and records the exit status"
+        host = self.host
+        self.assertEqual( host.cmd( 'echo out; echo err >&2' ).split(),
+                          [ 'out', 'err' ] )
+        host.cmd( 'false' )
+        self.assertEqual( host.lastExitCode, 1 )
+        self.assertEqual( host.cmd( 'echo $1' ).strip(), 'mininet:h1' )
+
+    def testSendInt( self ):
+        "sendInt() interrupts the running command, but not the shell"
+        host = self.host
+        host.sendCmd( 'sleep 1234' )
+        # An interrupt sent before the command starts would be lost
+        while not quietRun( 'pgrep -xf "sleep 1234"' ):
+            time.sleep( .01 )
+        host.sendInt()
+        host.waitOutput()
+        self.assertEqual( host.lastExitCode, 130 )
+        self.assertEqual( host.cmd( 'echo ok' ).strip(), 'ok' )
+
+    def testBackground( self ):
+        "Background commands report their PIDs"
+        host = self.host
+        host.cmd( 'sleep 1000 &' )
+        pid = host.lastPid
+        self.assertTrue( pid )
+        self.assertEqual( host.cmd( 'jobs -p' ).strip(), str( pid ) )
+        host.cmd( 'kill %d; wait' % pid )
+
+    def testPipeline( self ):
+        "pipelineCmds() returns separate results for many commands"
+        cmds = [ 'head -c 4096 /dev/zero | tr "\\0" x; echo %d >&2' % i
+                 for i in range( 500 ) ]
+        results = self.host.pipelineCmds( cmds )
+        self.assertEqual( len( results ), 500 )
+        for i, ( out, err, exitcode ) in enumerate( results ):
+            self.assertEqual( ( out, err, exitcode ),
+                              ( 'x' * 4096, '%d\n' % i, 0 ) )
+        self.assertEqual( self.host.cmdFull( '( exit 3 )' )[ 2 ], 3 )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test applying a new topology to a running network"""
+
+import unittest
+
+from mininet.net import Mininet
+from mininet.nodelib import LinuxBridge
+from mininet.link import TCLink
+from mininet.topo import Topo
+
+
+def makeTopo( new=False ):
+    """Two switches, each with a host; the new topo shapes h1's link,
+       replaces the s1-s2 link with a third host"""
+    topo = Topo()
+    for name in 'h1', 'h2':
+        topo.addHost( name )
+    for name in 's1', 's2':
+        topo.addSwitch( name )
+    topo.addLink( 'h1', 's1', **( { 'bw': 10 } if new else {} ) )
+    topo.addLink( 'h2', 's2' )
+    if new:
+        topo.addHost( 'h3' )
+        topo.addLink( 'h3', 's1' )
+    else:
+        topo.addLink( 's1', 's2' )
+    return topo
+
+
+class testApply( unittest.TestCase ):
+    "Test net.apply()"
+
+    def setUp( self ):
+        self.net = Mininet( topo=makeTopo(), switch=LinuxBridge,
+                            link=TCLink, controller=None )
+        self.net.start()
+
+    def tearDown( self ):
+        self.net.stop()
+
+    def testApply( self ):
+        "Only the differences are changed"
+        net = self.net
+        h2 = net[ 'h2' ]
+        diff = net.apply( makeTopo( new=True ) )
+        self.assertEqual( str( diff ),
+                          '-0/+1 nodes, -1/+1 links, 1 TC changes' )
+        self.assertTrue( net[ 'h2' ] is h2 )
+        s1, s2 = net[ 's1' ], net[ 's2' ]
+        brif = s1.cmd( 'ls /sys/class/net/s1/brif' )
+        self.assertEqual( sorted( brif.split() ),
+                          [ 's1-eth1', 's1-eth2' ] )
+        self.assertEqual( s2.cmd( 'ls /sys/class/net/s2/brif' ).split(),
+                          [ 's2-eth1' ] )
+        self.assertTrue( 'htb' in net[ 'h1' ].cmd( 'tc qdisc show' ) )
+        self.assertEqual( net[ 'h3' ].IP(), '10.0.0.3' )
+        self.assertEqual( len( net.apply( makeTopo( new=True ) ) ), 0 )
+
+
+if __name__ == '__main__':
+    unittest.main()
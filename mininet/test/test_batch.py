@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test batching of node commands"""
+
+import unittest
+
+from mininet.link import Link
+from mininet.node import Node, Host, NetnsHost
+
+
+class testBatch( unittest.TestCase ):
+    "Test node.batch()"
+
+    nodeClass = Node
+
+    def setUp( self ):
+        self.node = self.nodeClass( 'b1' )
+        self.sent = []
+        sendCmd = self.node.sendCmd
+
+        def countingSendCmd( *args, **kwargs ):
+            "Record commands sent to the shell"
+            self.sent.append( args )
+            return sendCmd( *args, **kwargs )
+
+        self.node.sendCmd = countingSendCmd
+
+    def tearDown( self ):
+        self.node.terminate()
+
+    def testBatch( self ):
+        "Queued commands run in one round trip, with separate outputs"
+        node = self.node
+        with node.batch() as outputs:
+            self.assertEqual( node.cmd( 'echo one' ), '' )
+            with node.batch():
+                node.cmd( 'cd /tmp;' )
+            node.cmd( 'sleep 0 &' )
+            node.cmd( '' )
+            node.cmd( 'echo two; pwd' )
+            self.assertEqual( outputs, [] )
+        self.assertEqual( [ out.split() for out in outputs ],
+                          [ [ 'one' ], [], [], [], [ 'two', '/tmp' ] ] )
+        self.assertTrue( len( self.sent ) <= 1 )
+
+    def testLongBatch( self ):
+        "Long batches are split to fit the tty's line length limit"
+        node = self.node
+        with node.batch() as outputs:
+            for i in range( 500 ):
+                node.cmd( 'echo', i )
+        self.assertEqual( [ int( out ) for out in outputs ],
+                          list( range( 500 ) ) )
+
+    def testSyntax( self ):
+        "Comments, heredocs and bad quoting only affect their own command"
+        node = self.node
+        with node.batch() as outputs:
+            node.cmd( 'echo one # a comment' )
+            node.cmd( "echo 'two\nlines'" )
+            node.cmd( 'cat <<EOF\nthree\nEOF' )
+            node.cmd( "echo 'unbalanced" )
+            node.cmd( "echo \"it's\" \\\\ $((2+2))" )
+        self.assertEqual( outputs[ 0 ].split(), [ 'one' ] )
+        self.assertEqual( outputs[ 1 ].split(), [ 'two', 'lines' ] )
+        self.assertEqual( outputs[ 2 ].split(), [ 'three' ] )
+        self.assertFalse( 'unbalanced' in outputs[ 3 ] )
+        self.assertEqual( outputs[ 4 ].split(), [ "it's", '\\', '4' ] )
+
+
+class ReadingHost( Host ):
+    "Host whose setIP() uses the output of cmd()"
+
+    def __init__( self, name, **params ):
+        self.seen = None
+        Host.__init__( self, name, **params )
+
+    def setIP( self, ip, prefixLen=8, intf=None, **kwargs ):
+        self.seen = self.cmd( 'echo setting', ip )
+        return Host.setIP( self, ip, prefixLen, intf, **kwargs )
+
+
+class testConfigBatch( unittest.TestCase ):
+    "Test that config() only batches when that is safe"
+
+    def testOverride( self ):
+        "Overridden config methods see the output of their commands"
+        host, other = ReadingHost( 'h1' ), Host( 'h2' )
+        Link( host, other )
+        try:
+            self.assertFalse( host.batchableConfig() )
+            self.assertTrue( other.batchableConfig() )
+            host.config( ip='10.0.0.1/8' )
+            self.assertEqual( host.seen.split(), [ 'setting', '10.0.0.1/8' ] )
+            self.assertEqual( host.IP(), '10.0.0.1' )
+        finally:
+            for node in host, other:
+                node.stop( deleteIntfs=True )
+
+
+class testNetnsBatch( testBatch ):
+    "Test batch() for NetnsHost (which runs commands on demand)"
+
+    nodeClass = NetnsHost
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test the cgroup v2 backend of CPULimitedHost, using a scratch
+   directory in place of the unified hierarchy"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mininet.node import CPULimitedHost
+from mininet.util import numCores
+
+
+class testCgroupV2( unittest.TestCase ):
+    "Test CPULimitedHost cgroup v2 file handling"
+
+    def setUp( self ):
+        self.saved = ( CPULimitedHost.inited, CPULimitedHost.cgroupV2,
+                       CPULimitedHost.cgroupV2Root )
+        self.root = tempfile.mkdtemp()
+        CPULimitedHost.inited, CPULimitedHost.cgroupV2 = True, True
+        CPULimitedHost.cgroupV2Root = self.root
+        self.host = CPULimitedHost( 'h1' )
+        self.path = os.path.join( self.root, 'h1' )
+
+    def tearDown( self ):
+        self.clear()
+        self.host.terminate()
+        ( CPULimitedHost.inited, CPULimitedHost.cgroupV2,
+          CPULimitedHost.cgroupV2Root ) = self.saved
+        shutil.rmtree( self.root )
+
+    def clear( self ):
+        "Remove our scratch cgroup's files (the kernel would do this)"
+        if os.path.isdir( self.path ):
+            for fname in os.listdir( self.path ):
+                os.unlink( os.path.join( self.path, fname ) )
+
+    def read( self, fname ):
+        "Return contents of one of our scratch cgroup files"
+        with open( os.path.join( self.path, fname ) ) as f:
+            return f.read()
+
+    def testCreate( self ):
+        "Our shell is moved into our cgroup"
+        self.assertEqual( self.read( 'cgroup.procs' ),
+                          '%d\n' % self.host.pid )
+
+    def testSetGet( self ):
+        "cgroupSet() writes parameters; cgroupGet() returns integers"
+        host = self.host
+        self.assertEqual( host.cgroupSet( 'weight', 50 ), 50 )
+        self.assertEqual( self.read( 'cpu.weight' ), '50\n' )
+        self.assertEqual( host.cgroupGet( 'weight' ), 50 )
+        host.cgroupSet( 'max', 'max', resource='memory' )
+        self.assertEqual( host.cgroupGet( 'max', resource='memory' ), -1 )
+
+    def testConfig( self ):
+        "config() sets cpu.max and cpuset files"
+        host = self.host
+        result = host.config( cpu=.5, cores=[ 0 ], mems=[ 0 ] )
+        self.assertTrue( 'cores' in result )
+        period = host.period_us
+        self.assertEqual( self.read( 'cpu.max' ).split(),
+                          [ str( int( period * .5 * numCores() ) ),
+                            str( period ) ] )
+        self.assertEqual( self.read( 'cpuset.cpus' ), '0\n' )
+        self.assertEqual( self.read( 'cpuset.mems' ), '0\n' )
+
+    def testBatch( self ):
+        "batchWrites() defers writes until the batch ends"
+        host = self.host
+        with CPULimitedHost.batchWrites():
+            host.config( cpu=.5, cores=[ 0 ] )
+            with CPULimitedHost.batchWrites():
+                host.setCPUs( [ 0 ], mems=0 )
+            self.assertFalse( os.path.exists(
+                os.path.join( self.path, 'cpu.max' ) ) )
+        self.assertEqual( self.read( 'cpuset.cpus' ), '0\n' )
+        self.assertEqual( len( self.read( 'cpu.max' ).split() ), 2 )
+        self.assertEqual( CPULimitedHost.pendingWrites, None )
+
+    def testDel( self ):
+        "cgroupDel() removes our cgroup, and succeeds if it is gone"
+        host = self.host
+        self.assertFalse( host.cgroupDel() )
+        self.clear()
+        self.assertTrue( host.cgroupDel() )
+        self.assertFalse( os.path.exists( self.path ) )
+        self.assertTrue( host.cgroupDel() )
+
+
+if __name__ == '__main__':
+    unittest.main()
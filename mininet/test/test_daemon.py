@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test the Mininet daemon's JSON-RPC control socket"""
+
+import os
+import threading
+import unittest
+from tempfile import mkdtemp
+
+from mininet.net import Mininet
+from mininet.daemon import MininetDaemon, MininetClient
+from mininet.link import TCLink
+
+
+class testDaemon( unittest.TestCase ):
+    "Test commands, streaming and link changes over the control socket"
+
+    def setUp( self ):
+        self.net = Mininet( controller=None, link=TCLink, build=False )
+        h1, h2 = self.net.addHost( 'h1' ), self.net.addHost( 'h2' )
+        self.net.addLink( h1, h2 )
+        self.net.build()
+        self.path = os.path.join( mkdtemp(), 'mn.sock' )
+        self.daemon = MininetDaemon( self.net, self.path )
+        self.thread = threading.Thread( target=self.daemon.serve )
+        self.thread.start()
+        while not os.path.exists( self.path ):
+            self.thread.join( .05 )
+        self.client = MininetClient( self.path )
+
+    def tearDown( self ):
+        self.client.stop()
+        self.client.close()
+        self.thread.join()
+        self.net.stop()
+        os.rmdir( os.path.dirname( self.path ) )
+
+    def testCmd( self ):
+        "Run commands on several nodes, from two clients"
+        other = MininetClient( self.path )
+        result = other.cmd( nodes='hosts', command='echo $((6*7))' )
+        other.close()
+        self.assertEqual( set( result ), set( [ 'h1', 'h2' ] ) )
+        self.assertEqual( result[ 'h1' ].strip(), '42' )
+        self.assertEqual( self.client.nodes()[ 'hosts' ], [ 'h1', 'h2' ] )
+        self.assertRaises( Exception, self.client.cmd, nodes='h9',
+                           command='true' )
+
+    def testPopen( self ):
+        "Stream output from a command"
+        lines = list( self.client.popen( node='h1',
+                                         args=[ 'seq', '3' ] ) )
+        self.assertEqual( lines, [ '1\n', '2\n', '3\n' ] )
+        self.assertEqual( self.client.returncode, 0 )
+
+    def testConfigLink( self ):
+        "Change link parameters, then remove a node"
+        self.client.configLink( node1='h1', node2='h2',
+                                params={ 'bw': 10 } )
+        output = self.client.cmd( nodes='h1', command='tc qdisc show' )
+        self.assertTrue( 'htb' in output[ 'h1' ] )
+        stats = self.client.stats( kind='intfs' )
+        self.assertTrue( 'txBytes' in stats[ 'h1' ][ 'h1-eth0' ] )
+        self.client.delNode( name='h2' )
+        self.assertEqual( self.client.nodes()[ 'hosts' ], [ 'h1' ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
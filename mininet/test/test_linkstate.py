@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test rtnetlink interface state tracking"""
+
+import unittest
+
+from mininet.net import Mininet
+from mininet.nodelib import LinuxBridge
+from mininet.topo import SingleSwitchTopo
+
+
+class testLinkState( unittest.TestCase ):
+    "Test LinkStateMonitor"
+
+    def setUp( self ):
+        self.net = Mininet( topo=SingleSwitchTopo( 2 ), switch=LinuxBridge,
+                            controller=None, linkState=True )
+        self.net.start()
+
+    def tearDown( self ):
+        self.net.stop()
+
+    def testState( self ):
+        "Intf lookups follow changes made behind Mininet's back"
+        net = self.net
+        h1 = net[ 'h1' ]
+        intf = h1.intf()
+        changes = []
+        net.linkMonitor.addCallback(
+            lambda i, field, old, new: changes.append( ( i, field, new ) ) )
+        self.assertEqual( intf.IP(), '10.0.0.1' )
+        self.assertTrue( intf.isUp() )
+        h1.cmd( 'ip addr flush dev h1-eth0; '
+                'ip addr add 10.1.2.3/24 dev h1-eth0; '
+                'ip link set h1-eth0 address 00:00:00:00:01:01' )
+        self.assertEqual( intf.IP(), '10.1.2.3' )
+        self.assertEqual( intf.updateIP(), '10.1.2.3' )
+        self.assertEqual( intf.MAC(), '00:00:00:00:01:01' )
+        self.assertTrue( ( intf, 'ip', '10.1.2.3' ) in changes )
+        h1.cmd( 'ip link set h1-eth0 down' )
+        self.assertFalse( intf.isUp() )
+        self.assertEqual( intf.linkState().operstate, 'down' )
+        h1.cmd( 'ip link del h1-eth0' )
+        self.assertEqual( intf.status(), 'MISSING' )
+        self.assertEqual( net[ 'h2' ].intf().status(), 'OK' )
+
+    def testNewNode( self ):
+        "Nodes added later are watched too"
+        net = self.net
+        h3 = net.addHost( 'h3' )
+        net.addLink( h3, net[ 's1' ] )
+        h3.cmd( 'ip addr add 10.0.0.3/8 dev h3-eth0' )
+        self.assertEqual( h3.intf().linkState().ip, '10.0.0.3' )
+
+
+if __name__ == '__main__':
+    unittest.main()
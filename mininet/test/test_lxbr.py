@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test batch startup and shutdown of Linux bridges"""
+
+import os
+import unittest
+
+from mininet.node import Host
+from mininet.nodelib import LinuxBridge
+from mininet.link import Link
+
+
+class testLinuxBridge( unittest.TestCase ):
+    "Test LinuxBridge.batchStartup() and batchShutdown()"
+
+    def setUp( self ):
+        self.switches = [ LinuxBridge( 's%d' % i, batch=True,
+                                       inNamespace=False )
+                          for i in range( 1, 4 ) ]
+        self.hosts = [ Host( 'h%d' % i ) for i in range( 1, 4 ) ]
+        for host, switch in zip( self.hosts, self.switches ):
+            Link( host, switch )
+        for src, dst in zip( self.switches, self.switches[ 1: ] ):
+            Link( src, dst )
+
+    def tearDown( self ):
+        for node in self.hosts + self.switches:
+            node.stop( deleteIntfs=True )
+            node.terminate()
+
+    def testBatch( self ):
+        "Bridges are created with their ports, then deleted"
+        for switch in self.switches:
+            switch.start( [] )
+        self.assertFalse( os.path.exists( '/sys/class/net/s1' ) )
+        started = LinuxBridge.batchStartup( self.switches )
+        self.assertEqual( started, self.switches )
+        self.assertEqual( sorted( os.listdir( '/sys/class/net/s2/brif' ) ),
+                          [ 's2-eth1', 's2-eth2', 's2-eth3' ] )
+        LinuxBridge.batchShutdown( self.switches )
+        for switch in self.switches:
+            self.assertFalse( os.path.exists( '/sys/class/net/%s' %
+                                              switch ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test shell-less hosts backed by named network namespaces"""
+
+import os
+import unittest
+
+from mininet.node import NetnsHost
+from mininet.link import Link
+from mininet.util import quietRun
+
+
+class testNetnsHost( unittest.TestCase ):
+    "Test NetnsHost commands, lazy shell startup and cleanup"
+
+    def setUp( self ):
+        self.h1, self.h2 = NetnsHost( 'h1' ), NetnsHost( 'h2' )
+
+    def tearDown( self ):
+        for host in self.h1, self.h2:
+            host.stop( deleteIntfs=True )
+
+    def testOnDemand( self ):
+        "Commands run in our namespace without a resident shell"
+        Link( self.h1, self.h2 )
+        self.assertEqual( self.h1.shell, None )
+        links = self.h1.cmd( 'ip -o link show' )
+        self.assertTrue( 'h1-eth0' in links )
+        self.assertFalse( 'h2-eth0' in links )
+        self.assertEqual( self.h1.cmdFull( 'echo hi; exit 3' ),
+                          ( 'hi\n', '', 3 ) )
+        self.assertEqual( self.h1.shell, None )
+
+    def testLazyShell( self ):
+        "sendCmd() starts a persistent shell in our namespace"
+        self.h1.cmd( 'ip link add dummy0 type dummy' )
+        self.h1.sendCmd( 'ip -o link show dummy0' )
+        self.assertTrue( 'dummy0' in self.h1.waitOutput() )
+        self.assertNotEqual( self.h1.shell, None )
+        self.h1.cmd( 'cd /' )
+        self.assertEqual( self.h1.cmd( 'pwd' ).strip(), '/' )
+
+    def testCleanup( self ):
+        "Stopping a host removes its namespace"
+        path = self.h1.nsPath
+        self.assertTrue( os.path.exists( path ) )
+        self.h1.cmd( 'sleep 1000 &' )
+        self.assertTrue( self.h1.shell )
+        self.assertTrue( self.h1.lastPid )
+        self.h1.stop()
+        self.assertFalse( os.path.exists( path ) )
+        self.assertEqual( quietRun( [ 'pgrep', '-f', '^sleep 1000' ] ), '' )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Package: mininet
+   Test reading node output (read, readline, cmdIter)"""
+
+import time
+import unittest
+
+from mininet.node import Node
+
+
+class testNodeIO( unittest.TestCase ):
+    "Test buffered reading of node output"
+
+    def setUp( self ):
+        self.node = Node( 'n1' )
+
+    def tearDown( self ):
+        self.node.terminate()
+
+    def smallReads( self, size ):
+        "Make our node read at most size bytes at a time"
+        self.node.readMin = self.node.readMax = self.node.readSize = size
+
+    def testLargeOutput( self ):
+        "Multi-megabyte output is read completely, and quickly"
+        size = 8 * 1024 * 1024
+        start = time.time()
+        output = self.node.cmd( 'head -c %d /dev/zero | tr "\\0" x' % size )
+        elapsed = time.time() - start
+        self.assertEqual( len( output ), size )
+        self.assertEqual( output.count( 'x' ), size )
+        # Reading used to be quadratic in the output size
+        self.assertTrue( elapsed < 5, 'took %.1fs' % elapsed )
+
+    def testReadline( self ):
+        "Lines which span several reads are returned whole"
+        node = self.node
+        self.smallReads( 4 )
+        node.sendCmd( 'printf "%s\\n" abcdefghij klmnopqrstuvwxyz' )
+        lines = []
+        while len( lines ) < 2:
+            line = node.readline()
+            if line is not None:
+                lines.append( line.strip() )
+        self.assertEqual( lines, [ 'abcdefghij', 'klmnopqrstuvwxyz' ] )
+        node.waitOutput()
+        self.assertEqual( node.cmd( 'echo ok' ).strip(), 'ok' )
+
+    def testMultibyte( self ):
+        "Multibyte UTF-8 characters split across reads are decoded"
+        node = self.node
+        text = 'café € \U0001d11e'
+        self.smallReads( 1 )
+        output = node.cmd( 'echo', text )
+        self.assertEqual( output.strip(), text )
+
+    def testCmdIter( self ):
+        "cmdIter() yields output as it arrives"
+        node = self.node
+        chunks = list( node.cmdIter(
+            'for i in 1 2 3; do echo $i; sleep .2; done' ) )
+        self.assertTrue( len( chunks ) >= 3 )
+        self.assertEqual( ''.join( chunks ).split(), [ '1', '2', '3' ] )
+        self.assertFalse( node.waiting )
+
+    def testCmdIterClose( self ):
+        "Closing a cmdIter() early interrupts its command"
+        node = self.node
+        chunks = node.cmdIter( 'yes' )
+        self.assertTrue( next( chunks ).startswith( 'y' ) )
+        chunks.close()
+        self.assertFalse( node.waiting )
+        self.assertEqual( node.cmd( 'echo ok' ).strip(), 'ok' )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test in-process namespace sockets (Node.socket())"""
+
+import socket
+import unittest
+
+from mininet.node import Host, NetnsHost
+from mininet.link import Link
+
+
+class testNodeSocket( unittest.TestCase ):
+    "Test sockets created in node namespaces by the Mininet process"
+
+    def setUp( self ):
+        self.h1, self.h2 = Host( 'h1' ), NetnsHost( 'h2' )
+        Link( self.h1, self.h2 )
+        self.h1.setIP( '10.0.0.1/8' )
+        self.h2.setIP( '10.0.0.2/8' )
+
+    def tearDown( self ):
+        for host in self.h1, self.h2:
+            host.stop( deleteIntfs=True )
+
+    def testTCP( self ):
+        "TCP connection between sockets in two namespaces"
+        server = self.h2.socket()
+        server.bind( ( '10.0.0.2', 0 ) )
+        server.listen( 1 )
+        port = server.getsockname()[ 1 ]
+        client = self.h1.socket()
+        client.connect( ( '10.0.0.2', port ) )
+        conn, addr = server.accept()
+        self.assertEqual( addr[ 0 ], '10.0.0.1' )
+        client.sendall( b'hello' )
+        self.assertEqual( conn.recv( 5 ), b'hello' )
+        for sock in conn, client, server:
+            sock.close()
+
+    def testNamespace( self ):
+        "Node sockets can't see addresses in the root namespace"
+        sock = self.h1.socket( socket.AF_INET, socket.SOCK_DGRAM )
+        sock.bind( ( '10.0.0.1', 0 ) )
+        sock.close()
+        sock = socket.socket( socket.AF_INET, socket.SOCK_DGRAM )
+        self.assertRaises( socket.error, sock.bind, ( '10.0.0.1', 0 ) )
+        sock.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
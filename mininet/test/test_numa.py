@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test topology- and NUMA-aware CPU placement (mininet.numa)"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mininet.net import Mininet
+from mininet.node import Host
+from mininet.numa import parseCpuList, CPULayout, CPUPlanner
+from mininet.topo import Topo
+from mininet.topolib import TreeTopo
+
+
+def makeSysfs( root, nodes, threads=2 ):
+    """Create a fake sysfs tree
+       nodes: number of NUMA nodes, each with 4 cores
+       threads: SMT threads per core"""
+    def write( path, text ):
+        "Write text to root/path"
+        path = os.path.join( root, path )
+        if not os.path.isdir( os.path.dirname( path ) ):
+            os.makedirs( os.path.dirname( path ) )
+        with open( path, 'w' ) as f:
+            f.write( text + '\n' )
+    cores = 4 * nodes
+    cpus = cores * threads
+    write( 'cpu/online', '0-%d' % ( cpus - 1 ) )
+    for cpu in range( cpus ):
+        # Linux-style numbering: sibling threads are cores apart
+        core = cpu % cores
+        write( 'cpu/cpu%d/topology/core_id' % cpu, str( core % 4 ) )
+        write( 'cpu/cpu%d/topology/physical_package_id' % cpu,
+               str( core // 4 ) )
+    for node in range( nodes ):
+        cpulist = ','.join( '%d-%d' % ( t * cores + node * 4,
+                                        t * cores + node * 4 + 3 )
+                            for t in range( threads ) )
+        write( 'node/node%d/cpulist' % node, cpulist )
+
+
+class testNuma( unittest.TestCase ):
+    "Test CPULayout and CPUPlanner on a fake two-socket machine"
+
+    def setUp( self ):
+        self.sysfs = tempfile.mkdtemp()
+        makeSysfs( self.sysfs, nodes=2 )
+        self.layout = CPULayout( sysfs=self.sysfs )
+
+    def tearDown( self ):
+        shutil.rmtree( self.sysfs )
+
+    def testParseCpuList( self ):
+        "Parse CPU list syntax"
+        self.assertEqual( parseCpuList( '0-2,5,7-8\n' ), [ 0, 1, 2, 5, 7, 8 ] )
+
+    def testLayout( self ):
+        "Physical cores come before SMT siblings on each node"
+        self.assertEqual( self.layout.nodes,
+                          { 0: [ 0, 1, 2, 3, 8, 9, 10, 11 ],
+                            1: [ 4, 5, 6, 7, 12, 13, 14, 15 ] } )
+
+    def testPlan( self ):
+        "Hosts on the same switch share a NUMA node"
+        topo = TreeTopo( depth=2, fanout=4 )
+        plan = CPUPlanner( self.layout ).plan( topo )
+        self.assertEqual( len( plan ), 16 )
+        for edge in topo.switches()[ 1: ]:
+            hosts = [ n for n in topo.g[ edge ] if not topo.isSwitch( n ) ]
+            self.assertEqual(
+                len( set( plan[ h ][ 'mems' ][ 0 ] for h in hosts ) ), 1 )
+        # Sixteen hosts on sixteen CPUs: each gets its own
+        cores = [ plan[ h ][ 'cores' ][ 0 ] for h in plan ]
+        self.assertEqual( sorted( cores ), list( range( 16 ) ) )
+
+    def testReserve( self ):
+        "Reserved CPUs are not used for hosts"
+        topo = Topo()
+        switch = topo.addSwitch( 's1' )
+        for i in range( 4 ):
+            topo.addLink( topo.addHost( 'h%d' % i ), switch )
+        planner = CPUPlanner( self.layout, reserve=2 )
+        self.assertEqual( planner.reserved, [ 0, 1 ] )
+        plan = planner.plan( topo )
+        for host in plan.values():
+            self.assertFalse( host[ 'cores' ][ 0 ] in planner.reserved )
+            # A small network fits on a single node
+            self.assertEqual( host[ 'mems' ], [ 0 ] )
+
+    def testPlace( self ):
+        "Hosts placed one at a time go to the least used CPUs"
+        planner = CPUPlanner( self.layout, reserve=2 )
+        placed = [ planner.place()[ 'cores' ][ 0 ] for _ in range( 14 ) ]
+        self.assertEqual( sorted( placed ), list( range( 2, 16 ) ) )
+        self.assertEqual( planner.free(), [] )
+        self.assertFalse( planner.place()[ 'cores' ][ 0 ] in [ 0, 1 ] )
+
+    def testAddHost( self ):
+        "Hosts added outside a topo avoid reserved CPUs"
+        net = Mininet( autoPinCpus=True, controller=None, build=False )
+        net.cpuPlanner = CPUPlanner( self.layout, reserve=2 )
+        try:
+            for i in range( 16 ):
+                net.addHost( 'h%d' % i, cls=Host )
+        finally:
+            net.stop()
+        for plan in net.cpuPlan.values():
+            self.assertFalse( plan[ 'cores' ][ 0 ] in [ 0, 1 ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
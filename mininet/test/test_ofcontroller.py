@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test the built-in OpenFlow learning controller (PythonController)"""
+
+import socket
+import struct
+import time
+import unittest
+
+from mininet.node import PythonController
+from mininet.util import waitListening
+
+HEADER = struct.Struct( '!BBHI' )
+HELLO, FEATURES_REQUEST, FEATURES_REPLY = 0, 5, 6
+PACKET_IN, PACKET_OUT, FLOW_MOD = 10, 13, 14
+
+
+def frame( dst, src ):
+    "Return a minimal Ethernet frame"
+    return dst + src + b'\x08\x00' + b'\0' * 46
+
+
+class FakeSwitch( object ):
+    "Minimal OpenFlow switch end of a connection"
+
+    def __init__( self, port, version, dpid ):
+        self.sock = socket.create_connection( ( '127.0.0.1', port ) )
+        self.sock.settimeout( 5 )
+        self.version = version
+        self.send( HELLO )
+        self.lastVersion = None
+        # Wait for the controller's features request and reply to it
+        self.expect( FEATURES_REQUEST )
+        self.send( FEATURES_REPLY, struct.pack( '!QIBxxxII', dpid, 0, 1,
+                                                 0, 0 ) )
+
+    def send( self, kind, body=b'' ):
+        "Send a message"
+        self.sock.sendall( HEADER.pack( self.version, kind,
+                                        HEADER.size + len( body ), 0 ) +
+                           body )
+
+    def recv( self ):
+        "Receive a message: ( version, type, body )"
+        header = b''
+        while len( header ) < HEADER.size:
+            header += self.sock.recv( HEADER.size - len( header ) )
+        version, kind, length, _xid = HEADER.unpack( header )
+        body = b''
+        while len( body ) < length - HEADER.size:
+            body += self.sock.recv( length - HEADER.size - len( body ) )
+        return version, kind, body
+
+    def expect( self, kind ):
+        "Return body of the next message of type kind"
+        while True:
+            version, msgType, body = self.recv()
+            if msgType == kind:
+                self.lastVersion = version
+                return body
+
+    def packetIn( self, inPort, data ):
+        "Send a packet-in for an unbuffered packet"
+        if self.version == 1:
+            body = struct.pack( '!IHHBx', 0xffffffff, len( data ),
+                                inPort, 0 )
+        else:
+            match = struct.pack( '!HHII', 1, 12, 0x80000004, inPort )
+            body = ( struct.pack( '!IHBBQ', 0xffffffff, len( data ), 0, 0,
+                                  0 ) + match + b'\0' * 4 + b'\0\0' )
+        self.send( PACKET_IN, body + data )
+
+    def close( self ):
+        "Close connection"
+        self.sock.close()
+
+
+class testPythonController( unittest.TestCase ):
+    "Test L2 learning with OpenFlow 1.0 and 1.3 switches"
+
+    def setUp( self ):
+        self.controller = PythonController( 'c0', port=16653 )
+        self.controller.start()
+        waitListening( server='127.0.0.1', port=16653, timeout=5 )
+
+    def tearDown( self ):
+        self.controller.stop()
+
+    def learn( self, version ):
+        "Flood, learn, then install a flow"
+        a, b = b'\x00\x00\x00\x00\x00\x01', b'\x00\x00\x00\x00\x00\x02'
+        switch = FakeSwitch( 16653, version, dpid=version )
+        switch.packetIn( 1, frame( b, a ) )
+        # Unknown destination: flooded
+        switch.expect( PACKET_OUT )
+        switch.packetIn( 2, frame( a, b ) )
+        # Known destination: a flow, then a packet-out to port 1
+        body = switch.expect( FLOW_MOD )
+        self.assertEqual( switch.lastVersion, version )
+        # The flow's only action is an output action, at the end
+        if version == 1:
+            port = struct.unpack( '!H', body[ -4:-2 ] )[ 0 ]
+        else:
+            port = struct.unpack( '!I', body[ -12:-8 ] )[ 0 ]
+        self.assertEqual( port, 1 )
+        switch.expect( PACKET_OUT )
+        switch.close()
+
+    def testOpenFlow10( self ):
+        "Learning with an OpenFlow 1.0 switch"
+        self.learn( 1 )
+
+    def testOpenFlow13( self ):
+        "Learning with an OpenFlow 1.3 switch; per-switch counters"
+        self.learn( 4 )
+        for _ in range( 20 ):
+            stats = self.controller.stats()
+            if stats:
+                break
+            time.sleep( .1 )
+        counters = stats[ '%016x' % 4 ]
+        self.assertEqual( counters[ 'packetIns' ], 2 )
+        # Table-miss flow plus one learned flow
+        self.assertEqual( counters[ 'flowMods' ], 2 )
+
+
+if __name__ == '__main__':
+    unittest.main()
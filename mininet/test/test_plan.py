@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test building networks from compiled build plans"""
+
+import os
+import tempfile
+import unittest
+
+from mininet.net import Mininet
+from mininet.nodelib import LinuxBridge
+from mininet.link import TCLink
+from mininet.topo import Topo
+from mininet.plan import BuildPlan, compilePlan, planKey
+
+
+class PlanTopo( Topo ):
+    "Two switches with two hosts each; one host has a shaped link"
+
+    def build( self, *args, **params ):
+        s1, s2 = self.addSwitch( 's1' ), self.addSwitch( 's2' )
+        self.addLink( s1, s2 )
+        for i in range( 1, 5 ):
+            host = self.addHost( 'h%d' % i )
+            self.addLink( host, s1 if i < 3 else s2,
+                          **( { 'bw': 10 } if i == 1 else {} ) )
+
+
+def makeNet( plan, build=True ):
+    "Return a network for PlanTopo"
+    return Mininet( topo=PlanTopo(), switch=LinuxBridge, link=TCLink,
+                    controller=None, autoSetMacs=True, plan=plan,
+                    build=build )
+
+
+class testPlan( unittest.TestCase ):
+    "Test build plans"
+
+    def testBuild( self ):
+        "A planned network matches a normally built one"
+        net = makeNet( True )
+        try:
+            net.start()
+            self.assertEqual( len( net.links ), 5 )
+            for i in range( 1, 5 ):
+                host = net[ 'h%d' % i ]
+                self.assertEqual( host.IP(), '10.0.0.%d' % i )
+                self.assertTrue( '10.0.0.%d/8' % i in
+                                 host.cmd( 'ip addr show h%d-eth0' % i ) )
+                self.assertEqual( host.MAC(), '00:00:00:00:00:0%d' % i )
+                self.assertTrue( 'UP' in host.cmd( 'ip link show lo' ) )
+            h1 = net[ 'h1' ]
+            self.assertTrue( 'htb' in h1.cmd( 'tc qdisc show dev h1-eth0' ) )
+            self.assertEqual( sorted( net[ 's1' ].cmd(
+                'ls /sys/class/net/s1/brif' ).split() ),
+                [ 's1-eth1', 's1-eth2', 's1-eth3' ] )
+            self.assertEqual( h1.intf().link.intf2.node, net[ 's1' ] )
+        finally:
+            net.stop()
+
+    def testSaveLoad( self ):
+        "Plans can be saved, loaded, printed and executed as saved"
+        net = makeNet( None, build=False )
+        plan = compilePlan( net, net.topo )
+        self.assertTrue( 'link add h1-eth0' in plan.script() )
+        self.assertTrue( 'addr add 10.0.0.1/8' in plan.script() )
+        fd, path = tempfile.mkstemp( suffix='.json' )
+        os.close( fd )
+        try:
+            plan.save( path )
+            loaded = BuildPlan.load( path )
+            self.assertEqual( loaded.script(), plan.script() )
+            self.assertEqual( loaded.key, plan.key )
+            with open( path ) as f:
+                saved = f.read()
+            mtime = os.stat( path ).st_mtime_ns
+            net = makeNet( path, build=False )
+            # The saved plan matches, so it shouldn't be recompiled
+            self.assertEqual( planKey( net, net.topo ), plan.key )
+            try:
+                net.start()
+                self.assertEqual( net[ 'h4' ].IP(), '10.0.0.4' )
+            finally:
+                net.stop()
+            with open( path ) as f:
+                self.assertEqual( f.read(), saved )
+            self.assertEqual( os.stat( path ).st_mtime_ns, mtime )
+        finally:
+            os.unlink( path )
+
+
+if __name__ == '__main__':
+    unittest.main()
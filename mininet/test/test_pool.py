@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test reusing node shells from a warm pool"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mininet.link import Link
+from mininet.node import Host, CPULimitedHost
+from mininet.pool import NodePool, netnsPids
+
+
+class testPool( unittest.TestCase ):
+    "Test NodePool"
+
+    def setUp( self ):
+        self.pool = NodePool( size=2 )
+
+    def tearDown( self ):
+        self.pool.stop()
+
+    def testReset( self ):
+        "Returned shells are reset before they are reused"
+        h1, h2 = Host( 'h1', pool=self.pool ), Host( 'h2', pool=self.pool )
+        Link( h1, h2 )
+        h1.cmd( 'sysctl -w net.ipv4.ip_forward=1; ip link set lo up;'
+                'sleep 1000 &' )
+        pid = h1.pid
+        # Returned shells are reused first
+        h2.terminate()
+        h1.terminate()
+        h3 = Host( 'h3', pool=self.pool )
+        self.assertEqual( h3.pid, pid )
+        self.assertEqual( h3.cmd( 'echo $1 $$' ).split(),
+                          [ 'mininet:h3', str( pid ) ] )
+        self.assertEqual( h3.cmd( 'ls /sys/class/net' ).split(), [ 'lo' ] )
+        self.assertEqual( h3.cmd( 'cat /proc/sys/net/ipv4/ip_forward' ),
+                          '0\r\n' )
+        self.assertEqual( netnsPids( h3.pid ), [] )
+        h3.terminate()
+
+    def testCPULimitedHost( self ):
+        "Shells of CPULimitedHosts are not returned to the pool"
+        saved = ( CPULimitedHost.inited, CPULimitedHost.cgroupV2,
+                  CPULimitedHost.cgroupV2Root )
+        root = tempfile.mkdtemp()
+        # Use a scratch v2 hierarchy so that we don't need cgroups
+        CPULimitedHost.inited, CPULimitedHost.cgroupV2 = True, True
+        CPULimitedHost.cgroupV2Root = root
+        try:
+            h1 = CPULimitedHost( 'h1', pool=self.pool )
+            pid = h1.pid
+            shell = h1.shell
+            # Our scratch cgroup.procs is a plain file
+            os.unlink( os.path.join( root, 'h1', 'cgroup.procs' ) )
+            h1.terminate()
+            self.assertNotEqual( shell.poll(), None )
+            self.assertFalse( os.path.exists( os.path.join( root, 'h1' ) ) )
+            h2 = Host( 'h2', pool=self.pool )
+            self.assertNotEqual( h2.pid, pid )
+            h2.terminate()
+        finally:
+            ( CPULimitedHost.inited, CPULimitedHost.cgroupV2,
+              CPULimitedHost.cgroupV2Root ) = saved
+            shutil.rmtree( root )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test instance prefixes for running several networks at once"""
+
+import unittest
+
+from mininet.net import Mininet
+from mininet.node import Host, Switch
+from mininet.clean import cleanup
+from mininet.util import quietRun
+
+
+class testPrefix( unittest.TestCase ):
+    "Test naming and cleanup of a prefixed instance"
+
+    def setUp( self ):
+        self.nets = [ Mininet( prefix=prefix, build=False, controller=None )
+                      for prefix in ( 'ta-', 'tb-' ) ]
+        for net in self.nets:
+            # Plain Switches (which we don't start) stand in for OVS
+            h1 = net.addHost( 'h1', cls=Host )
+            s1 = net.addSwitch( 's1', cls=Switch )
+            net.addLink( h1, s1 )
+
+    def tearDown( self ):
+        for net in self.nets:
+            for node in net.hosts + net.switches:
+                node.stop( deleteIntfs=True )
+                node.terminate()
+
+    def testNames( self ):
+        "Nodes and interfaces are prefixed; short names still work"
+        net = self.nets[ 0 ]
+        s1 = net[ 's1' ]
+        self.assertTrue( s1 is net[ 'ta-s1' ] )
+        self.assertEqual( list( net ), [ 'ta-h1', 'ta-s1' ] )
+        self.assertEqual( s1.intfNames(), [ 'lo', 'ta-s1-eth1' ] )
+        self.assertEqual( int( s1.dpid, 16 ), 1 )
+        net.delSwitch( s1 )
+        self.assertFalse( 's1' in net or 'ta-s1' in net )
+
+    def testCleanup( self ):
+        "Prefixed cleanup leaves other instances alone"
+        cleanup( prefix='ta-' )
+        links = quietRun( 'ip -o link show' )
+        self.assertFalse( 'ta-s1-eth1' in links )
+        self.assertTrue( 'tb-s1-eth1' in links )
+        # cleanup() killed ta-'s shells, so just release its nodes
+        net = self.nets.pop( 0 )
+        for node in net.hosts + net.switches:
+            node.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test proactive flow computation (mininet.routing)"""
+
+import unittest
+
+from mininet.node import Host, Switch
+from mininet.link import Link
+from mininet.routing import Routes, FLOOD_MATCH
+
+
+class testRoutes( unittest.TestCase ):
+    "Test flows computed for a looped topology (a triangle of switches)"
+
+    def setUp( self ):
+        # Plain Switches (which needn't be running) stand in for OVS
+        self.switches = [ Switch( 's%d' % i ) for i in range( 1, 4 ) ]
+        self.hosts = [ Host( 'h%d' % i ) for i in range( 1, 4 ) ]
+        self.links = []
+        for i, switch in enumerate( self.switches ):
+            self.links.append( Link( self.hosts[ i ], switch,
+                                     addr1='00:00:00:00:00:0%d' % ( i + 1 ),
+                                     addr2='00:00:00:00:01:0%d' % ( i + 1 ) ) )
+        s1, s2, s3 = self.switches
+        for src, dst in ( s1, s2 ), ( s2, s3 ), ( s1, s3 ):
+            self.links.append( Link( src, dst ) )
+
+    def tearDown( self ):
+        for node in self.hosts + self.switches:
+            node.stop( deleteIntfs=True )
+            node.terminate()
+
+    def flows( self, mode, switch ):
+        "Return flows for switch"
+        routes = Routes( self.switches, self.hosts, self.links, mode=mode )
+        return routes.compute()[ switch ][ 0 ]
+
+    def testShortest( self ):
+        "Shortest paths go direct; floods follow a spanning tree"
+        s1, s2, s3 = self.switches
+        mac3 = '00:00:00:00:00:03'
+        flows = self.flows( 'shortest', s2 )
+        port = s2.ports[ s2.connectionsTo( s3 )[ 0 ][ 0 ] ]
+        self.assertTrue( 'priority=1000,dl_dst=%s,actions=output:%d' %
+                         ( mac3, port ) in flows )
+        # The tree rooted at s1 omits the s2-s3 link
+        flood = [ f for f in flows if FLOOD_MATCH in f ]
+        self.assertEqual( len( flood ), 1 )
+        self.assertFalse( 'output:%d,' % port in flood[ 0 ] + ',' )
+        self.assertEqual( len( self.flows( 'shortest', s1 ) ), 4 )
+
+    def testTree( self ):
+        "In tree mode, unicast avoids links outside the tree"
+        s1, s2, s3 = self.switches
+        mac3 = '00:00:00:00:00:03'
+        port = s2.ports[ s2.connectionsTo( s1 )[ 0 ][ 0 ] ]
+        direct = s2.ports[ s2.connectionsTo( s3 )[ 0 ][ 0 ] ]
+        flows = self.flows( 'tree', s2 )
+        self.assertTrue( 'priority=1000,dl_dst=%s,actions=output:%d' %
+                         ( mac3, port ) in flows )
+        self.assertFalse( 'priority=1000,dl_dst=%s,actions=output:%d' %
+                          ( mac3, direct ) in flows )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test assignment of switches to controller shards"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mininet.net import Mininet
+from mininet.node import Controller, Switch
+from mininet.numa import CPULayout, CPUPlanner
+
+
+class StartSwitch( Switch ):
+    "Switch which records the controllers it was started with"
+
+    def __init__( self, name, **params ):
+        Switch.__init__( self, name, **params )
+        self.started = None
+
+    def start( self, controllers ):
+        self.started = controllers
+
+
+class testShards( unittest.TestCase ):
+    "Test sharding a linear chain of switches over two controllers"
+
+    def setUp( self ):
+        self.net = Mininet( controller=Controller, shards=2, build=False )
+        for i in range( 2 ):
+            self.net.addController( 'c%d' % i, port=16653 + i )
+        # Plain Switches (which we don't start) stand in for OVS
+        switches = [ self.net.addSwitch( 's%d' % i, cls=Switch )
+                     for i in range( 1, 7 ) ]
+        for src, dst in zip( switches, switches[ 1: ] ):
+            self.net.addLink( src, dst )
+
+    def tearDown( self ):
+        for node in self.net.switches + self.net.controllers:
+            node.stop()
+            node.terminate()
+
+    def testTopo( self ):
+        "Topology partitioning keeps neighbors on the same controller"
+        self.net.shardBy = 'topo'
+        self.net.assignShards()
+        c0, c1 = self.net.controllers
+        self.assertEqual( [ self.net.switchControllers( s )
+                            for s in self.net.switches ],
+                          [ [ c0 ] ] * 3 + [ [ c1 ] ] * 3 )
+
+    def testHash( self ):
+        "Hashing assigns each switch to exactly one controller"
+        self.net.assignShards()
+        stats = self.net.shardStats()
+        self.assertEqual( sum( s[ 'switches' ] for s in stats.values() ), 6 )
+        self.assertEqual( sorted( s[ 'port' ] for s in stats.values() ),
+                          [ 16653, 16654 ] )
+
+    def testAddSwitch( self ):
+        "Switches added later join a shard without moving others"
+        net = self.net
+        net.shardBy = 'topo'
+        net.assignShards()
+        before = dict( net.shardMap )
+        c1 = net.controllers[ 1 ]
+        s7 = net.addSwitch( 's7', cls=StartSwitch )
+        net.addLink( s7, net[ 's6' ] )
+        net.startSwitch( s7 )
+        self.assertEqual( s7.started, [ c1 ] )
+        net.shardBy = 'hash'
+        s8 = net.addSwitch( 's8', cls=StartSwitch )
+        net.startSwitch( s8 )
+        self.assertEqual( len( s8.started ), 1 )
+        self.assertEqual( net.switchControllers( s8 ), s8.started )
+        del net.shardMap[ s7 ], net.shardMap[ s8 ]
+        self.assertEqual( net.shardMap, before )
+
+    def testCpus( self ):
+        "Controllers are not pinned to CPUs which hosts are using"
+        sysfs = tempfile.mkdtemp()
+        try:
+            os.makedirs( os.path.join( sysfs, 'cpu' ) )
+            with open( os.path.join( sysfs, 'cpu', 'online' ), 'w' ) as f:
+                f.write( '0-3\n' )
+            layout = CPULayout( sysfs=sysfs )
+        finally:
+            shutil.rmtree( sysfs )
+        planner = self.net.cpuPlanner = CPUPlanner( layout )
+        planner.plan( hosts=[ 'h1', 'h2' ] )
+        self.assertEqual( self.net.shardCpus(), [ 2, 3 ] )
+        self.net.cpuPlanner = CPUPlanner( layout, reserve=1 )
+        self.assertEqual( self.net.shardCpus(), [ 0 ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Soak test: create and destroy many networks in one process"""
+
+import gc
+import os
+import unittest
+
+from mininet.net import Mininet
+from mininet.node import Node
+from mininet.nodelib import LinuxBridge
+from mininet.link import TCLink
+from mininet.topo import SingleSwitchTopo
+from mininet.log import setLogLevel
+
+# Number of create/destroy cycles, and cycles before we measure
+CYCLES = 1000
+WARMUP = 50
+
+
+def fdCount():
+    "Return number of open fds in this process"
+    return len( os.listdir( '/proc/self/fd' ) )
+
+
+def rssKB():
+    "Return resident set size of this process in KB"
+    with open( '/proc/self/status' ) as f:
+        for line in f:
+            if line.startswith( 'VmRSS:' ):
+                return int( line.split()[ 1 ] )
+    return 0
+
+
+class testSoak( unittest.TestCase ):
+    "Test that stopped networks leave nothing behind"
+
+    def testCycles( self ):
+        "fds, RSS and global state are stable over many cycles"
+        fds = rss = None
+        for cycle in range( CYCLES ):
+            if cycle == WARMUP:
+                gc.collect()
+                fds, rss = fdCount(), rssKB()
+            net = Mininet( topo=SingleSwitchTopo( 2 ), switch=LinuxBridge,
+                           link=TCLink, controller=None )
+            net.start()
+            net[ 'h1' ].cmd( 'ip link show' )
+            net.stop()
+        gc.collect()
+        self.assertEqual( fdCount(), fds )
+        self.assertLess( rssKB() - rss, 4096 )
+        self.assertEqual( Node.inToNode, {} )
+        self.assertEqual( Node.outToNode, {} )
+        self.assertEqual( LinuxBridge.prios, set() )
+
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    unittest.main()
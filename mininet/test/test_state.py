@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test re-attaching to a network after its creator has died"""
+
+import os
+import sys
+import unittest
+from subprocess import call
+from tempfile import mkdtemp
+
+from mininet.net import Mininet
+from mininet.clean import cleanup
+from mininet.util import quietRun
+
+# Build and start a network, then die without cleaning up
+CREATOR = """
+import os
+from mininet.net import Mininet
+from mininet.nodelib import LinuxBridge
+from mininet.topo import SingleSwitchTopo
+net = Mininet( topo=SingleSwitchTopo( 2 ), switch=LinuxBridge,
+               controller=None, prefix='st-', stateFile='%s' )
+net.start()
+os.kill( os.getpid(), 9 )
+"""
+
+
+class testState( unittest.TestCase ):
+    "Test Mininet.attach()"
+
+    def setUp( self ):
+        self.path = os.path.join( mkdtemp(), 'state.json' )
+        call( [ sys.executable, '-c', CREATOR % self.path ] )
+
+    def tearDown( self ):
+        cleanup( prefix='st-' )
+        if os.path.exists( self.path ):
+            os.unlink( self.path )
+        os.rmdir( os.path.dirname( self.path ) )
+
+    def testAttach( self ):
+        "Nodes and links survive their creator, and can be stopped"
+        net = Mininet.attach( self.path )
+        h1, s1 = net[ 'h1' ], net[ 's1' ]
+        self.assertEqual( h1.name, 'st-h1' )
+        self.assertEqual( h1.IP(), '10.0.0.1' )
+        self.assertTrue( '10.0.0.1/8' in h1.cmd( 'ip -o addr show' ) )
+        self.assertEqual( [ link.intf2.name for link in net.links ],
+                          [ 'st-s1-eth1', 'st-s1-eth2' ] )
+        self.assertEqual( s1.ports[ s1.intf( 'st-s1-eth2' ) ], 2 )
+        self.assertTrue( s1.connected() )
+        net.stop()
+        self.assertFalse( os.path.exists( self.path ) )
+        self.assertFalse( 'st-' in quietRun( 'ip -o link show' ) )
+        self.assertFalse( 'mininet-st-' in quietRun( 'ip netns list' ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test statistics monitors (mininet.stats)"""
+
+import os
+import socket
+import struct
+import tempfile
+import unittest
+
+from mininet.node import Host, NetnsHost
+from mininet.link import Link, TCLink
+from mininet.stats import ( Monitor, SampleArray, LinkMonitor, QdiscMonitor,
+                            parseQdiscs, NLMSG, TCMSG, RTM_NEWQDISC,
+                            RTM_GETQDISC,
+                            NLMSG_DONE, parseFlows, parsePorts,
+                            OFStatsMonitor, parseDatapaths,
+                            DatapathMonitor )
+
+
+class testSampleArray( unittest.TestCase ):
+    "Test preallocated sample storage"
+
+    def testGrowth( self ):
+        "Storage grows beyond its initial capacity"
+        samples = SampleArray( 2, capacity=2 )
+        for i in range( 5 ):
+            samples.append( i, [ i, 10 * i ] )
+        self.assertEqual( samples.timestamps(), [ 0, 1, 2, 3, 4 ] )
+        self.assertEqual( samples.column( 1 ), [ 0, 10, 20, 30, 40 ] )
+
+    def testConcurrent( self ):
+        "Readers get consistent copies while a monitor appends"
+        samples = SampleArray( 2, capacity=1 )
+
+        def sampler():
+            "Append a burst of samples"
+            for _ in range( 100 ):
+                samples.append( samples.count, [ samples.count, 1 ] )
+
+        monitor = Monitor( interval=0, sampler=sampler ).start()
+        try:
+            while samples.count < 20000:
+                count, times, values = samples.snapshot()
+                self.assertEqual( len( times ), count )
+                self.assertEqual( list( values[ ::2 ] ), list( times ) )
+                series = samples.series( 0 )
+                self.assertTrue( all( t == v for t, v in series ) )
+        finally:
+            monitor.stop()
+
+
+class testLinkMonitor( unittest.TestCase ):
+    "Test interface counter sampling"
+
+    def setUp( self ):
+        self.h1, self.h2 = Host( 'h1' ), NetnsHost( 'h2' )
+        Link( self.h1, self.h2 )
+        self.h1.setIP( '10.0.0.1/8' )
+        self.h2.setIP( '10.0.0.2/8' )
+
+    def tearDown( self ):
+        for host in self.h1, self.h2:
+            host.stop( deleteIntfs=True )
+
+    def testCounters( self ):
+        "Counters for each intf come from its own namespace"
+        monitor = LinkMonitor( [ self.h1, self.h2 ], interval=60 )
+        monitor.sample()
+        sock = self.h1.socket( socket.AF_INET, socket.SOCK_DGRAM )
+        for _ in range( 10 ):
+            sock.sendto( b'x' * 100, ( '10.0.0.2', 9 ) )
+        sock.close()
+        monitor.sample()
+        monitor.stop()
+        intf1, intf2 = monitor.intfs
+        self.assertEqual( intf1.name, 'h1-eth0' )
+        ( _t0, sent0 ), ( _t1, sent1 ) = monitor.series( intf1, 'txPackets' )
+        ( _t0, rcvd0 ), ( _t1, rcvd1 ) = monitor.series( intf2, 'rxPackets' )
+        self.assertTrue( sent1 - sent0 >= 10 )
+        self.assertTrue( rcvd1 - rcvd0 >= 10 )
+        self.assertEqual( len( monitor.rates( intf1 ) ), 1 )
+        fd, path = tempfile.mkstemp( suffix='.csv' )
+        os.close( fd )
+        monitor.dumpCSV( path )
+        with open( path ) as f:
+            lines = f.readlines()
+        os.unlink( path )
+        self.assertEqual( len( lines ), 3 )
+        self.assertEqual( lines[ 0 ].split( ',' )[ 1 ], 'h1-eth0:rxBytes' )
+
+
+def rtattr( kind, data ):
+    "Return a padded rtattr"
+    attr = struct.pack( '=HH', 4 + len( data ), kind ) + data
+    return attr + b'\0' * ( -len( attr ) % 4 )
+
+
+class testQdiscParsing( unittest.TestCase ):
+    "Test parsing of rtnetlink qdisc dumps"
+
+    def testParse( self ):
+        "Parse kind, handle and stats from a dump"
+        stats2 = ( rtattr( 1, struct.pack( '=QI', 1500, 3 ) ) +
+                   rtattr( 3, struct.pack( '=IIIII', 2, 3000, 4, 0, 7 ) ) )
+        body = ( TCMSG.pack( 0, 2, 0x50000, 0xffffffff, 1 ) +
+                 rtattr( 1, b'htb\0' ) + rtattr( 7, stats2 ) )
+        data = ( NLMSG.pack( NLMSG.size + len( body ), RTM_NEWQDISC,
+                             2, 1, 0 ) + body +
+                 NLMSG.pack( NLMSG.size + 4, NLMSG_DONE, 2, 1, 0 ) +
+                 b'\0' * 4 )
+        qdiscs, done = parseQdiscs( data )
+        self.assertTrue( done )
+        self.assertEqual( len( qdiscs ), 1 )
+        qdisc = qdiscs[ 0 ]
+        self.assertEqual( ( qdisc[ 'ifindex' ], qdisc[ 'handle' ],
+                            qdisc[ 'kind' ] ), ( 2, '5:', 'htb' ) )
+        self.assertEqual( qdisc[ 'stats' ],
+                          dict( bytes=1500, packets=3, qlen=2, backlog=3000,
+                                drops=4, requeues=0, overlimits=7 ) )
+
+    def testStale( self ):
+        "Replies to other requests (e.g. an interrupted dump) are skipped"
+        def message( seq, ifindex=None ):
+            "Return a qdisc (or, with no ifindex, DONE) message"
+            if ifindex is None:
+                return NLMSG.pack( NLMSG.size + 4, NLMSG_DONE, 2, seq,
+                                   0 ) + b'\0' * 4
+            body = ( TCMSG.pack( 0, ifindex, 0x10000, 0xffffffff, 1 ) +
+                     rtattr( 1, b'htb\0' ) )
+            return NLMSG.pack( NLMSG.size + len( body ), RTM_NEWQDISC,
+                               2, seq, 0 ) + body
+        qdiscs, done = parseQdiscs( message( 1, 3 ) + message( 1 ) +
+                                    message( 2, 4 ), seq=2 )
+        self.assertEqual( [ q[ 'ifindex' ] for q in qdiscs ], [ 4 ] )
+        self.assertFalse( done )
+        _qdiscs, done = parseQdiscs( message( 2 ), seq=2 )
+        self.assertTrue( done )
+
+
+class testQdiscMonitor( unittest.TestCase ):
+    "Test qdisc statistics sampling"
+
+    def setUp( self ):
+        self.h1, self.h2 = Host( 'h1' ), NetnsHost( 'h2' )
+        self.link = TCLink( self.h1, self.h2, bw=10 )
+        self.h1.setIP( '10.0.0.1/8' )
+        self.h2.setIP( '10.0.0.2/8' )
+
+    def tearDown( self ):
+        for host in self.h1, self.h2:
+            host.stop( deleteIntfs=True )
+
+    def testSample( self ):
+        "Sample the HTB qdiscs that TCIntf installs"
+        intf1, intf2 = self.link.intf1, self.link.intf2
+        monitor = QdiscMonitor( [ intf1, intf2 ] )
+        monitor.sample()
+        sock = self.h1.socket( socket.AF_INET, socket.SOCK_DGRAM )
+        for _ in range( 10 ):
+            sock.sendto( b'x' * 100, ( '10.0.0.2', 9 ) )
+        sock.close()
+        monitor.sample()
+        monitor.stop()
+        self.assertEqual( monitor.keys(),
+                          [ ( intf1, '5:' ), ( intf2, '5:' ) ] )
+        self.assertEqual( monitor.kinds[ ( intf1, '5:' ) ], 'htb' )
+        ( _t0, sent0 ), ( _t1, sent1 ) = monitor.series( intf1, '5:',
+                                                         'packets' )
+        self.assertTrue( sent1 - sent0 >= 10 )
+
+    def testInterrupted( self ):
+        "Leftovers from an interrupted dump don't end the next one"
+        monitor = QdiscMonitor( [ self.link.intf1 ] )
+        dumper = monitor.dumpers[ 0 ][ 0 ]
+        # Send a request whose replies are never read
+        dumper.seq += 1
+        request = TCMSG.pack( socket.AF_UNSPEC, 0, 0, 0, 0 )
+        dumper.sock.send( NLMSG.pack( NLMSG.size + len( request ),
+                                      RTM_GETQDISC, 0x301, dumper.seq,
+                                      0 ) + request )
+        dumper.pending = True
+        qdiscs = dumper.dump()
+        monitor.stop()
+        self.assertTrue( qdiscs )
+        self.assertEqual( len( qdiscs ),
+                          len( set( ( q[ 'ifindex' ], q[ 'handle' ] )
+                                    for q in qdiscs ) ) )
+
+    def testRecreated( self ):
+        "Recreated interfaces are found under their new indexes"
+        intf1 = self.link.intf1
+        monitor = QdiscMonitor( [ intf1 ] )
+        monitor.sample()
+        self.link.delete()
+        self.link = TCLink( self.h1, self.h2, bw=10 )
+        self.assertEqual( self.link.intf1.name, intf1.name )
+        monitor.sample()
+        monitor.stop()
+        self.assertEqual( len( monitor.series( intf1, '5:' ) ), 2 )
+
+
+FLOWS = """NXST_FLOW reply (xid=0x4):
+ cookie=0x0, duration=12.5s, table=0, n_packets=10, n_bytes=980, \
+idle_timeout=60, idle_age=2, priority=65535,arp,in_port="s1-eth1",\
+dl_src=00:00:00:00:00:01 actions=output:"s1-eth2"
+ cookie=0x0, duration=20.1s, table=0, n_packets=3, n_bytes=180, \
+priority=0 actions=CONTROLLER:128
+"""
+
+PORTS = """OFPST_PORT reply (xid=0x2): 2 ports
+  port LOCAL: rx pkts=0, bytes=0, drop=0, errs=0, frame=0, over=0, crc=0
+           tx pkts=0, bytes=0, drop=?, errs=0, coll=0
+  port  "s1-eth1": rx pkts=8, bytes=648, drop=0, errs=0, frame=0, over=0, crc=0
+           tx pkts=16, bytes=1296, drop=1, errs=0, coll=0
+"""
+
+
+class testOFStats( unittest.TestCase ):
+    "Test parsing of ovs-ofctl flow and port statistics"
+
+    def testFlows( self ):
+        "Parse dump-flows output into flow records"
+        flows = parseFlows( FLOWS )
+        self.assertEqual( len( flows ), 2 )
+        self.assertEqual( flows[ 0 ], dict(
+            table=0, priority=65535,
+            match='arp,in_port="s1-eth1",dl_src=00:00:00:00:00:01',
+            actions='output:"s1-eth2"', cookie='0x0', packets=10,
+            bytes=980, duration=12.5 ) )
+        self.assertEqual( ( flows[ 1 ][ 'priority' ], flows[ 1 ][ 'match' ] ),
+                          ( 0, '' ) )
+
+    def testPorts( self ):
+        "Parse dump-ports output into port counters"
+        ports = parsePorts( PORTS )
+        self.assertEqual( sorted( ports ), [ 'LOCAL', 's1-eth1' ] )
+        self.assertEqual( ports[ 's1-eth1' ][ 'rxBytes' ], 648 )
+        self.assertEqual( ports[ 's1-eth1' ][ 'txDrops' ], 1 )
+        self.assertEqual( ports[ 'LOCAL' ][ 'txDrops' ], None )
+
+    def testDeltas( self ):
+        "Deltas between samples"
+        monitor = OFStatsMonitor( [ 's1' ] )
+        later = FLOWS.replace( 'n_packets=10, n_bytes=980',
+                               'n_packets=15, n_bytes=1470' )
+        later = later.replace( 'duration=20.1s', 'duration=0.5s' )
+        monitor.history.append( ( 0.0, { 's1': parseFlows( FLOWS ) },
+                                  { 's1': parsePorts( PORTS ) } ) )
+        monitor.history.append( ( 1.0, { 's1': parseFlows( later ) },
+                                  { 's1': parsePorts( PORTS ) } ) )
+        interval, flows = monitor.flowDeltas()
+        self.assertEqual( interval, 1.0 )
+        # The second flow was re-added, so it counts from zero
+        self.assertEqual( [ ( f[ 'packets' ], f[ 'bytes' ] )
+                            for f in flows[ 's1' ] ],
+                          [ ( 5, 490 ), ( 3, 180 ) ] )
+        _interval, ports = monitor.portDeltas()
+        self.assertEqual( ports[ 's1' ][ 's1-eth1' ][ 'txBytes' ], 0 )
+        self.assertEqual( ports[ 's1' ][ 'LOCAL' ][ 'txDrops' ], None )
+
+
+DPCTL = """system@ovs-system:
+  lookups: hit:%d missed:%d lost:%d
+  flows: 12
+  masks: hit:640 total:3 hit/pkt:1.60
+  port 0: ovs-system (internal)
+  port 1: s1 (internal)
+  port 2: s1-eth1
+"""
+
+
+class testDatapathMonitor( unittest.TestCase ):
+    "Test datapath flow cache statistics"
+
+    def testParse( self ):
+        "Parse ovs-dpctl show output"
+        dp = parseDatapaths( DPCTL % ( 300, 100, 0 ) )[ 'system@ovs-system' ]
+        self.assertEqual( ( dp[ 'hit' ], dp[ 'missed' ], dp[ 'lost' ],
+                            dp[ 'flows' ], dp[ 'maskHit' ], dp[ 'masks' ] ),
+                          ( 300, 100, 0, 12, 640, 3 ) )
+        self.assertEqual( dp[ 'ports' ], [ 'ovs-system', 's1', 's1-eth1' ] )
+
+    def testSaturation( self ):
+        "Lost upcalls are flagged and attributed to the current phase"
+        monitor = DatapathMonitor( maxMissRate=1e9 )
+        dp = 'system@ovs-system'
+        for phase, counts in ( ( 'warmup', ( 300, 100, 0 ) ),
+                               ( None, ( 400, 200, 0 ) ),
+                               ( 'load', ( 500, 300, 5 ) ) ):
+            if phase:
+                monitor.mark( phase )
+            monitor.command = [ 'printf', '%s', DPCTL % counts ]
+            monitor.sample()
+        self.assertEqual( [ w[ 1:] for w in monitor.warnings ],
+                          [ ( 'load', dp, '5 upcalls lost' ) ] )
+        self.assertEqual( monitor.bridges[ dp ],
+                          [ 'ovs-system', 's1', 's1-eth1' ] )
+        phases = monitor.phases( dp )
+        self.assertEqual( [ ( p[ 'phase' ], p[ 'missed' ], p[ 'lost' ] )
+                            for p in phases ],
+                          [ ( 'warmup', 100, 0 ), ( 'load', 100, 5 ) ] )
+        self.assertEqual( phases[ 1 ][ 'missRatio' ], .5 )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test deferred link shaping"""
+
+import unittest
+
+from mininet.net import Mininet
+from mininet.node import OVSSwitch
+from mininet.nodelib import LinuxBridge
+from mininet.link import TCLink
+from mininet.topo import SingleSwitchTopo
+from mininet.util import quietRun
+
+
+class testDeferredShaping( unittest.TestCase ):
+    "Test that TCLinks are shaped once, after switches attach"
+
+    def setUp( self ):
+        self.net = Mininet( topo=SingleSwitchTopo( 2 ), switch=LinuxBridge,
+                            link=TCLink, controller=None, build=False )
+        for link in self.net.topo.links( withInfo=True ):
+            link[ 2 ][ 'bw' ] = 10
+
+    def tearDown( self ):
+        self.net.stop()
+
+    def qdiscs( self, node, intf ):
+        "Return tc qdisc show output for intf"
+        return node.cmd( 'tc qdisc show dev', intf )
+
+    def testDeferred( self ):
+        "Switch ports are shaped once, in start()"
+        net = self.net
+        net.build()
+        h1, s1 = net[ 'h1' ], net[ 's1' ]
+        self.assertTrue( 'htb' in self.qdiscs( h1, 'h1-eth0' ) )
+        self.assertFalse( 'htb' in self.qdiscs( s1, 's1-eth1' ) )
+        self.assertEqual( s1.intf( 's1-eth1' ).rootQdisc, 'htb' )
+        net.start()
+        self.assertTrue( 'htb' in self.qdiscs( s1, 's1-eth1' ) )
+        self.assertEqual( s1.intf( 's1-eth1' ).pendingTC, None )
+        self.assertEqual( net.shapeLinks(), [] )
+
+    def testAfterStart( self ):
+        "Links added after start() are shaped right away"
+        net = self.net
+        net.start()
+        h3 = net.addHost( 'h3' )
+        net.addLink( h3, net[ 's1' ], bw=5 )
+        self.assertTrue( 'htb' in self.qdiscs( h3, 'h3-eth0' ) )
+
+
+class ResettingBridge( LinuxBridge ):
+    "Bridge which resets its ports' qdiscs on startup, as OVS does"
+
+    def start( self, controllers ):
+        LinuxBridge.start( self, controllers )
+        for intf in self.intfList():
+            if intf.name != 'lo':
+                self.cmd( 'tc qdisc del dev', intf, 'root' )
+                OVSSwitch.TCReapply( intf )
+
+
+class testPlannedShaping( unittest.TestCase ):
+    "Test that switch ports built from a plan are shaped after startup"
+
+    switchClass = ResettingBridge
+
+    def setUp( self ):
+        topo = SingleSwitchTopo( 2 )
+        for link in topo.links( withInfo=True ):
+            link[ 2 ][ 'bw' ] = 10
+        self.net = Mininet( topo=topo, switch=self.switchClass,
+                            link=TCLink, controller=None, plan=True )
+
+    def tearDown( self ):
+        self.net.stop()
+
+    def testStart( self ):
+        "Switch ports keep their shaping when the switch resets them"
+        self.net.start()
+        s1 = self.net[ 's1' ]
+        for intf in s1.intfList():
+            if intf.name != 'lo':
+                self.assertTrue( 'htb' in s1.cmd( 'tc qdisc show dev',
+                                                  intf ) )
+                self.assertEqual( intf.pendingTC, None )
+
+
+@unittest.skipUnless( quietRun( 'which ovs-vsctl' ),
+                      'OVS is not installed' )
+class testPlannedShapingOVS( testPlannedShaping ):
+    "Test that OVS ports built from a plan are shaped after startup"
+
+    switchClass = OVSSwitch
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,9 +3,16 @@
 """Package: mininet
    Test functions defined in mininet.util."""
 
+import os
+import socket
+import tempfile
 import unittest
+from threading import Timer
+from time import time
 
-from mininet.util import quietRun
+from mininet.node import Node
+from mininet.util import ( quietRun, waitReady, waitListening, isListening,
+                           runAll )
 
 class testQuietRun( unittest.TestCase ):
     """Test quietRun that runs a command and returns its merged output from
@@ -35,6 +42,81 @@ def testMultipleReads( self ):
             output = quietRun(testQuietRun.getEchoCmd( n ) )
             self.assertEqual( n, len( output ) )
 
+class testRunAll( unittest.TestCase ):
+    "Test runAll, which runs commands concurrently"
+
+    def testOutputs( self ):
+        "Each command's stdout is returned, even with lots of stderr"
+        cmd = 'head -c 200000 /dev/zero >&2; echo %s'
+        outputs = runAll( dict( ( i, [ 'sh', '-c', cmd % i ] )
+                                for i in range( 3 ) ), maxProcs=2 )
+        self.assertEqual( outputs, { 0: '0\n', 1: '1\n', 2: '2\n' } )
+
+class testReadiness( unittest.TestCase ):
+    "Test readiness probing (waitReady, isListening)"
+
+    def setUp( self ):
+        self.socks = []
+
+    def tearDown( self ):
+        for sock in self.socks:
+            sock.close()
+
+    def listen( self, family=socket.AF_INET, kind=socket.SOCK_STREAM,
+                addr=( '127.0.0.1', 0 ) ):
+        "Return a listening socket"
+        sock = socket.socket( family, kind )
+        self.socks.append( sock )
+        sock.bind( addr )
+        if kind == socket.SOCK_STREAM:
+            sock.listen( 5 )
+        return sock
+
+    def testTCP( self ):
+        "Wait for a TCP listener which starts late"
+        sock = socket.socket()
+        self.socks.append( sock )
+        sock.bind( ( '127.0.0.1', 0 ) )
+        port = sock.getsockname()[ 1 ]
+        self.assertFalse( isListening( None, '127.0.0.1', port ) )
+        Timer( .2, sock.listen, [ 5 ] ).start()
+        start = time()
+        self.assertEqual( waitReady( [ ( None, '127.0.0.1', port ) ],
+                                     timeout=5 ), [] )
+        self.assertTrue( time() - start < 1 )
+
+    def testTimeout( self ):
+        "Probes which never become ready are returned"
+        port = self.listen().getsockname()[ 1 ]
+        sock = socket.socket()
+        self.socks.append( sock )
+        sock.bind( ( '127.0.0.1', 0 ) )
+        closed = sock.getsockname()[ 1 ]
+        probes = [ ( None, '127.0.0.1', port ),
+                   ( None, '127.0.0.1', closed ) ]
+        self.assertEqual( waitReady( probes, timeout=.3 ), probes[ 1: ] )
+
+    def testUnreachable( self ):
+        "Unreachable servers fail at once, even without a timeout"
+        node = Node( 'u1' )
+        try:
+            start = time()
+            self.assertFalse( waitListening( node, '10.123.0.1', 80 ) )
+            self.assertTrue( time() - start < 1 )
+        finally:
+            node.terminate()
+
+    def testUDPAndUnix( self ):
+        "Check UDP and unix domain listeners"
+        port = self.listen( kind=socket.SOCK_DGRAM ).getsockname()[ 1 ]
+        path = os.path.join( tempfile.mkdtemp(), 'sock' )
+        self.listen( socket.AF_UNIX, addr=path )
+        self.assertTrue( isListening( None, None, port, proto='udp' ) )
+        self.assertTrue( isListening( None, path, proto='unix' ) )
+        os.unlink( path )
+        self.assertFalse( isListening( None, path, proto='unix' ) )
+        os.rmdir( os.path.dirname( path ) )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,18 +1,21 @@
 "Utility functions for Mininet."
 
 import codecs
+import ctypes
+import errno
 import os
 import re
+import socket
 import sys
 
 from fcntl import fcntl, F_GETFL, F_SETFL
-from functools import partial
 from os import O_NONBLOCK
 from resource import getrlimit, setrlimit, RLIMIT_NPROC, RLIMIT_NOFILE
-from select import poll, POLLIN, POLLHUP
+from select import poll, POLLIN, POLLHUP, POLLOUT
 from subprocess import call, check_call, Popen, PIPE, STDOUT
 from sys import exit  # pylint: disable=redefined-builtin
-from time import sleep
+from threading import Thread
+from time import sleep, time
 
 from mininet.log import output, info, error, warn, debug
 
@@ -246,6 +249,7 @@ def makeIntfPair( intf1, intf2, addr1=None, addr2=None, node1=None, node2=None,
        deleteIntfs: delete intfs before creating them
        runCmd: function to run shell commands (quietRun)
        raises Exception on failure"""
+    runCmd2 = None
     if not runCmd:
         runCmd = quietRun if not node1 else node1.cmd
         runCmd2 = quietRun if not node2 else node2.cmd
@@ -253,8 +257,15 @@ def makeIntfPair( intf1, intf2, addr1=None, addr2=None, node1=None, node2=None,
         # Delete any old interfaces with the same names
         runCmd( 'ip link del ' + intf1 )
         runCmd2( 'ip link del ' + intf2 )
+    # Named namespaces (see NetnsHost) may not be visible from
+    # node1's private mount namespace, so create the pair from
+    # node2's side in that case
+    if ( node2 and runCmd2 and
+         not isinstance( node2.netnsId(), int ) ):
+        intf1, intf2, addr1, addr2 = intf2, intf1, addr2, addr1
+        runCmd, node2 = runCmd2, node1
     # Create new pair
-    netns = 1 if not node2 else node2.pid
+    netns = 1 if not node2 else node2.netnsId()
     if addr1 is None and addr2 is None:
         cmdOutput = runCmd( 'ip link add name %s '
                             'type veth peer name %s '
@@ -290,7 +301,7 @@ def moveIntfNoRetry( intf, dstNode, printError=False ):
         dstNode: destination Node
         printError: if true, print error"""
     intf = str( intf )
-    cmd = 'ip link set %s netns %s' % ( intf, dstNode.pid )
+    cmd = 'ip link set %s netns %s' % ( intf, dstNode.netnsId() )
     cmdOutput = quietRun( cmd )
     # If ip link set does not produce any output, then we can assume
     # that the link has been moved successfully.
@@ -311,6 +322,47 @@ def moveIntf( intf, dstNode, printError=True,
     retry( retries, delaySecs, moveIntfNoRetry, intf, dstNode,
            printError=printError )
 
+
+# Running Python code in a node's network namespace
+
+CLONE_NEWNET = 0x40000000
+_libc = None
+
+def setns( fd, nstype=CLONE_NEWNET ):
+    """Move the calling thread into a namespace (see setns(2))
+       fd: namespace file descriptor
+       nstype: namespace type (CLONE_NEWNET)"""
+    global _libc  # pylint: disable=global-statement
+    if _libc is None:
+        _libc = ctypes.CDLL( None, use_errno=True )
+    if _libc.setns( fd, nstype ) != 0:
+        err = ctypes.get_errno()
+        raise OSError( err, os.strerror( err ) )
+
+def runInNetns( fd, fn, *args, **kwargs ):
+    """Call fn( *args, **kwargs ) in a helper thread which has been
+       moved into network namespace fd, so that the rest of the
+       process is unaffected. Objects fn creates (e.g. sockets) stay
+       in that namespace.
+       fd: network namespace file descriptor
+       returns: result of fn"""
+    result = {}
+
+    def helper():
+        "Attach to namespace and call fn"
+        try:
+            setns( fd )
+            result[ 'value' ] = fn( *args, **kwargs )
+        except Exception as e:  # pylint: disable=broad-except
+            result[ 'error' ] = e
+
+    thread = Thread( target=helper )
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result[ 'error' ]
+    return result[ 'value' ]
+
 # Support for dumping network
 
 def dumpNodeConnections( nodes ):
@@ -470,8 +522,10 @@ def pmonitor(popens, timeoutms=500, readline=True,
                     while True:
                         try:
                             f = popen.stdout
-                            line = decoder.decode( f.readline() if readline
-                                                   else f.read( readmax ) )
+                            # read() returns None if no data is ready
+                            data = ( f.readline() if readline
+                                     else f.read( readmax ) )
+                            line = decoder.decode( data or b'' )
                         except IOError:
                             line = ''
                         if line == '':
@@ -483,6 +537,45 @@ def pmonitor(popens, timeoutms=500, readline=True,
         else:
             yield None, ''
 
+def runAll( commands, maxProcs=64 ):
+    """Run commands concurrently and collect their output
+       commands: dict of key -> command argument list
+       maxProcs: maximum number of concurrent processes (64)
+       returns: dict of key -> output"""
+    outputs = {}
+    keys = list( commands )
+    for start in range( 0, len( keys ), maxProcs ):
+        popens = dict( ( key, Popen( commands[ key ], stdout=PIPE,
+                                     stderr=PIPE ) )
+                       for key in keys[ start:start + maxProcs ] )
+        # Read stdout and stderr together, so neither pipe fills up
+        poller = poll()
+        chunks = {}
+        for popen in popens.values():
+            for f in popen.stdout, popen.stderr:
+                chunks[ f.fileno() ] = []
+                poller.register( f.fileno(), POLLIN )
+        remaining = len( chunks )
+        while remaining:
+            for fd, _event in poller.poll():
+                data = os.read( fd, 65536 )
+                if data:
+                    chunks[ fd ].append( data )
+                else:
+                    poller.unregister( fd )
+                    remaining -= 1
+        for key, popen in popens.items():
+            out, err = [ decode( b''.join( chunks[ f.fileno() ] ) )
+                         for f in ( popen.stdout, popen.stderr ) ]
+            popen.stderr.close()
+            popen.stdout.close()
+            if popen.wait():
+                error( '*** %s: %s failed: %s' %
+                       ( key, ' '.join( commands[ key ][ :2 ] ), err ) )
+            outputs[ key ] = out
+    return outputs
+
+
 # Other stuff we use
 def sysctlTestAndSet( name, limit ):
     "Helper function to set sysctl limits"
@@ -538,8 +631,26 @@ def fixLimits():
     # pylint: enable=broad-except
 
 
-def mountCgroups():
-    "Make sure cgroups file system is mounted"
+def cgroupVersion():
+    "Return 2 if /sys/fs/cgroup is a unified (v2) hierarchy, else 1"
+    return 2 if os.path.exists( '/sys/fs/cgroup/cgroup.controllers' ) else 1
+
+def mountCgroups( v2root='/sys/fs/cgroup/mininet' ):
+    """Make sure cgroups file system is mounted
+       v2root: our subtree, if we are using cgroup v2"""
+    if cgroupVersion() == 2:
+        # Enable the cpu and cpuset controllers for our subtree;
+        # there is nothing to mount
+        if not os.path.isdir( v2root ):
+            os.mkdir( v2root )
+        for path in os.path.dirname( v2root ), v2root:
+            try:
+                with open( path + '/cgroup.subtree_control', 'w' ) as f:
+                    f.write( '+cpu +cpuset\n' )
+            except ( IOError, OSError ) as e:
+                raise Exception( 'could not enable cpu and cpuset cgroup '
+                                 'controllers in %s: %s' % ( path, e ) )
+        return
     mounts = quietRun( 'grep cgroup /proc/mounts' )
     cgdir = '/sys/fs/cgroup'
     csdir = cgdir + '/cpuset'
@@ -671,29 +782,156 @@ def ensureRoot():
         error( '*** Mininet must run as root.\n' )
         exit( 1 )
 
+# Readiness probing: rather than polling with telnet and fixed sleeps,
+# we make non-blocking connect() attempts from each client's namespace,
+# concurrently, and retry failed attempts with exponential backoff.
+
+def _probeParams( probe ):
+    "Return client, server address, port, proto for probe tuple"
+    client, server, port = probe[ :3 ]
+    proto = probe[ 3 ] if len( probe ) > 3 else 'tcp'
+    if proto not in ( 'tcp', 'udp', 'unix' ):
+        raise Exception( 'unknown probe protocol %s' % proto )
+    return client, server, port, proto
+
+def _udpBound( server, port ):
+    """Is a UDP socket bound to port in server's namespace?
+       server: Node, or None/address for root namespace"""
+    def readTables():
+        "Read UDP socket tables for the current thread's namespace"
+        lines = []
+        for table in 'udp', 'udp6':
+            path = '/proc/thread-self/net/' + table
+            if os.path.exists( path ):
+                with open( path ) as f:
+                    lines += f.readlines()[ 1: ]
+        return lines
+    if server is None or isinstance( server, BaseString ):
+        lines = readTables()
+    elif not server.inNamespace:
+        lines = readTables()
+    else:
+        lines = runInNetns( server.netnsFd(), readTables )
+    suffix = ':%04X' % port
+    return any( line.split()[ 1 ].endswith( suffix ) for line in lines )
+
+def _startConnect( client, server, port, proto ):
+    """Start a non-blocking connect() from client's namespace
+       returns: socket, and errno (0 if connected) if the result is
+                already known, or None"""
+    family = socket.AF_UNIX if proto == 'unix' else socket.AF_INET
+    sock = ( client.socket( family, socket.SOCK_STREAM ) if client
+             else socket.socket( family, socket.SOCK_STREAM ) )
+    sock.setblocking( False )
+    if proto == 'unix':
+        addr = server
+    else:
+        # pylint: disable=maybe-no-member
+        addr = ( server if isinstance( server, BaseString )
+                 else server.IP(), port )
+    err = sock.connect_ex( addr )
+    if err in ( errno.EINPROGRESS, errno.EAGAIN ):
+        return sock, None
+    return sock, err
+
+def waitReady( probes, timeout=None, delay=.01, maxDelay=.5,
+               retryFailed=True ):
+    """Wait (concurrently) until services are ready to accept
+       connections, returning as soon as all of them are ready.
+       probes: list of ( client, server, port[, proto] ):
+         client: Node to connect from (None: root namespace)
+         server: Node or IP address (unix: socket path)
+         port: TCP/UDP port (ignored for unix)
+         proto: 'tcp' (default), 'udp' or 'unix'; for udp, we check
+                for a socket bound to port in server's namespace
+       timeout: give up after this many seconds (None: wait forever)
+       delay: initial delay before retrying a probe
+       maxDelay: maximum delay between retries of a probe
+       retryFailed: retry failed probes? (True); we never retry
+                    probes whose server is unreachable
+       returns: list of probes which are not ready"""
+    probes = list( probes )
+    params = [ _probeParams( probe ) for probe in probes ]
+    start = time()
+    nextTry = dict( ( i, start ) for i in range( len( probes ) ) )
+    delays = dict( ( i, delay ) for i in range( len( probes ) ) )
+    inflight = {}  # fd -> ( probe index, socket )
+    ready = set()
+
+    def failed( i, err=None ):
+        "Schedule retry of probe i, if we are retrying"
+        if retryFailed and err not in unreachable:
+            nextTry[ i ] = time() + delays[ i ]
+            delays[ i ] = min( delays[ i ] * 2, maxDelay )
+
+    unreachable = ( errno.EHOSTUNREACH, errno.ENETUNREACH )
+    poller = poll()
+    while nextTry or inflight:
+        now = time()
+        if timeout is not None and now - start >= timeout:
+            break
+        # Start probes which are due
+        for i in [ i for i, t in nextTry.items() if t <= now ]:
+            del nextTry[ i ]
+            client, server, port, proto = params[ i ]
+            if proto == 'udp':
+                if _udpBound( server, port ):
+                    ready.add( i )
+                else:
+                    failed( i )
+                continue
+            try:
+                sock, result = _startConnect( client, server, port, proto )
+            except socket.error as e:
+                failed( i, e.errno )
+                continue
+            if result is None:
+                inflight[ sock.fileno() ] = ( i, sock )
+                poller.register( sock.fileno(), POLLOUT )
+                continue
+            sock.close()
+            if result == 0:
+                ready.add( i )
+            else:
+                failed( i, result )
+        if not nextTry and not inflight:
+            break
+        # Wait for connections to complete or the next probe to be due
+        wait = min( nextTry.values() ) - time() if nextTry else None
+        if timeout is not None:
+            remaining = start + timeout - time()
+            wait = remaining if wait is None else min( wait, remaining )
+        if not inflight:
+            sleep( max( wait, 0 ) )
+            continue
+        events = poller.poll( None if wait is None else
+                              max( int( wait * 1000 ), 0 ) )
+        for fd, _event in events:
+            i, sock = inflight.pop( fd )
+            poller.unregister( fd )
+            err = sock.getsockopt( socket.SOL_SOCKET, socket.SO_ERROR )
+            sock.close()
+            if err == 0:
+                ready.add( i )
+            else:
+                failed( i, err )
+    for _i, sock in inflight.values():
+        sock.close()
+    return [ probe for i, probe in enumerate( probes ) if i not in ready ]
+
+def isListening( client=None, server='127.0.0.1', port=80, proto='tcp',
+                 timeout=5 ):
+    """Check (once, without retrying) whether server is listening
+       on port; see waitReady() for arguments
+       returns: True if server is listening"""
+    return not waitReady( [ ( client, server, port, proto ) ],
+                          timeout=timeout, retryFailed=False )
+
 def waitListening( client=None, server='127.0.0.1', port=80, timeout=None ):
     """Wait until server is listening on port.
        returns True if server is listening"""
-    runCmd = ( client.cmd if client else
-               partial( quietRun, shell=True ) )
-    if not runCmd( 'which telnet' ):
-        raise Exception('Could not find telnet' )
-    # pylint: disable=maybe-no-member
-    serverIP = server if isinstance( server, BaseString ) else server.IP()
-    cmd = ( 'echo A | telnet -e A %s %s' % ( serverIP, port ) )
-    time = 0
-    result = runCmd( cmd )
-    while 'Connected' not in result:
-        if 'No route' in result:
-            rtable = runCmd( 'route' )
-            error( 'no route to %s:\n%s' % ( server, rtable ) )
-            return False
-        if timeout and time >= timeout:
-            error( 'could not connect to %s on port %d\n' % ( server, port ) )
-            return False
-        debug( 'waiting for', server, 'to listen on port', port, '\n' )
-        info( '.' )
-        sleep( .5 )
-        time += .5
-        result = runCmd( cmd )
+    debug( 'waiting for', server, 'to listen on port', port, '\n' )
+    if waitReady( [ ( client, server, port ) ], timeout=timeout ):
+        error( 'could not connect to %s on port %d\n' % ( server, port ) )
+        return False
     return True
@@ -7,7 +7,7 @@
  *  - detaching from a controlling tty using setsid
  *  - running in network and mount namespaces
  *  - printing out the pid of a process so we can identify it later
- *  - attaching to a namespace and cgroup
+ *  - attaching to a namespace (by pid or named netns path) and cgroup
  *  - setting RT scheduling
  *
  * Partially based on public domain setsid(1)
@@ -32,13 +32,15 @@
 void usage(char *name)
 {
     printf("Execution utility for Mininet\n\n"
-           "Usage: %s [-cdnp] [-a pid] [-g group] [-r rtprio] cmd args...\n\n"
+           "Usage: %s [-cdnp] [-a pid|path] [-g group] [-r rtprio] "
+           "cmd args...\n\n"
            "Options:\n"
            "  -c: close all file descriptors except stdin/out/error\n"
            "  -d: detach from tty by calling setsid()\n"
            "  -n: run in new network and mount namespaces\n"
            "  -p: print ^A + pid\n"
            "  -a pid: attach to pid's network and mount namespaces\n"
+           "  -a path: attach to network namespace file (e.g. from ip netns)\n"
            "  -g group: add to cgroup\n"
            "  -r rtprio: run with SCHED_RR (usually requires -g)\n"
            "  -v: print version\n",
@@ -63,6 +65,17 @@ void validate(char *path)
     }
 }
 
+/* Is string a (decimal) pid? */
+int ispid(char *s)
+{
+    if (!*s)
+        return 0;
+    for (; *s; s++)
+        if (!isdigit(*s))
+            return 0;
+    return 1;
+}
+
 /* Add our pid to cgroup */
 void cgroup(char *gname)
 {
@@ -73,9 +86,22 @@ void cgroup(char *gname)
     char **gptr;
     pid_t pid = getpid();
     int count = 0;
+    FILE *f;
     validate(gname);
+    /* cgroup v2: a single unified hierarchy, with our groups
+     * under /sys/fs/cgroup/mininet */
+    if (access("/sys/fs/cgroup/cgroup.controllers", F_OK) == 0) {
+        snprintf(path, PATH_MAX, "/sys/fs/cgroup/mininet/%s/cgroup.procs",
+                 gname);
+        f = fopen(path, "w");
+        if (!f || fprintf(f, "%d\n", pid) < 0 || fclose(f) != 0) {
+            fprintf(stderr, "cgroup: could not add to cgroup %s\n",
+                gname);
+            exit(1);
+        }
+        return;
+    }
     for (gptr = groups; *gptr; gptr++) {
-        FILE *f;
         snprintf(path, PATH_MAX, "/sys/fs/cgroup/%s/%s/tasks",
                  *gptr, gname);
         f = fopen(path, "w");
@@ -152,6 +178,21 @@ int main(int argc, char *argv[])
             fflush(stdout);
             break;
         case 'a':
+            if (!ispid(optarg)) {
+                /* Attach to named network namespace, e.g. from
+                 * ip netns add; we stay in our mount namespace */
+                nsid = open(optarg, O_RDONLY);
+                if (nsid < 0) {
+                    perror(optarg);
+                    return 1;
+                }
+                if (setns(nsid, CLONE_NEWNET) != 0) {
+                    perror("setns");
+                    return 1;
+                }
+                close(nsid);
+                break;
+            }
             /* Attach to pid's network namespace and mount namespace */
             pid = atoi(optarg);
             sprintf(path, "/proc/%d/ns/net", pid);